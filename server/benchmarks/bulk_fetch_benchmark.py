@@ -0,0 +1,154 @@
+#!/usr/bin/env python
+"""
+Benchmarks BulkFetch against a local stub HTTP server.
+
+The stub answers /items/{n} with a small JSON document after a fixed latency, and
+always answers 503 for every failure_every-th item. The job is run in two halves as
+if it had crashed midway, then failures are retried, all on one journal.
+
+    python -m benchmarks.bulk_fetch_benchmark run --requests 20000 --output bulk.json
+    python -m benchmarks.bulk_fetch_benchmark compare baseline.json bulk.json
+"""
+
+import asyncio
+import contextlib
+import io
+import itertools
+import json
+import os
+import platform
+import sys
+import tempfile
+from argparse import ArgumentParser, Namespace
+from datetime import datetime, timezone
+
+from aiohttp import web
+
+from server.domain.utilities.request_generator import BulkFetch
+
+from .executor_benchmark import compare, format_comparison
+from .load_test import free_port
+
+METRIC_DIRECTIONS = {
+    "requests_per_second": True,
+    "latency_p50_ms": False,
+    "latency_p99_ms": False,
+}
+
+
+def stub_application(latency, failure_every):
+    async def item(request):
+        n = int(request.match_info["n"])
+        if latency:
+            await asyncio.sleep(latency)
+        if failure_every and n % failure_every == 0:
+            return web.json_response({"error": "unavailable"}, status=503)
+        return web.json_response({"id": n, "name": f"item {n}", "tags": ["a", "b", "c"]})
+
+    app = web.Application()
+    app.router.add_get("/items/{n}", item)
+    return app
+
+
+async def run_against_stub_server(args, journal_path):
+    address = "127.0.0.1"
+    port = free_port(address)
+    runner = web.AppRunner(stub_application(args.latency, args.failure_every), access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, address, port).start()
+
+    def requests():
+        for n in range(args.requests):
+            yield {"id": n, "url": f"http://{address}:{port}/items/{n}"}
+
+    def bulk_fetch(**options):
+        # retries of the always failing items are not what is being measured
+        return BulkFetch(journal_path, concurrency=args.concurrency, max_attempts=1, **options)
+
+    try:
+        first_half = await bulk_fetch().run(itertools.islice(requests(), args.requests // 2))
+        resumed = await bulk_fetch().run(requests())
+        retried = await bulk_fetch(retry_failures=True).run(requests())
+    finally:
+        await runner.cleanup()
+    return {"first_half": first_half, "resumed": resumed, "retry_failures": retried}
+
+
+def run(args):
+    with tempfile.TemporaryDirectory() as directory:
+        journal_path = os.path.join(directory, "journal.jsonl")
+        with contextlib.redirect_stdout(io.StringIO()):
+            results = asyncio.run(run_against_stub_server(args, journal_path))
+    return {
+        "meta": {
+            "created": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "latency": args.latency,
+            "failure_every": args.failure_every,
+        },
+        "results": results,
+    }
+
+
+def format_report(report):
+    lines = [
+        f"{'phase':<18}{'done':>8}{'failed':>8}{'skipped':>9}{'req/s':>10}{'p50 ms':>9}{'p99 ms':>9}"
+    ]
+    for name, metrics in report["results"].items():
+        lines.append(
+            f"{name:<18}{metrics['done']:>8}{metrics['failed']:>8}{metrics['skipped']:>9}"
+            f"{metrics['requests_per_second']:>10.0f}{metrics['latency_p50_ms']:>9.1f}"
+            f"{metrics['latency_p99_ms']:>9.1f}"
+        )
+    return "\n".join(lines)
+
+
+def parse_inputs(argv=None) -> Namespace:
+    parser = ArgumentParser(description="BulkFetch benchmark")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subparsers.add_parser("run", help="Run the benchmark.")
+    run_parser.add_argument("--requests", type=int, default=20000, help="Requests in the job.")
+    run_parser.add_argument("--concurrency", type=int, default=64, help="Requests in flight.")
+    run_parser.add_argument("--latency", type=float, default=0.005, help="Seconds the stub takes per request.")
+    run_parser.add_argument("--failure-every", type=int, default=100, help="Every nth item fails, 0 for none.")
+    run_parser.add_argument("--output", type=str, default=None, help="Write the JSON report to a file.")
+
+    compare_parser = subparsers.add_parser("compare", help="Compare a report against a baseline.")
+    compare_parser.add_argument("baseline", type=str)
+    compare_parser.add_argument("current", type=str)
+    compare_parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.1,
+        help="Relative change that counts as a regression (default: 0.1).",
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_inputs(argv)
+
+    if args.command == "run":
+        report = run(args)
+        print(format_report(report))
+        if args.output:
+            with open(args.output, "w") as f:
+                json.dump(report, f, indent=4)
+        return 0
+
+    with open(args.baseline, "r") as f:
+        baseline = json.load(f)
+    with open(args.current, "r") as f:
+        current = json.load(f)
+
+    rows, regressed = compare(baseline, current, threshold=args.threshold, directions=METRIC_DIRECTIONS)
+    print(format_comparison(rows))
+    return 1 if regressed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
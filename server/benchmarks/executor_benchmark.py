@@ -0,0 +1,234 @@
+#!/usr/bin/env python
+"""
+Benchmarks GraphExecutor against synthetic workflows.
+
+    python -m benchmarks.executor_benchmark run --output benchmarks/baselines/executor.json
+    python -m benchmarks.executor_benchmark compare benchmarks/baselines/executor.json current.json
+"""
+
+import asyncio
+import contextlib
+import io
+import json
+import platform
+import sys
+import time
+import tracemalloc
+from argparse import ArgumentParser, Namespace
+from datetime import datetime, timezone
+
+from server.domain.services.graph_executor import GraphExecutor
+
+from .stub_server import StubServer
+from .workflows import SCENARIOS
+
+# metric name -> True when a larger value is better
+METRIC_DIRECTIONS = {
+    "nodes_per_second": True,
+    "per_node_overhead_us": False,
+    "peak_memory_bytes": False,
+    "serialized_bytes": False,
+}
+
+
+async def run_workflow(graph_executor, prompt):
+    graph = graph_executor.prompt_to_graph(prompt)
+    response = {"prompt_id": "benchmark", "number": 1, "node_errors": []}
+    return await graph_executor.run_sequential(graph, response)
+
+
+def run_scenario(name, repeat=5, server=None):
+    """time a scenario `repeat` times and take one extra pass under tracemalloc"""
+    server = server or StubServer()
+    graph_executor = GraphExecutor(server)
+    prompt = SCENARIOS[name]()
+
+    loop = asyncio.new_event_loop()
+    # nodes print liberally, keep the report readable
+    sink = io.StringIO()
+    try:
+        with contextlib.redirect_stdout(sink):
+            samples = []
+            for _ in range(repeat):
+                server.reset_counters()
+                server.session_store.clear()
+                time_start = time.perf_counter()
+                loop.run_until_complete(run_workflow(graph_executor, prompt))
+                wall_seconds = time.perf_counter() - time_start
+                samples.append(
+                    {
+                        "wall_seconds": wall_seconds,
+                        "evaluate_seconds": server.evaluate_seconds,
+                        "evaluations": server.evaluations,
+                        "messages": server.messages,
+                        "serialized_bytes": server.serialized_bytes,
+                    }
+                )
+                sink.seek(0)
+                sink.truncate()
+
+            server.reset_counters()
+            tracemalloc.start()
+            loop.run_until_complete(run_workflow(graph_executor, prompt))
+            _, peak_memory_bytes = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+    finally:
+        loop.close()
+
+    samples.sort(key=lambda sample: sample["wall_seconds"])
+    median = samples[len(samples) // 2]
+    evaluations = max(median["evaluations"], 1)
+    overhead_seconds = median["wall_seconds"] - median["evaluate_seconds"]
+
+    return {
+        "graph_nodes": len(prompt),
+        "evaluations": median["evaluations"],
+        "messages": median["messages"],
+        "wall_seconds": median["wall_seconds"],
+        "nodes_per_second": median["evaluations"] / median["wall_seconds"],
+        "per_node_overhead_us": overhead_seconds / evaluations * 1e6,
+        "peak_memory_bytes": peak_memory_bytes,
+        "serialized_bytes": median["serialized_bytes"],
+    }
+
+
+def run(scenarios=None, repeat=5):
+    results = {}
+    for name in scenarios or SCENARIOS.keys():
+        results[name] = run_scenario(name, repeat=repeat)
+    return {
+        "meta": {
+            "created": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "repeat": repeat,
+        },
+        "results": results,
+    }
+
+
+def compare(baseline, current, threshold=0.1, directions=None):
+    """
+    Compare two benchmark reports.
+
+    Returns a list of rows and whether any metric regressed by more than `threshold`.
+    """
+    rows = []
+    regressed = False
+    for name, baseline_metrics in baseline.get("results", {}).items():
+        current_metrics = current.get("results", {}).get(name)
+        if current_metrics is None:
+            continue
+        for metric, higher_is_better in (directions or METRIC_DIRECTIONS).items():
+            before = baseline_metrics.get(metric)
+            after = current_metrics.get(metric)
+            if not before or after is None:
+                continue
+            change = (after - before) / before
+            worse = -change if higher_is_better else change
+            is_regression = worse > threshold
+            regressed = regressed or is_regression
+            rows.append(
+                {
+                    "scenario": name,
+                    "metric": metric,
+                    "baseline": before,
+                    "current": after,
+                    "change": change,
+                    "regression": is_regression,
+                }
+            )
+    return rows, regressed
+
+
+def format_report(report):
+    lines = [
+        f"{'scenario':<22}{'nodes':>7}{'evals':>8}{'nodes/s':>12}{'overhead us':>13}{'peak KiB':>11}{'sent KiB':>11}"
+    ]
+    for name, metrics in report["results"].items():
+        lines.append(
+            f"{name:<22}{metrics['graph_nodes']:>7}{metrics['evaluations']:>8}"
+            f"{metrics['nodes_per_second']:>12.0f}{metrics['per_node_overhead_us']:>13.1f}"
+            f"{metrics['peak_memory_bytes'] / 1024:>11.1f}{metrics['serialized_bytes'] / 1024:>11.1f}"
+        )
+    return "\n".join(lines)
+
+
+def format_comparison(rows):
+    lines = [f"{'scenario':<22}{'metric':<22}{'baseline':>14}{'current':>14}{'change':>9}"]
+    for row in rows:
+        flag = "  REGRESSION" if row["regression"] else ""
+        lines.append(
+            f"{row['scenario']:<22}{row['metric']:<22}{row['baseline']:>14.1f}"
+            f"{row['current']:>14.1f}{row['change']:>+9.1%}{flag}"
+        )
+    return "\n".join(lines)
+
+
+def parse_inputs(argv=None) -> Namespace:
+    parser = ArgumentParser(description="GraphExecutor benchmarks")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subparsers.add_parser("run", help="Run the benchmark scenarios.")
+    run_parser.add_argument(
+        "--scenario",
+        action="append",
+        choices=sorted(SCENARIOS.keys()),
+        help="Scenario to run, may be repeated (default: all).",
+    )
+    run_parser.add_argument(
+        "--repeat", type=int, default=5, help="Timed runs per scenario."
+    )
+    run_parser.add_argument(
+        "--output", type=str, default=None, help="Write the JSON report to a file."
+    )
+
+    compare_parser = subparsers.add_parser(
+        "compare", help="Compare a report against a baseline."
+    )
+    compare_parser.add_argument("baseline", type=str)
+    compare_parser.add_argument(
+        "current",
+        type=str,
+        nargs="?",
+        default=None,
+        help="Report to compare, runs the benchmarks when omitted.",
+    )
+    compare_parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.1,
+        help="Relative change that counts as a regression (default: 0.1).",
+    )
+
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_inputs(argv)
+
+    if args.command == "run":
+        report = run(scenarios=args.scenario, repeat=args.repeat)
+        print(format_report(report))
+        if args.output:
+            with open(args.output, "w") as f:
+                json.dump(report, f, indent=4)
+        return 0
+
+    with open(args.baseline, "r") as f:
+        baseline = json.load(f)
+
+    if args.current:
+        with open(args.current, "r") as f:
+            current = json.load(f)
+    else:
+        current = run(scenarios=list(baseline.get("results", {}).keys()))
+        print(format_report(current))
+
+    rows, regressed = compare(baseline, current, threshold=args.threshold)
+    print(format_comparison(rows))
+    return 1 if regressed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
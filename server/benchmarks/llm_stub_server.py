@@ -0,0 +1,133 @@
+#!/usr/bin/env python
+"""
+A local stand-in for the LLM providers' APIs, to run the llm nodes offline.
+
+Serves the OpenAI chat completions API (which Groq, Cerebras and Perplexity also
+speak), the Anthropic messages API and the Cohere chat API. Every reply echoes the
+prompt after a fixed latency. Point the SDKs at it through their base url variables:
+
+    python -m benchmarks.llm_stub_server --port 8090
+    OPENAI_BASE_URL=http://127.0.0.1:8090/v1 OPENAI_API_KEY=stub python main.py
+"""
+
+import asyncio
+import sys
+import time
+import uuid
+from argparse import ArgumentParser, Namespace
+
+from aiohttp import web
+
+
+class LLMStub:
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.requests = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.api_keys = set()
+
+    @web.middleware
+    async def count(self, request, handler):
+        self.requests += 1
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        authorization = request.headers.get("Authorization", "")
+        self.api_keys.add(request.headers.get("x-api-key") or authorization.removeprefix("Bearer "))
+        try:
+            if self.latency:
+                await asyncio.sleep(self.latency)
+            return await handler(request)
+        finally:
+            self.in_flight -= 1
+
+    def application(self):
+        app = web.Application(middlewares=[self.count])
+        app.router.add_post("/v1/chat/completions", self.chat_completions)
+        app.router.add_post("/chat/completions", self.chat_completions)
+        app.router.add_post("/v1/messages", self.messages)
+        app.router.add_post("/v1/chat", self.cohere_chat)
+        return app
+
+    async def chat_completions(self, request):
+        body = await request.json()
+        content = reply(body["messages"][-1]["content"])
+        prompt_tokens = sum(len(m["content"].split()) for m in body["messages"])
+        return web.json_response(
+            {
+                "id": f"chatcmpl-{uuid.uuid4().hex}",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": body["model"],
+                "choices": [
+                    {
+                        "index": 0,
+                        "message": {"role": "assistant", "content": content},
+                        "finish_reason": "stop",
+                        "logprobs": None,
+                    }
+                ],
+                "usage": {
+                    "prompt_tokens": prompt_tokens,
+                    "completion_tokens": len(content.split()),
+                    "total_tokens": prompt_tokens + len(content.split()),
+                },
+            }
+        )
+
+    async def messages(self, request):
+        body = await request.json()
+        content = reply(body["messages"][-1]["content"])
+        return web.json_response(
+            {
+                "id": f"msg_{uuid.uuid4().hex}",
+                "type": "message",
+                "role": "assistant",
+                "model": body["model"],
+                "content": [{"type": "text", "text": content}],
+                "stop_reason": "end_turn",
+                "stop_sequence": None,
+                "usage": {
+                    "input_tokens": len(body["messages"][-1]["content"].split()),
+                    "output_tokens": len(content.split()),
+                },
+            }
+        )
+
+    async def cohere_chat(self, request):
+        body = await request.json()
+        content = reply(body["message"])
+        return web.json_response(
+            {
+                "text": content,
+                "generation_id": str(uuid.uuid4()),
+                "finish_reason": "COMPLETE",
+                "chat_history": [
+                    {"role": "USER", "message": body["message"]},
+                    {"role": "CHATBOT", "message": content},
+                ],
+                "meta": {"billed_units": {"input_tokens": 1, "output_tokens": 1}},
+            }
+        )
+
+
+def reply(prompt):
+    return f"stub reply to: {prompt}"
+
+
+def parse_inputs(argv=None) -> Namespace:
+    parser = ArgumentParser(description="Local stub of the LLM provider APIs")
+    parser.add_argument("--host", type=str, default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds to wait before each reply.")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_inputs(argv)
+    web.run_app(LLMStub(args.latency).application(), host=args.host, port=args.port)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,358 @@
+#!/usr/bin/env python
+"""
+Load test for an in-process Server with simulated websocket clients.
+
+Each client keeps a websocket open on /ws and submits workflows to /prompt. A
+separate task toggles breakpoints and stop points through the intervention routes.
+Authentication is disabled and every client connects with its own user id. The
+run history, uploads and extension manifests go to a temporary directory.
+
+    python -m benchmarks.load_test run --clients 50 --rate 20 --duration 30 --output load.json
+    python -m benchmarks.load_test compare baseline.json load.json
+"""
+
+import asyncio
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import socket
+import sys
+import tempfile
+import time
+import uuid
+from argparse import ArgumentParser, Namespace
+from datetime import datetime, timezone
+from unittest import mock
+
+import aiohttp
+
+from server import Server
+from server.domain.utilities.metrics import rss_bytes
+
+from .executor_benchmark import compare, format_comparison
+from .workflows import long_chain
+
+METRIC_DIRECTIONS = {
+    "completed_per_second": True,
+    "latency_p50_ms": False,
+    "latency_p99_ms": False,
+    "submit_p99_ms": False,
+    "toggle_p99_ms": False,
+    "incomplete_runs": False,
+    "send_errors": False,
+    "peak_rss_bytes": False,
+}
+
+# workflow id used for intervention toggles so they never pause the measured runs
+INTERVENTION_WORKFLOW_ID = "load-test-interventions"
+
+
+def percentile(values, fraction):
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def free_port(address):
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind((address, 0))
+        return s.getsockname()[1]
+
+
+class LoadTest:
+    def __init__(self, base_url, clients, rate, duration, nodes, toggle_rate):
+        self.base_url = base_url
+        self.clients = clients
+        self.rate = rate
+        self.duration = duration
+        self.toggle_rate = toggle_rate
+
+        self.prompt = long_chain(nodes)
+        self.last_node_id = str(len(self.prompt))
+
+        # prompt_id -> (user_id, submitted at)
+        self.pending = {}
+        self.latencies = []
+        self.submit_latencies = []
+        self.toggle_latencies = []
+        self.submit_errors = 0
+        self.messages_received = 0
+        self.bytes_received = 0
+        self.misrouted = 0
+        self.connect_errors = 0
+
+    async def client(self, session, user_id, deadline, connected):
+        try:
+            ws = await session.ws_connect(
+                f"{self.base_url}/ws?user_id={user_id}", protocols=["json"]
+            )
+        except aiohttp.ClientError:
+            self.connect_errors += 1
+            connected.release()
+            return
+        connected.release()
+
+        receiver = asyncio.create_task(self.receive(ws, user_id))
+        try:
+            interval = self.clients / self.rate
+            # spread the first submissions out over one interval
+            await asyncio.sleep(random.random() * interval)
+            while time.monotonic() < deadline:
+                await self.submit(session, user_id)
+                await asyncio.sleep(interval)
+            await self.drain(user_id)
+        finally:
+            receiver.cancel()
+            await ws.close()
+
+    async def submit(self, session, user_id):
+        prompt_id = str(uuid.uuid4())
+        body = {
+            "prompt": self.prompt,
+            "workflow": {"checksum": f"load-test-{user_id}"},
+            "promptId": prompt_id,
+        }
+        time_start = time.monotonic()
+        self.pending[prompt_id] = (user_id, time_start)
+        try:
+            async with session.post(
+                f"{self.base_url}/prompt?user_id={user_id}", json=body
+            ) as response:
+                await response.read()
+                if response.status != 200:
+                    self.submit_errors += 1
+                    self.pending.pop(prompt_id, None)
+        except aiohttp.ClientError:
+            self.submit_errors += 1
+            self.pending.pop(prompt_id, None)
+        self.submit_latencies.append(time.monotonic() - time_start)
+
+    async def receive(self, ws, user_id):
+        async for msg in ws:
+            if msg.type != aiohttp.WSMsgType.TEXT:
+                continue
+            self.messages_received += 1
+            self.bytes_received += len(msg.data)
+
+            data = json.loads(msg.data).get("data") or {}
+            prompt_id = data.get("prompt_id")
+            if prompt_id not in self.pending:
+                continue
+
+            owner, submitted_at = self.pending[prompt_id]
+            if owner != user_id:
+                self.misrouted += 1
+            if self.last_node_id in (data.get("results") or {}) or data.get("node_errors"):
+                self.latencies.append(time.monotonic() - submitted_at)
+                del self.pending[prompt_id]
+
+    async def drain(self, user_id, timeout=10.0):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline and any(
+            owner == user_id for owner, _ in self.pending.values()
+        ):
+            await asyncio.sleep(0.05)
+
+    async def toggler(self, session, user_ids, deadline):
+        routes = [
+            ("/interventions/breakpoints", "all_break"),
+            ("/interventions/stop-points", "all_stop"),
+        ]
+        while time.monotonic() < deadline:
+            await asyncio.sleep(1 / self.toggle_rate)
+            route, all_flag = random.choice(routes)
+            body = {
+                "workflow_id": INTERVENTION_WORKFLOW_ID,
+                "node_ids": [self.last_node_id],
+                all_flag: False,
+            }
+            user_id = random.choice(user_ids)
+            time_start = time.monotonic()
+            try:
+                async with session.post(
+                    f"{self.base_url}{route}?user_id={user_id}", json=body
+                ) as response:
+                    await response.read()
+            except aiohttp.ClientError:
+                continue
+            self.toggle_latencies.append(time.monotonic() - time_start)
+
+    async def sample(self, server, deadline, timeline, interval=0.5):
+        time_start = time.monotonic()
+        while time.monotonic() < deadline:
+            timeline.append(
+                {
+                    "t": time.monotonic() - time_start,
+                    "rss_bytes": rss_bytes(),
+                    "sockets": len(server.sockets),
+                    "message_queue": server.message_queue.qsize(),
+                    "pending_runs": len(self.pending),
+                }
+            )
+            await asyncio.sleep(interval)
+
+    async def run(self, server):
+        user_ids = [f"load-test-client-{i}" for i in range(self.clients)]
+        timeline = []
+        connector = aiohttp.TCPConnector(limit=0)
+        async with aiohttp.ClientSession(connector=connector) as session:
+            connected = asyncio.Semaphore(0)
+            time_start = time.monotonic()
+            deadline = time_start + self.duration
+
+            sampler = asyncio.create_task(self.sample(server, deadline + 10, timeline))
+            clients = [
+                asyncio.create_task(self.client(session, user_id, deadline, connected))
+                for user_id in user_ids
+            ]
+            for _ in user_ids:
+                await connected.acquire()
+            toggler = asyncio.create_task(self.toggler(session, user_ids, deadline))
+
+            await asyncio.gather(*clients, toggler)
+            elapsed = time.monotonic() - time_start
+            sampler.cancel()
+
+        snapshot = server.metrics.snapshot()
+        to_ms = 1000.0
+        return {
+            "clients": self.clients,
+            "submitted": len(self.submit_latencies),
+            "completed": len(self.latencies),
+            "completed_per_second": len(self.latencies) / elapsed,
+            "incomplete_runs": len(self.pending),
+            "submit_errors": self.submit_errors,
+            "connect_errors": self.connect_errors,
+            "latency_p50_ms": (percentile(self.latencies, 0.5) or 0) * to_ms,
+            "latency_p99_ms": (percentile(self.latencies, 0.99) or 0) * to_ms,
+            "latency_max_ms": max(self.latencies, default=0) * to_ms,
+            "submit_p99_ms": (percentile(self.submit_latencies, 0.99) or 0) * to_ms,
+            "toggle_p99_ms": (percentile(self.toggle_latencies, 0.99) or 0) * to_ms,
+            "messages_received": self.messages_received,
+            "messages_per_second": self.messages_received / elapsed,
+            "bytes_received": self.bytes_received,
+            "misrouted_messages": self.misrouted,
+            "send_errors": snapshot["counters"].get("websocket.send_errors", 0),
+            "undeliverable_messages": snapshot["counters"].get("websocket.undeliverable", 0),
+            "peak_rss_bytes": max((sample["rss_bytes"] for sample in timeline), default=0),
+        }, timeline
+
+
+async def run_against_in_process_server(args, directory):
+    from main import parse_inputs
+
+    address = "127.0.0.1"
+    port = free_port(address)
+
+    server_args = parse_inputs(disabled=True)
+    server_args.history_file = os.path.join(directory, "history.sqlite3")
+    server_args.input_directory = os.path.join(directory, "input")
+
+    loop = asyncio.get_running_loop()
+    server = Server(loop=loop, args=server_args)
+    server.load_extensions()
+    server.add_routes()
+    await server.start(address, port, verbose=False)
+    publisher = asyncio.create_task(server.publish_loop())
+
+    load_test = LoadTest(
+        base_url=f"http://{address}:{port}",
+        clients=args.clients,
+        rate=args.rate,
+        duration=args.duration,
+        nodes=args.nodes,
+        toggle_rate=args.toggle_rate,
+    )
+    try:
+        return await load_test.run(server)
+    finally:
+        publisher.cancel()
+        await server.stop()
+
+
+def run(args):
+    with tempfile.TemporaryDirectory() as directory, mock.patch.dict(
+        os.environ,
+        {
+            "NEOSCAFFOLD_AUTH_ENABLED": "false",
+            "NEOSCAFFOLD_MANIFEST_CACHE": os.path.join(directory, "manifests"),
+        },
+    ), contextlib.redirect_stdout(io.StringIO()):
+        results, timeline = asyncio.run(run_against_in_process_server(args, directory))
+    return {
+        "meta": {
+            "created": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "clients": args.clients,
+            "rate": args.rate,
+            "duration": args.duration,
+            "nodes": args.nodes,
+            "toggle_rate": args.toggle_rate,
+        },
+        "results": {f"clients_{args.clients}": results},
+        "timeline": timeline,
+    }
+
+
+def format_report(report):
+    lines = []
+    for name, metrics in report["results"].items():
+        lines.append(name)
+        for metric, value in metrics.items():
+            lines.append(f"  {metric:<26}{value:>16.1f}" if isinstance(value, float) else f"  {metric:<26}{value:>16}")
+    return "\n".join(lines)
+
+
+def parse_inputs(argv=None) -> Namespace:
+    parser = ArgumentParser(description="Server load test")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subparsers.add_parser("run", help="Run a load test.")
+    run_parser.add_argument("--clients", type=int, default=20, help="Concurrent websocket clients.")
+    run_parser.add_argument("--rate", type=float, default=10.0, help="Prompts per second across all clients.")
+    run_parser.add_argument("--duration", type=float, default=20.0, help="Seconds to submit prompts for.")
+    run_parser.add_argument("--nodes", type=int, default=20, help="Nodes in the submitted workflow.")
+    run_parser.add_argument("--toggle-rate", type=float, default=2.0, help="Intervention toggles per second.")
+    run_parser.add_argument("--output", type=str, default=None, help="Write the JSON report to a file.")
+
+    compare_parser = subparsers.add_parser("compare", help="Compare a report against a baseline.")
+    compare_parser.add_argument("baseline", type=str)
+    compare_parser.add_argument("current", type=str)
+    compare_parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.1,
+        help="Relative change that counts as a regression (default: 0.1).",
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_inputs(argv)
+
+    if args.command == "run":
+        report = run(args)
+        print(format_report(report))
+        if args.output:
+            with open(args.output, "w") as f:
+                json.dump(report, f, indent=4)
+        return 0
+
+    with open(args.baseline, "r") as f:
+        baseline = json.load(f)
+    with open(args.current, "r") as f:
+        current = json.load(f)
+
+    rows, regressed = compare(baseline, current, threshold=args.threshold, directions=METRIC_DIRECTIONS)
+    print(format_comparison(rows))
+    return 1 if regressed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
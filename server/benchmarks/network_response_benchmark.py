@@ -0,0 +1,162 @@
+#!/usr/bin/env python
+"""
+Benchmarks a network response through GETRequest -> JSONParse -> ValuePath.
+
+"string" is how request nodes used to work. The body is parsed, the node outputs it
+re-encoded as a JSON string, and JSONParse parses that again. "response" is a
+NetworkResponse: the body is parsed once and shared. Both include what the
+executor sends to the client after each node, the cumulative results so far
+encoded by the server's JSON encoder.
+
+    python -m benchmarks.network_response_benchmark run --output response.json
+    python -m benchmarks.network_response_benchmark compare baseline.json response.json
+"""
+
+import json
+import platform
+import sys
+import time
+from argparse import ArgumentParser, Namespace
+from datetime import datetime, timezone
+
+from custom_extensions.core.extension import JSONParse, ValuePath
+from custom_extensions.network_requests.response import NetworkResponse
+from server.domain.utilities.encoders import dumps, loads
+
+from .executor_benchmark import compare, format_comparison
+
+DEFAULT_SIZES = [1_000, 100_000]
+
+METRIC_DIRECTIONS = {
+    "string_ms": False,
+    "response_ms": False,
+    "speedup": True,
+}
+
+VALUE_PATH = "response.body.items.0.id"
+
+
+def document(items):
+    return {
+        "total": items,
+        "items": [
+            {"id": n, "name": f"item {n}", "tags": ["a", "b"], "score": n / 3}
+            for n in range(items)
+        ],
+    }
+
+
+def evaluate(node, **inputs):
+    return node.evaluate(
+        {"required_inputs": {name: {"values": value} for name, value in inputs.items()}}
+    )
+
+
+def run_chain(raw, as_response):
+    outputs = []
+    if as_response:
+        response = NetworkResponse({"url": "http://stub/items"}, 200, {}, raw)
+    else:
+        response = json.dumps(
+            {"request": {"url": "http://stub/items"}, "response": {"status": 200, "body": loads(raw)}}
+        )
+    outputs.append(response)
+    dumps(outputs)
+
+    parsed = evaluate(JSONParse(), json=response)
+    outputs.append(parsed)
+    dumps(outputs)
+
+    value = evaluate(ValuePath(), object=parsed, value_path=VALUE_PATH)
+    outputs.append(value)
+    dumps(outputs)
+    return value
+
+
+def time_chain(raw, as_response, repeat):
+    samples = []
+    for _ in range(repeat):
+        time_start = time.perf_counter()
+        run_chain(raw, as_response)
+        samples.append(time.perf_counter() - time_start)
+    return sorted(samples)[len(samples) // 2]
+
+
+def run(sizes=None, repeat=5):
+    results = {}
+    for items in sizes or DEFAULT_SIZES:
+        raw = dumps(document(items)).encode("utf-8")
+        assert run_chain(raw, True) == run_chain(raw, False) == 0
+        string_seconds = time_chain(raw, False, repeat)
+        response_seconds = time_chain(raw, True, repeat)
+        results[f"items_{items}"] = {
+            "body_bytes": len(raw),
+            "string_ms": string_seconds * 1000,
+            "response_ms": response_seconds * 1000,
+            "speedup": string_seconds / response_seconds,
+        }
+    return {
+        "meta": {
+            "created": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "repeat": repeat,
+        },
+        "results": results,
+    }
+
+
+def format_report(report):
+    lines = [f"{'scenario':<16}{'body KiB':>10}{'string ms':>12}{'response ms':>13}{'speedup':>9}"]
+    for name, metrics in report["results"].items():
+        lines.append(
+            f"{name:<16}{metrics['body_bytes'] / 1024:>10.1f}{metrics['string_ms']:>12.2f}"
+            f"{metrics['response_ms']:>13.2f}{metrics['speedup']:>8.1f}x"
+        )
+    return "\n".join(lines)
+
+
+def parse_inputs(argv=None) -> Namespace:
+    parser = ArgumentParser(description="NetworkResponse benchmark")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subparsers.add_parser("run", help="Run the benchmark.")
+    run_parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="Items in the response body.")
+    run_parser.add_argument("--repeat", type=int, default=5, help="Timed runs per size, the median is kept.")
+    run_parser.add_argument("--output", type=str, default=None, help="Write the JSON report to a file.")
+
+    compare_parser = subparsers.add_parser("compare", help="Compare a report against a baseline.")
+    compare_parser.add_argument("baseline", type=str)
+    compare_parser.add_argument("current", type=str)
+    compare_parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.1,
+        help="Relative change that counts as a regression (default: 0.1).",
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_inputs(argv)
+
+    if args.command == "run":
+        report = run(args.sizes, args.repeat)
+        print(format_report(report))
+        if args.output:
+            with open(args.output, "w") as f:
+                json.dump(report, f, indent=4)
+        return 0
+
+    with open(args.baseline, "r") as f:
+        baseline = json.load(f)
+    with open(args.current, "r") as f:
+        current = json.load(f)
+
+    rows, regressed = compare(baseline, current, threshold=args.threshold, directions=METRIC_DIRECTIONS)
+    print(format_comparison(rows))
+    return 1 if regressed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
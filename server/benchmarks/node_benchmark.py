@@ -0,0 +1,338 @@
+#!/usr/bin/env python
+"""
+Microbenchmarks every node registered in EXTENSION_MAPPINGS.
+
+Inputs are built from the widget defaults in each node's INPUT spec. Nodes whose
+first array or string input can be scaled are also timed with that input grown to
+each of --sizes, and nodes whose time grows faster than linearly are flagged.
+
+    python -m benchmarks.node_benchmark --output node_report.json
+    python -m benchmarks.node_benchmark --extension core --node StringSplit
+"""
+
+import asyncio
+import contextlib
+import importlib
+import io
+import json
+import math
+import multiprocessing
+import sys
+import time
+import tracemalloc
+from argparse import ArgumentParser, Namespace
+
+import networkx as nx
+
+from server import Node, Server
+
+DEFAULT_SIZES = [10, 10_000, 1_000_000]
+
+# nodes in these categories reach out to the network or paid APIs
+SKIPPED_CATEGORIES = {"networking", "ai_inference"}
+
+SCALABLE_WIDGET_KINDS = {"array", "string"}
+
+FILLER_TEXT = "lorem ipsum dolor sit amet "
+
+
+def load_node_classes(extensions=None, nodes=None, include_network=False):
+    """Load extensions the way the server does and list the nodes to benchmark"""
+    from main import parse_inputs
+
+    loop = asyncio.new_event_loop()
+    server = Server(loop=loop, args=parse_inputs(disabled=True))
+    with contextlib.redirect_stdout(io.StringIO()):
+        server.load_extensions()
+    loop.close()
+
+    node_classes = []
+    for extension_name, extension in server.extensions.items():
+        if extensions and extension_name not in extensions:
+            continue
+        for node_name, node in extension.get("nodes", {}).items():
+            if nodes and node_name not in nodes:
+                continue
+            python_class = node.get("python_class")
+            categories = {
+                getattr(python_class, "CATEGORY", ""),
+                getattr(python_class, "SUBCATEGORY", ""),
+            }
+            if not include_network and categories & SKIPPED_CATEGORIES:
+                continue
+            node_classes.append((extension_name, node_name, python_class))
+    return node_classes
+
+
+def scalable_input(python_class):
+    """the first array or string input, which is the node's primary data input by convention"""
+    for group in ("required_inputs", "optional_inputs"):
+        for name, spec in python_class.INPUT.get(group, {}).items():
+            widget = spec.get("widget") or {}
+            if widget.get("kind") in SCALABLE_WIDGET_KINDS:
+                return group, name, widget.get("kind")
+    return None
+
+
+def scaled_value(widget_kind, size, element_kind):
+    if widget_kind == "string":
+        return (FILLER_TEXT * (size // len(FILLER_TEXT) + 1))[:size]
+    if element_kind == "number":
+        return [float(i % 97) for i in range(size)]
+    return [FILLER_TEXT.split(" ")[i % 5] for i in range(size)]
+
+
+def build_node_inputs(python_class, overrides=None):
+    """NodeInputGroup dict with widget defaults, in the shape Node._evaluate passes to evaluate"""
+    node = Node(node_id="benchmark", name=python_class.__name__, class_instance=python_class())
+    node_input_group = node.input_template()
+    for group in ("required_inputs", "optional_inputs"):
+        for name, node_input in node_input_group.get(group).items():
+            if (group, name) in (overrides or {}):
+                node_input.values = overrides[(group, name)]
+            elif isinstance(node_input.widget, dict):
+                node_input.values = node_input.widget.get("default")
+    return node_input_group.to_dict()
+
+
+def make_instance(python_class):
+    instance = python_class()
+    instance._memory = {
+        "graph": nx.DiGraph(),
+        "graph_nodes": [],
+        "graph_results": {},
+        "parameterized_rules": {},
+        "evaluation_override_actions": {},
+    }
+    instance._node = Node(node_id="benchmark", name=python_class.__name__, class_instance=instance)
+    return instance
+
+
+def measure(python_class, overrides=None, min_seconds=0.05, max_repeat=5):
+    """best-of-n evaluate time plus the allocation peak of one traced call"""
+    timings = []
+    while len(timings) < max_repeat and sum(timings) < min_seconds:
+        node_inputs = build_node_inputs(python_class, overrides)
+        instance = make_instance(python_class)
+        time_start = time.perf_counter()
+        instance.evaluate(node_inputs)
+        timings.append(time.perf_counter() - time_start)
+
+    node_inputs = build_node_inputs(python_class, overrides)
+    instance = make_instance(python_class)
+    tracemalloc.start()
+    try:
+        instance.evaluate(node_inputs)
+        _, peak_bytes = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {"seconds": min(timings), "peak_bytes": peak_bytes}
+
+
+def benchmark_node(module_name, class_name, sizes, connection):
+    """runs in a child process, sends one message per measurement so a timeout keeps partial results"""
+    python_class = getattr(importlib.import_module(module_name), class_name)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        try:
+            connection.send(("default", None, measure(python_class)))
+        except Exception as e:
+            connection.send(("error", None, f"{type(e).__name__}: {e}"))
+            return
+
+        scalable = scalable_input(python_class)
+        if scalable is None:
+            return
+        group, name, widget_kind = scalable
+
+        # pick the element type that the node accepts at the smallest size
+        element_kind = None
+        for candidate in ("number", "string"):
+            try:
+                overrides = {(group, name): scaled_value(widget_kind, sizes[0], candidate)}
+                measure(python_class, overrides, max_repeat=1)
+                element_kind = candidate
+                break
+            except Exception:
+                if widget_kind == "string":
+                    break
+
+        if element_kind is None:
+            connection.send(("scale_error", sizes[0], "rejects scaled inputs"))
+            return
+
+        connection.send(("scaled_input", None, {"input": name, "element_kind": element_kind}))
+        for size in sizes:
+            overrides = {(group, name): scaled_value(widget_kind, size, element_kind)}
+            try:
+                connection.send(("size", size, measure(python_class, overrides)))
+            except Exception as e:
+                connection.send(("scale_error", size, f"{type(e).__name__}: {e}"))
+                return
+
+
+def growth_exponent(points, key):
+    """log-log slope between the two largest sizes"""
+    if len(points) < 2:
+        return None
+    (small_size, small), (large_size, large) = points[-2], points[-1]
+    if small[key] <= 0 or large[key] <= 0:
+        return None
+    return math.log(large[key] / small[key]) / math.log(large_size / small_size)
+
+
+def run_node(extension_name, node_name, python_class, sizes, timeout):
+    context = multiprocessing.get_context("fork" if sys.platform != "win32" else "spawn")
+    parent_connection, child_connection = context.Pipe(duplex=False)
+    process = context.Process(
+        target=benchmark_node,
+        args=(python_class.__module__, python_class.__name__, sizes, child_connection),
+        daemon=True,
+    )
+    process.start()
+    child_connection.close()
+
+    result = {"extension": extension_name, "node": node_name, "status": "ok", "sizes": {}}
+    deadline = time.monotonic() + timeout
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0 or not parent_connection.poll(remaining):
+            if process.is_alive():
+                process.kill()
+                result["status"] = "timeout"
+            break
+        try:
+            kind, size, value = parent_connection.recv()
+        except EOFError:
+            break
+
+        if kind == "default":
+            result["default"] = value
+        elif kind == "error":
+            result["status"] = "error"
+            result["error"] = value
+        elif kind == "scaled_input":
+            result.update(value)
+        elif kind == "size":
+            result["sizes"][size] = value
+        elif kind == "scale_error":
+            result["scale_error"] = {"size": size, "error": value}
+
+    process.join()
+    parent_connection.close()
+
+    points = sorted(result["sizes"].items())
+    result["time_exponent"] = growth_exponent(points, "seconds")
+    result["memory_exponent"] = growth_exponent(points, "peak_bytes")
+    return result
+
+
+def run(extensions=None, nodes=None, sizes=None, timeout=30.0, superlinear_threshold=1.3, include_network=False):
+    sizes = sorted(sizes or DEFAULT_SIZES)
+    results = []
+    for extension_name, node_name, python_class in load_node_classes(extensions, nodes, include_network):
+        result = run_node(extension_name, node_name, python_class, sizes, timeout)
+        # a node that could not finish the larger sizes in time is treated as super-linear
+        result["superlinear"] = bool(
+            (result["time_exponent"] or 0) > superlinear_threshold
+            or (result["status"] == "timeout" and result["sizes"])
+        )
+        results.append(result)
+    return {"sizes": sizes, "superlinear_threshold": superlinear_threshold, "nodes": results}
+
+
+def ranked(report):
+    """slowest first, by the largest size each node completed and then by default inputs"""
+
+    def sort_key(result):
+        if result["sizes"]:
+            size, metrics = max(result["sizes"].items())
+            return (1, size, metrics["seconds"])
+        return (0, 0, result.get("default", {}).get("seconds", 0))
+
+    return sorted(report["nodes"], key=sort_key, reverse=True)
+
+
+def format_report(report, top=50):
+    lines = [f"{'node':<40}{'status':>9}{'default us':>12}{'largest':>10}{'seconds':>10}{'exponent':>10}{'peak KiB':>11}"]
+    for result in ranked(report)[:top]:
+        default_us = result.get("default", {}).get("seconds", 0) * 1e6
+        largest, seconds, peak = "-", 0.0, 0.0
+        if result["sizes"]:
+            size, metrics = max(result["sizes"].items())
+            largest, seconds, peak = str(size), metrics["seconds"], metrics["peak_bytes"] / 1024
+        exponent = f"{result['time_exponent']:.2f}" if result["time_exponent"] is not None else "-"
+        flag = "  SUPER-LINEAR" if result["superlinear"] else ""
+        lines.append(
+            f"{result['extension'] + '.' + result['node']:<40}{result['status']:>9}{default_us:>12.1f}"
+            f"{largest:>10}{seconds:>10.4f}{exponent:>10}{peak:>11.1f}{flag}"
+        )
+
+    statuses = {}
+    for result in report["nodes"]:
+        statuses[result["status"]] = statuses.get(result["status"], 0) + 1
+    superlinear = [result for result in report["nodes"] if result["superlinear"]]
+    lines.append("")
+    lines.append(f"{len(report['nodes'])} nodes {statuses}, {len(superlinear)} super-linear")
+    for result in superlinear:
+        exponent = f"{result['time_exponent']:.2f}" if result["time_exponent"] is not None else "-"
+        lines.append(
+            f"  {result['extension']}.{result['node']} exponent {exponent} "
+            f"status {result['status']} largest completed {max(result['sizes'])}"
+        )
+    return "\n".join(lines)
+
+
+def parse_inputs(argv=None) -> Namespace:
+    parser = ArgumentParser(description="Per-node microbenchmarks")
+    parser.add_argument("--extension", action="append", help="Only benchmark this extension, may be repeated.")
+    parser.add_argument("--node", action="append", help="Only benchmark this node, may be repeated.")
+    parser.add_argument(
+        "--sizes",
+        type=int,
+        nargs="+",
+        default=DEFAULT_SIZES,
+        help="Element counts for scaled array and string inputs.",
+    )
+    parser.add_argument(
+        "--timeout",
+        type=float,
+        default=30.0,
+        help="Seconds allowed per node across all sizes before it is killed.",
+    )
+    parser.add_argument(
+        "--superlinear-threshold",
+        type=float,
+        default=1.3,
+        help="Log-log growth exponent above which a node is flagged.",
+    )
+    parser.add_argument(
+        "--include-network",
+        action="store_true",
+        help="Also benchmark nodes that make network or paid API calls.",
+    )
+    parser.add_argument("--top", type=int, default=50, help="Rows to print.")
+    parser.add_argument("--output", type=str, default=None, help="Write the JSON report to a file.")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_inputs(argv)
+    report = run(
+        extensions=args.extension,
+        nodes=args.node,
+        sizes=args.sizes,
+        timeout=args.timeout,
+        superlinear_threshold=args.superlinear_threshold,
+        include_network=args.include_network,
+    )
+    print(format_report(report, top=args.top))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=4)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
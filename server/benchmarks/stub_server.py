@@ -0,0 +1,98 @@
+import importlib
+import inspect
+import logging
+import time
+
+from server.domain.utilities.encoders import dumps
+from server.domain.utilities.metrics import Metrics
+from server.infrastructure.servers.session_store import SessionStore
+from server.infrastructure.servers.worker_pool import WorkerPool
+
+# extensions the synthetic workflows are built from
+DEFAULT_EXTENSION_MODULES = [
+    "custom_extensions.core.extension",
+    "custom_extensions.network_requests.extension",
+]
+
+
+class StubServer:
+    """
+    A headless stand-in for Server that GraphExecutor can run against.
+
+    Messages passed to send_json are serialized exactly like the websocket
+    route would serialize them, counted, and then discarded.
+    """
+
+    def __init__(self, extension_modules=None, enable_smart_cache=False):
+        self.session_store = SessionStore()
+        self.client_id = "benchmark_user"
+        self.current_workflow_id = "benchmark_workflow"
+        self.ENABLE_SMART_CACHE = enable_smart_cache
+        self.INSPECTION_DELAY = 0
+
+        self.nodes = {}
+        self.rules = {}
+
+        # nodes always run in-process so their evaluate time can be measured
+        self.worker_pool = WorkerPool(Metrics(), logging.getLogger(__name__), enabled=False)
+        self.run_history = None
+
+        # time spent inside node evaluate methods, used to derive executor overhead
+        self.evaluate_seconds = 0.0
+
+        for module_name in extension_modules or DEFAULT_EXTENSION_MODULES:
+            module = importlib.import_module(module_name)
+            mappings = getattr(module, "EXTENSION_MAPPINGS", None) or {}
+
+            for name, value in mappings.get("nodes", {}).items():
+                self.nodes[name] = {
+                    **value,
+                    "python_class": self._timed_class(value["python_class"]),
+                }
+            for name, value in mappings.get("rules", {}).items():
+                self.rules[name] = value
+
+        self.reset_counters()
+
+    def _timed_class(self, python_class):
+        server = self
+
+        def evaluate(self, node_inputs):
+            time_start = time.perf_counter()
+            try:
+                return python_class.evaluate(self, node_inputs)
+            finally:
+                server.evaluate_seconds += time.perf_counter() - time_start
+
+        async def evaluate_async(self, node_inputs):
+            time_start = time.perf_counter()
+            try:
+                return await python_class.evaluate(self, node_inputs)
+            finally:
+                server.evaluate_seconds += time.perf_counter() - time_start
+
+        if inspect.iscoroutinefunction(python_class.evaluate):
+            evaluate = evaluate_async
+
+        return type(python_class.__name__, (python_class,), {"evaluate": evaluate})
+
+    def reset_counters(self):
+        self.evaluate_seconds = 0.0
+        self.messages = 0
+        self.serialized_bytes = 0
+        self.evaluations = 0
+
+    async def send_json(self, event, data, sid=None, coalesce_key=None):
+        message = {"type": event, "data": data}
+        self.messages += 1
+        self.serialized_bytes += len(dumps(message).encode("utf-8"))
+
+        # the executor announces every node it is about to evaluate with an empty results payload
+        if isinstance(data, dict) and data.get("evaluation_action") and not data.get("results"):
+            self.evaluations += 1
+
+    async def send(self, event, data, sid=None):
+        await self.send_json(event, data, sid)
+
+    def send_sync(self, event, data, sid=None):
+        pass
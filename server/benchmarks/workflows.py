@@ -0,0 +1,141 @@
+"""Synthetic workflow prompts in the same shape the UI posts to /prompt"""
+
+
+class PromptBuilder:
+    def __init__(self):
+        self.prompt = {}
+
+    def add(self, kind, name=None, **inputs):
+        node_id = str(len(self.prompt) + 1)
+        self.prompt[node_id] = {
+            "inputs": inputs,
+            "type": kind,
+            "name": name or kind,
+        }
+        return node_id
+
+
+def link(node_id):
+    return {"originId": str(node_id)}
+
+
+def long_chain(length=500):
+    """nsString followed by a long run of PassThrough nodes"""
+    builder = PromptBuilder()
+    previous = builder.add("nsString", text="chain")
+    for _ in range(length - 1):
+        previous = builder.add("PassThrough", value=link(previous))
+    return builder.prompt
+
+
+def fan_out_fan_in(width=128):
+    """one source feeding `width` branches that are reduced pairwise by ConcatString"""
+    builder = PromptBuilder()
+    source = builder.add("nsString", text="x")
+    layer = [builder.add("PassThrough", value=link(source)) for _ in range(width)]
+
+    while len(layer) > 1:
+        next_layer = []
+        for i in range(0, len(layer) - 1, 2):
+            next_layer.append(
+                builder.add("ConcatString", a=link(layer[i]), b=link(layer[i + 1]))
+            )
+        if len(layer) % 2:
+            next_layer.append(layer[-1])
+        layer = next_layer
+
+    return builder.prompt
+
+
+def diamonds(count=100):
+    """a chain of diamonds: split into two branches and join them again"""
+    builder = PromptBuilder()
+    previous = builder.add("nsString", text="d")
+    for _ in range(count):
+        left = builder.add("PassThrough", value=link(previous))
+        right = builder.add("PassThrough", value=link(previous))
+        joined = builder.add("ConcatString", a=link(left), b=link(right))
+        # keep the payload from doubling on every diamond
+        previous = builder.add("StringStrip", text=link(joined))
+    return builder.prompt
+
+
+def _counted_while_loop(builder, counter_key, iterations, depends_on, body=None):
+    """
+    WhileLoop that decrements `counter_key` in memory until it reaches zero.
+
+    PassThrough nodes with an ignored_input are used to order nodes that
+    otherwise have no link between them. Returns the id of the EndWhileLoop.
+    """
+    key = builder.add("PassThrough", value=counter_key, ignored_input=link(depends_on))
+    initial = builder.add("MemoryWrite", key=link(key), value=iterations)
+    while_loop = builder.add(
+        "WhileLoop", condition_key=counter_key, node_inputs=link(initial)
+    )
+
+    last = while_loop
+    if body is not None:
+        last = body(builder, while_loop)
+
+    key = builder.add("PassThrough", value=counter_key, ignored_input=link(last))
+    read = builder.add("MemoryRead", key=link(key))
+    decrement = builder.add("Add", a=link(read), b=-1)
+    write = builder.add("MemoryWrite", key=counter_key, value=link(decrement))
+    return builder.add(
+        "EndWhileLoop", WhileLoop=link(while_loop), node_inputs=link(write)
+    )
+
+
+def nested_while_loops(outer=10, inner=10):
+    """a WhileLoop whose body contains another WhileLoop"""
+    builder = PromptBuilder()
+    source = builder.add("nsString", text="loop")
+
+    def inner_body(builder, depends_on):
+        return _counted_while_loop(builder, "inner_counter", inner, depends_on)
+
+    _counted_while_loop(builder, "outer_counter", outer, source, body=inner_body)
+    return builder.prompt
+
+
+def if_equal_branches(count=50):
+    """a chain of IfEqual blocks alternating between the true and false branch"""
+    builder = PromptBuilder()
+    previous = builder.add("nsString", text="branch")
+    for i in range(count):
+        if_equal = builder.add("IfEqual", a=link(previous), b=None if i % 2 else "x")
+        if_true = builder.add("IfEqualTrue", IfEqual=link(if_equal))
+        if_false = builder.add(
+            "IfEqualFalse", IfEqual=link(if_equal), node_inputs=link(if_true)
+        )
+        previous = builder.add(
+            "EndIfEqual", IfEqual=link(if_equal), node_inputs=link(if_false)
+        )
+    return builder.prompt
+
+
+def rule_validated(count=100):
+    """a chain of nodes that each validate their input with a TextLength rule"""
+    builder = PromptBuilder()
+    rule = builder.add(
+        "TextLength",
+        value_path="input.required_inputs.value.values",
+        min_length=0,
+        max_length=1024,
+    )
+    previous = builder.add("nsString", text="validated")
+    for _ in range(count):
+        previous = builder.add(
+            "PassThrough", value=link(previous), in_rules=link(rule)
+        )
+    return builder.prompt
+
+
+SCENARIOS = {
+    "long_chain": long_chain,
+    "fan_out_fan_in": fan_out_fan_in,
+    "diamonds": diamonds,
+    "nested_while_loops": nested_while_loops,
+    "if_equal_branches": if_equal_branches,
+    "rule_validated": rule_validated,
+}
@@ -103,6 +103,8 @@ EXTENSION_MAPPINGS = {
     "version": version,
     "description": "Extension for agents inference",
     "javascript_class_name": "agents",
+    # autogen is slow to import, keep it warm in its own process
+    "worker": {"group": "agents", "preload": ["autogen"]},
     "nodes": {
         "CerebrasAgent": {
             "python_class": CerebrasAgent,
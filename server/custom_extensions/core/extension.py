@@ -943,6 +943,10 @@ class ValuePath:
                     node_inputs.get("required_inputs").get("value_path").get("values")
                 )
 
+        # e.g. a NetworkResponse, which reads the path from its once parsed body
+        if hasattr(self.object, "select"):
+            return self.object.select(*resolve_value_path(self.value_path))
+
         if "." in self.value_path:
             value_path_list = resolve_value_path(self.value_path)
             return get_nested(self.object, *value_path_list)
@@ -1102,8 +1106,12 @@ class JSONParse:
             if "json" in node_inputs.get("required_inputs"):
                 self.json = node_inputs.get("required_inputs").get("json").get("values")
 
-        if self.json:
-            output_value = json.loads(self.json)
+        if isinstance(self.json, (str, bytes)):
+            if self.json:
+                output_value = json.loads(self.json)
+        elif self.json is not None:
+            # already structured, e.g. a network response, nothing to parse
+            output_value = self.json
 
         return output_value
 
@@ -1,4 +1,4 @@
-import os
+from .providers import registry
 
 version = "0.0.1"
 
@@ -50,9 +50,7 @@ class OpenAI_LLM:
         "cacheable": False,
     }
 
-    def evaluate(self, node_inputs):
-        self.client = None
-
+    async def evaluate(self, node_inputs):
         # load the node_inputs
         if node_inputs.get("required_inputs"):
             if "prompt" in node_inputs.get("required_inputs"):
@@ -65,24 +63,17 @@ class OpenAI_LLM:
                     node_inputs.get("optional_inputs").get("model").get("values")
                 )
 
-        if not self.client:
-            from openai import OpenAI
-
-            self.client = OpenAI(
-                # This is the default and can be omitted
-                api_key=os.environ.get("OPENAI_API_KEY")
+        async with registry.session("openai") as client:
+            chat_completion = await client.chat.completions.create(
+                messages=[
+                    {
+                        "role": "user",
+                        "content": self.prompt,
+                    }
+                ],
+                model=self.model,
             )
 
-        chat_completion = self.client.chat.completions.create(
-            messages=[
-                {
-                    "role": "user",
-                    "content": self.prompt,
-                }
-            ],
-            model=self.model,
-        )
-
         response = {
             "id": chat_completion.id,
             "created": chat_completion.created,
@@ -141,9 +132,7 @@ class Anthropic_LLM:
         "cacheable": False,
     }
 
-    def evaluate(self, node_inputs):
-        self.client = None
-
+    async def evaluate(self, node_inputs):
         # load the node_inputs
         if node_inputs.get("required_inputs"):
             if "prompt" in node_inputs.get("required_inputs"):
@@ -156,24 +145,17 @@ class Anthropic_LLM:
                     node_inputs.get("optional_inputs").get("model").get("values")
                 )
 
-        if not self.client:
-            from anthropic import Anthropic
-
-            self.client = Anthropic(
-                # This is the default and can be omitted
-                api_key=os.environ.get("ANTHROPIC_API_KEY"),
+        async with registry.session("anthropic") as client:
+            message = await client.messages.create(
+                max_tokens=1024,
+                messages=[
+                    {
+                        "role": "user",
+                        "content": self.prompt,
+                    }
+                ],
+                model=self.model,
             )
-
-        message = self.client.messages.create(
-            max_tokens=1024,
-            messages=[
-                {
-                    "role": "user",
-                    "content": self.prompt,
-                }
-            ],
-            model=self.model,
-        )
         return serialize_object(message)
 
 
@@ -211,9 +193,7 @@ class Perplexity_LLM:
         "cacheable": False,
     }
 
-    def evaluate(self, node_inputs):
-        self.client = None
-
+    async def evaluate(self, node_inputs):
         # load the node_inputs
         if node_inputs.get("required_inputs"):
             if "prompt" in node_inputs.get("required_inputs"):
@@ -226,25 +206,17 @@ class Perplexity_LLM:
                     node_inputs.get("optional_inputs").get("model").get("values")
                 )
 
-        if not self.client:
-            from openai import OpenAI
-
-            self.client = OpenAI(
-                # This is the default and can be omitted
-                api_key=os.environ.get("PPL_API_KEY"),
-                base_url="https://api.perplexity.ai",
+        async with registry.session("perplexity") as client:
+            chat_completion = await client.chat.completions.create(
+                messages=[
+                    {
+                        "role": "user",
+                        "content": self.prompt,
+                    }
+                ],
+                model=self.model,
             )
 
-        chat_completion = self.client.chat.completions.create(
-            messages=[
-                {
-                    "role": "user",
-                    "content": self.prompt,
-                }
-            ],
-            model=self.model,
-        )
-
         response = {
             "id": chat_completion.id,
             "created": chat_completion.created,
@@ -299,9 +271,7 @@ class Cohere_LLM:
         "cacheable": False,
     }
 
-    def evaluate(self, node_inputs):
-        self.client = None
-
+    async def evaluate(self, node_inputs):
         # load the node_inputs
         if node_inputs.get("required_inputs"):
             if "prompt" in node_inputs.get("required_inputs"):
@@ -314,14 +284,8 @@ class Cohere_LLM:
                     node_inputs.get("optional_inputs").get("model").get("values")
                 )
 
-        if not self.client:
-            import cohere
-
-            self.client = cohere.Client(
-                api_key=os.environ.get("CO_API_KEY"),
-            )
-
-        chat = self.client.chat(message=self.prompt, model="command")
+        async with registry.session("cohere") as client:
+            chat = await client.chat(message=self.prompt, model="command")
 
         resp = {
             "text": chat.text,
@@ -370,8 +334,7 @@ class Cerebras_LLM:
         "cacheable": False,
     }
 
-    def evaluate(self, node_inputs):
-        self.client = None
+    async def evaluate(self, node_inputs):
         # load the node_inputs
         if node_inputs.get("required_inputs"):
             if "prompt" in node_inputs.get("required_inputs"):
@@ -384,22 +347,16 @@ class Cerebras_LLM:
                     node_inputs.get("optional_inputs").get("model").get("values")
                 )
 
-        if not self.client:
-            from cerebras.cloud.sdk import Cerebras
-
-            self.client = Cerebras(
-                api_key=os.environ.get("CEREBRAS_API_KEY"),
+        async with registry.session("cerebras") as client:
+            chat_completion = await client.chat.completions.create(
+                model=self.model,
+                messages=[
+                    {
+                        "role": "user",
+                        "content": self.prompt,
+                    }
+                ],
             )
-
-        chat_completion = self.client.chat.completions.create(
-            model=self.model,
-            messages=[
-                {
-                    "role": "user",
-                    "content": self.prompt,
-                }
-            ],
-        )
         response = serialize_object(chat_completion)
         return response
 
@@ -438,8 +395,7 @@ class Groq_LLM:
         "cacheable": False,
     }
 
-    def evaluate(self, node_inputs):
-        self.client = None
+    async def evaluate(self, node_inputs):
         # load the node_inputs
         if node_inputs.get("required_inputs"):
             if "prompt" in node_inputs.get("required_inputs"):
@@ -452,23 +408,16 @@ class Groq_LLM:
                     node_inputs.get("optional_inputs").get("model").get("values")
                 )
 
-        if not self.client:
-            from groq import Groq
-
-            self.client = Groq(
-                # This is the default and can be omitted
-                api_key=os.environ.get("GROQ_API_KEY"),
+        async with registry.session("groq") as client:
+            chat_completion = await client.chat.completions.create(
+                model=self.model,
+                messages=[
+                    {
+                        "role": "user",
+                        "content": self.prompt,
+                    }
+                ],
             )
-
-        chat_completion = self.client.chat.completions.create(
-            model=self.model,
-            messages=[
-                {
-                    "role": "user",
-                    "content": self.prompt,
-                }
-            ],
-        )
         response = serialize_object(chat_completion)
         return response
 
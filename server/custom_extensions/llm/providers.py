@@ -0,0 +1,171 @@
+import asyncio
+import contextlib
+import os
+import weakref
+
+
+def http_client(timeout, max_connections):
+    """a pooled httpx client, the one every SDK below is built on"""
+    import httpx
+
+    return httpx.AsyncClient(
+        timeout=timeout,
+        limits=httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_connections,
+        ),
+    )
+
+
+def create_openai(api_key, base_url, timeout, max_retries, max_connections):
+    from openai import AsyncOpenAI
+
+    return AsyncOpenAI(
+        api_key=api_key,
+        base_url=base_url,
+        timeout=timeout,
+        max_retries=max_retries,
+        http_client=http_client(timeout, max_connections),
+    )
+
+
+def create_anthropic(api_key, base_url, timeout, max_retries, max_connections):
+    from anthropic import AsyncAnthropic
+
+    return AsyncAnthropic(
+        api_key=api_key,
+        base_url=base_url,
+        timeout=timeout,
+        max_retries=max_retries,
+        http_client=http_client(timeout, max_connections),
+    )
+
+
+def create_cohere(api_key, base_url, timeout, max_retries, max_connections):
+    import cohere
+
+    options = {"base_url": base_url} if base_url else {}
+    return cohere.AsyncClient(
+        api_key=api_key,
+        timeout=timeout,
+        httpx_client=http_client(timeout, max_connections),
+        **options,
+    )
+
+
+def create_cerebras(api_key, base_url, timeout, max_retries, max_connections):
+    from cerebras.cloud.sdk import AsyncCerebras
+
+    return AsyncCerebras(
+        api_key=api_key,
+        base_url=base_url,
+        timeout=timeout,
+        max_retries=max_retries,
+        http_client=http_client(timeout, max_connections),
+    )
+
+
+def create_groq(api_key, base_url, timeout, max_retries, max_connections):
+    from groq import AsyncGroq
+
+    return AsyncGroq(
+        api_key=api_key,
+        base_url=base_url,
+        timeout=timeout,
+        max_retries=max_retries,
+        http_client=http_client(timeout, max_connections),
+    )
+
+
+class Provider:
+    def __init__(self, name, factory, api_key_env, base_url_env, base_url=None):
+        self.name = name
+        self.factory = factory
+        self.api_key_env = api_key_env
+        # point a provider somewhere else, e.g. OPENAI_BASE_URL at the local stub server
+        self.base_url_env = base_url_env
+        self.base_url = base_url
+
+
+class ProviderRegistry:
+    """
+    Long-lived async clients for the LLM providers, shared by every node.
+
+    There is one client per provider, API key and base url, so connections stay pooled
+    and alive across runs instead of being opened by every evaluate. Clients, like
+    their connections, belong to an event loop, so each loop has its own. At most
+    concurrency calls to one provider with one key are in flight on a loop, the rest
+    wait their turn. API keys and base urls default to the provider's environment
+    variables.
+    """
+
+    def __init__(self, timeout=60.0, max_retries=2, max_connections=100, concurrency=16):
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.max_connections = max_connections
+        self.concurrency = concurrency
+        self.providers = {}
+        self.clients = weakref.WeakKeyDictionary()
+        self.semaphores = weakref.WeakKeyDictionary()
+
+    def register(self, provider):
+        self.providers[provider.name] = provider
+
+    def resolve(self, name, api_key=None, base_url=None):
+        provider = self.providers.get(name)
+        if provider is None:
+            raise ValueError(f"Unknown LLM provider {name}")
+        api_key = api_key or os.environ.get(provider.api_key_env)
+        base_url = base_url or os.environ.get(provider.base_url_env) or provider.base_url
+        return provider, api_key, base_url
+
+    def client(self, name, api_key=None, base_url=None):
+        """the client of the running event loop for this provider, key and base url"""
+        provider, api_key, base_url = self.resolve(name, api_key, base_url)
+        clients = self.clients.setdefault(asyncio.get_running_loop(), {})
+        key = (name, api_key, base_url)
+        if key not in clients:
+            clients[key] = provider.factory(
+                api_key, base_url, self.timeout, self.max_retries, self.max_connections
+            )
+        return clients[key]
+
+    @contextlib.asynccontextmanager
+    async def session(self, name, api_key=None, base_url=None):
+        """a client to make one call with, once the provider's concurrency limit allows it"""
+        _, resolved_key, _ = self.resolve(name, api_key, base_url)
+        semaphores = self.semaphores.setdefault(asyncio.get_running_loop(), {})
+        semaphore = semaphores.get((name, resolved_key))
+        if semaphore is None:
+            semaphore = semaphores[(name, resolved_key)] = asyncio.Semaphore(self.concurrency)
+
+        async with semaphore:
+            yield self.client(name, api_key, base_url)
+
+    async def close(self):
+        """closes the clients of the running event loop"""
+        for client in self.clients.pop(asyncio.get_running_loop(), {}).values():
+            close = getattr(client, "close", None)
+            if close is not None:
+                await close()
+
+
+registry = ProviderRegistry()
+registry.register(Provider("openai", create_openai, "OPENAI_API_KEY", "OPENAI_BASE_URL"))
+registry.register(
+    Provider("anthropic", create_anthropic, "ANTHROPIC_API_KEY", "ANTHROPIC_BASE_URL")
+)
+registry.register(
+    Provider(
+        "perplexity",
+        create_openai,
+        "PPL_API_KEY",
+        "PPL_BASE_URL",
+        base_url="https://api.perplexity.ai",
+    )
+)
+registry.register(Provider("cohere", create_cohere, "CO_API_KEY", "CO_API_URL"))
+registry.register(
+    Provider("cerebras", create_cerebras, "CEREBRAS_API_KEY", "CEREBRAS_BASE_URL")
+)
+registry.register(Provider("groq", create_groq, "GROQ_API_KEY", "GROQ_BASE_URL"))
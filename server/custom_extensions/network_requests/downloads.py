@@ -0,0 +1,319 @@
+import asyncio
+import hashlib
+import json
+import os
+import re
+import time
+
+CHUNK_SIZE = 1024 * 1024
+
+# resume state is written after this many bytes of each segment, not every chunk
+STATE_INTERVAL = 16 * 1024 * 1024
+
+CONTENT_RANGE_PATTERN = re.compile(r"bytes (\d+)-(\d+)/(\d+|\*)")
+
+
+class DownloadError(Exception):
+    def __init__(self, message, status=None):
+        super().__init__(message)
+        # the HTTP status when the server answered with an error
+        self.status = status
+
+
+class ResourceChanged(DownloadError):
+    """the .part file no longer matches the resource, the download starts over"""
+
+
+class Progress:
+    """reports bytes done to a callback at most every interval seconds, and always at the end"""
+
+    def __init__(self, callback, total, done=0, interval=0.5):
+        self.callback = callback
+        self.total = total
+        self.done = done
+        self.interval = interval
+        self.reported_at = 0.0
+
+    async def advance(self, size):
+        self.done += size
+        if self.callback is not None and time.monotonic() - self.reported_at >= self.interval:
+            self.reported_at = time.monotonic()
+            await self.callback(self.done, self.total)
+
+    async def finish(self):
+        if self.callback is not None:
+            await self.callback(self.done, self.total)
+
+
+def response_state(url, response):
+    """what a 200 response says about the resource: size, ETag and whether ranges are served"""
+    size = response.headers.get("Content-Length")
+    return {
+        "url": url,
+        "etag": response.headers.get("ETag"),
+        "size": int(size) if size and size.isdigit() else None,
+        "ranges": response.headers.get("Accept-Ranges", "").lower() == "bytes",
+        "segments": None,
+    }
+
+
+def open_part(part):
+    """the .part file opened for writes anywhere in it, created when it is missing"""
+    return os.fdopen(os.open(part, os.O_RDWR | os.O_CREAT, 0o644), "r+b")
+
+
+def read_state(state_path):
+    try:
+        with open(state_path, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def write_state(state_path, state):
+    temporary = f"{state_path}.tmp"
+    with open(temporary, "w") as f:
+        json.dump(state, f)
+    os.replace(temporary, state_path)
+
+
+def file_sha256(path):
+    hasher = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(CHUNK_SIZE):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+def write_at(f, offset, chunk):
+    f.seek(offset)
+    f.write(chunk)
+
+
+def content_range(response):
+    """(start, total size) from a 206 response, total is None when the server doesn't say"""
+    match = CONTENT_RANGE_PATTERN.match(response.headers.get("Content-Range", ""))
+    if match is None:
+        raise DownloadError("206 response without a usable Content-Range")
+    total = match.group(3)
+    return int(match.group(1)), (int(total) if total.isdigit() else None)
+
+
+def split_segments(size, segments):
+    """every segment is [start, end (inclusive), next byte to fetch]"""
+    length = -(-size // segments)
+    return [[start, min(start + length, size) - 1, start] for start in range(0, size, length)]
+
+
+async def write_body(response, f, offset, progress, on_written=None, end=None):
+    """copies the body into f from offset, chunk by chunk, off the event loop, up to byte end"""
+    loop = asyncio.get_running_loop()
+    async for chunk in response.content.iter_chunked(CHUNK_SIZE):
+        if end is not None:
+            chunk = chunk[: end + 1 - offset]
+        await loop.run_in_executor(None, write_at, f, offset, chunk)
+        offset += len(chunk)
+        await progress.advance(len(chunk))
+        if on_written is not None:
+            await on_written(offset)
+        if end is not None and offset > end:
+            break
+    return offset
+
+
+def segment_saver(segment, state, state_path):
+    """on_written for write_body, keeps a segment's position and writes the state now and then"""
+    loop = asyncio.get_running_loop()
+    written = [segment[2]]
+
+    async def save(offset):
+        segment[2] = offset
+        if offset - written[0] >= STATE_INTERVAL:
+            written[0] = offset
+            await loop.run_in_executor(None, write_state, state_path, state)
+
+    return save
+
+
+async def download(
+    engine,
+    url,
+    path,
+    headers=None,
+    sha256=None,
+    segments=4,
+    segment_threshold=64 * 1024 * 1024,
+    progress=None,
+    retry_policy=None,
+):
+    """
+    Downloads url to path without holding the body in memory.
+
+    The body is written to path + ".part" in chunks and renamed to path once it is
+    complete and, if sha256 is given, verified. A download that was interrupted resumes
+    with a Range request, and If-Range with its ETag, so a resource that changed is
+    fetched again from the start. There's no HEAD request: when the first response shows
+    a file of at least segment_threshold bytes and byte ranges, it becomes the first of
+    `segments` concurrent ranges. progress(done, total) is awaited as bytes arrive.
+    Returns {"path", "size", "sha256", "status"}, with sha256 only when it was verified
+    and status that of the response the body came from (206 when it was resumed). A
+    server error raises DownloadError with its status.
+    """
+    if not path:
+        raise ValueError(f"no path to download {url} to")
+    headers = dict(headers or {})
+    # byte ranges have to be ranges of the file itself, not of a compressed encoding of it
+    headers.setdefault("Accept-Encoding", "identity")
+    part = f"{path}.part"
+    state_path = f"{part}.json"
+    loop = asyncio.get_running_loop()
+
+    state = await loop.run_in_executor(None, read_state, state_path)
+    if state is None or state.get("url") != url or not os.path.exists(part):
+        state = None
+
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    tracker = Progress(progress, state and state.get("size"))
+    arguments = (engine, url, headers, part, state_path)
+    options = (segments, segment_threshold, tracker, retry_policy)
+    try:
+        status, state = await fetch(*arguments, state, *options)
+    except ResourceChanged:
+        if state is None:
+            raise
+        status, state = await fetch(*arguments, None, *options)
+    await tracker.finish()
+
+    actual_size = os.path.getsize(part)
+    if state["size"] is not None and actual_size != state["size"]:
+        raise DownloadError(f"downloaded {actual_size} bytes of {state['size']} from {url}")
+
+    if sha256 is not None:
+        actual = await loop.run_in_executor(None, file_sha256, part)
+        if actual != sha256.lower():
+            os.remove(part)
+            os.remove(state_path)
+            raise DownloadError(f"sha256 of {url} is {actual}, expected {sha256}")
+
+    os.replace(part, path)
+    if os.path.exists(state_path):
+        os.remove(state_path)
+    return {
+        "path": path,
+        "size": actual_size,
+        "sha256": sha256.lower() if sha256 else None,
+        "status": status,
+    }
+
+
+async def fetch(engine, url, headers, part, state_path, state, segments, segment_threshold, tracker, retry_policy):
+    """fetches what the .part file is missing, returns (status, state)"""
+    if state is not None and state.get("segments"):
+        await download_segments(engine, url, headers, part, state_path, state, tracker, retry_policy)
+        return 206, state
+
+    loop = asyncio.get_running_loop()
+    request_headers = dict(headers)
+    offset = os.path.getsize(part) if state is not None else 0
+    if offset:
+        request_headers["Range"] = f"bytes={offset}-"
+        # a changed resource is sent whole instead of the rest of the old one
+        if state["etag"]:
+            request_headers["If-Range"] = state["etag"]
+
+    async def read(response):
+        # write where the response says it starts: a retried request repeats the original
+        # range, and a changed resource (If-Range) comes back whole
+        if response.status == 206:
+            start, total = content_range(response)
+            if state is None or total != state["size"]:
+                raise ResourceChanged(f"{url} changed since the download started")
+            current = state
+        elif response.status == 200:
+            start, current = 0, response_state(url, response)
+        elif response.status == 416 and state is not None:
+            raise ResourceChanged(f"{url} no longer has the bytes the download stopped at")
+        else:
+            raise DownloadError(f"GET {url} returned {response.status}", response.status)
+
+        size = current["size"]
+        if (
+            start == 0
+            and current.get("ranges")
+            and size is not None
+            and size >= segment_threshold
+            and segments > 1
+        ):
+            current["segments"] = split_segments(size, segments)
+
+        tracker.total, tracker.done = size, start
+        await loop.run_in_executor(None, write_state, state_path, current)
+        f = await loop.run_in_executor(None, open_part, part)
+        try:
+            if current["segments"]:
+                # this response is the first segment, the others are fetched beside it
+                await loop.run_in_executor(None, f.truncate, size)
+                first = current["segments"][0]
+                await write_body(
+                    response, f, 0, tracker, segment_saver(first, current, state_path), first[1]
+                )
+            else:
+                await loop.run_in_executor(None, f.truncate, start)
+                await write_body(response, f, start, tracker)
+        finally:
+            await loop.run_in_executor(None, f.close)
+        return response.status, current
+
+    status, state = await engine.send(url, "GET", None, request_headers, read, retry_policy)
+    if state["segments"]:
+        await download_segments(engine, url, headers, part, state_path, state, tracker, retry_policy)
+    return status, state
+
+
+async def download_segments(engine, url, headers, part, state_path, state, tracker, retry_policy):
+    loop = asyncio.get_running_loop()
+    tracker.total = state["size"]
+    tracker.done = sum(position - start for start, _, position in state["segments"])
+
+    async def fetch_segment(segment):
+        start, end, position = segment
+        if position > end:
+            return
+
+        async def read(response):
+            if response.status in (200, 416):
+                raise ResourceChanged(f"GET {url} answered a range request with {response.status}")
+            if response.status != 206:
+                raise DownloadError(f"GET {url} returned {response.status}", response.status)
+            offset, total = content_range(response)
+            if total is not None and total != state["size"]:
+                raise ResourceChanged(f"{url} changed since the download started")
+            # progress already counted bytes a retried attempt fetches again
+            tracker.done -= segment[2] - offset
+            f = await loop.run_in_executor(None, open_part, part)
+            try:
+                await write_body(
+                    response, f, offset, tracker, segment_saver(segment, state, state_path), end
+                )
+            finally:
+                await loop.run_in_executor(None, f.close)
+
+        request_headers = dict(headers, Range=f"bytes={position}-{end}")
+        if state["etag"]:
+            request_headers["If-Range"] = state["etag"]
+        await engine.send(url, "GET", None, request_headers, read, retry_policy)
+
+    tasks = [asyncio.ensure_future(fetch_segment(segment)) for segment in state["segments"]]
+    try:
+        await asyncio.gather(*tasks)
+    except BaseException:
+        # nothing may still be writing to the .part file if the download starts over
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+    finally:
+        # whatever finished is kept for the next attempt
+        await loop.run_in_executor(None, write_state, state_path, state)
@@ -0,0 +1,248 @@
+import asyncio
+import json
+import os
+import threading
+import time
+import weakref
+
+import aiohttp
+from yarl import URL
+
+from .rate_limit import HostRateLimiter
+from .retry import RETRY_EXCEPTIONS, CircuitBreaker, CircuitOpenError, RetryPolicy
+
+METHODS = ("GET", "POST", "PUT", "PATCH", "DELETE", "HEAD")
+
+
+class HTTPEngine:
+    """
+    The HTTP client every network node shares.
+
+    Connections are pooled and kept alive, at most limit_per_host to one host, and DNS
+    lookups are cached for dns_cache_ttl seconds. A ClientSession belongs to one event
+    loop, so there is a session per loop: nodes awaiting on the server's loop share one,
+    and synchronous callers share another through run(), which drives the engine's own
+    loop thread.
+
+    Requests are retried by a RetryPolicy, and each host has a CircuitBreaker so a host
+    that keeps failing is not called at all for a while. Retries, failures and breaker
+    trips are counted in metrics once a server's Metrics is bound to the engine.
+    """
+
+    def __init__(
+        self,
+        limit=100,
+        limit_per_host=16,
+        dns_cache_ttl=300,
+        connect_timeout=10.0,
+        total_timeout=300.0,
+        retry_policy=None,
+        failure_threshold=5,
+        reset_timeout=30.0,
+    ):
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.dns_cache_ttl = dns_cache_ttl
+        self.timeout = aiohttp.ClientTimeout(total=total_timeout, sock_connect=connect_timeout)
+        self.sessions = weakref.WeakKeyDictionary()
+        self.loop = None
+        self.lock = threading.Lock()
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.breakers = {}
+        self.metrics = None
+        # token buckets by (host, rate, burst), shared by every node and run
+        self.rate_limits = {}
+
+    def session(self):
+        """the session of the running event loop"""
+        loop = asyncio.get_running_loop()
+        session = self.sessions.get(loop)
+        if session is None or session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.limit,
+                limit_per_host=self.limit_per_host,
+                ttl_dns_cache=self.dns_cache_ttl,
+            )
+            session = aiohttp.ClientSession(connector=connector, timeout=self.timeout)
+            self.sessions[loop] = session
+        return session
+
+    def rate_limiter(self, rate, burst=None):
+        """a HostRateLimiter whose buckets are shared with every other one of the same rate"""
+        return HostRateLimiter(rate, burst, buckets=self.rate_limits)
+
+    def breaker(self, host):
+        breaker = self.breakers.get(host)
+        if breaker is None:
+            breaker = self.breakers[host] = CircuitBreaker(
+                self.failure_threshold, self.reset_timeout
+            )
+        return breaker
+
+    async def request(
+        self,
+        url,
+        method="GET",
+        payload=None,
+        headers=None,
+        response_type="json",
+        fetch_handle_parameters=None,
+        retry_policy=None,
+    ):
+        """one request, returns (status, body) with the body read as response_type"""
+        return await self.send(
+            url,
+            method,
+            payload,
+            headers,
+            lambda response: read_response(response, response_type, fetch_handle_parameters or {}),
+            retry_policy,
+        )
+
+    async def send(self, url, method, payload, headers, read, retry_policy=None):
+        """sends a request until the retry policy keeps a response, returns await read(response)"""
+        if method not in METHODS:
+            raise ValueError("Invalid method")
+
+        policy = retry_policy or self.retry_policy
+        host = URL(url).host
+        breaker = self.breaker(host)
+        attempt = 0
+        while True:
+            if not breaker.allow():
+                self.count("http.breaker.rejected")
+                raise CircuitOpenError(host, breaker.retry_in())
+
+            self.count("http.requests")
+            time_start = time.perf_counter()
+            try:
+                async with self.session().request(
+                    method, url, json=payload, headers=headers
+                ) as response:
+                    delay = policy.status_delay(
+                        attempt, response.status, response.headers.get("Retry-After"), method
+                    )
+                    if delay is None:
+                        result = await read(response)
+            except RETRY_EXCEPTIONS as e:
+                self.failed(breaker, host)
+                delay = policy.exception_delay(attempt, e, method)
+                if delay is None:
+                    raise
+                print(f"retrying {method} {url} in {delay:.2f}s after {type(e).__name__}: {e}")
+            else:
+                # a host that answers, even with a client error, is up
+                if response.status >= 500:
+                    self.failed(breaker, host)
+                else:
+                    breaker.record_success()
+                if delay is None:
+                    self.observe("http.request", time.perf_counter() - time_start)
+                    return result
+                self.count(f"http.retries.{response.status}")
+
+            self.count("http.retries")
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    def failed(self, breaker, host):
+        self.count("http.failures")
+        if breaker.record_failure():
+            self.count("http.breaker.opened")
+            print(f"circuit opened for {host}")
+        if self.metrics is not None:
+            self.metrics.set_gauge(
+                "http.breakers.open",
+                sum(1 for b in self.breakers.values() if b.state != "closed"),
+            )
+
+    def count(self, name, value=1):
+        if self.metrics is not None:
+            self.metrics.increment(name, value)
+
+    def observe(self, name, seconds):
+        if self.metrics is not None:
+            self.metrics.observe(name, seconds)
+
+    def breaker_states(self):
+        return {
+            host: {"state": breaker.state, "failures": breaker.failures}
+            for host, breaker in self.breakers.items()
+        }
+
+    def run(self, coroutine):
+        """waits for coroutine on the engine's loop thread, for callers that can't await"""
+        with self.lock:
+            if self.loop is None:
+                self.loop = asyncio.new_event_loop()
+                threading.Thread(
+                    target=self.loop.run_forever, name="http-engine", daemon=True
+                ).start()
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop).result()
+
+    async def close(self):
+        session = self.sessions.pop(asyncio.get_running_loop(), None)
+        if session is not None:
+            await session.close()
+
+
+def decode_body(status, content_type, body, response_type, fetch_handle_parameters):
+    """(status, body) from a body that was read in full, like read_response"""
+    asset_id = fetch_handle_parameters.get("id")
+    try:
+        if response_type == "json":
+            return status, json.loads(body)
+        elif response_type == "binary_file":
+            with open(asset_id, "wb") as f:
+                f.write(body)
+            return status, asset_id
+        else:
+            charset = "utf-8"
+            if "charset=" in (content_type or ""):
+                charset = content_type.split("charset=")[-1].split(";")[0].strip()
+            return status, body.decode(charset, errors="replace")
+    except ValueError:
+        raise Exception(
+            f"Error parsing response as {response_type}. HTTP status code: {status}"
+        )
+    except IOError:
+        raise Exception(f"Error writing to file {asset_id}. HTTP status code: {status}")
+
+
+async def read_response(response, response_type, fetch_handle_parameters):
+    asset_id = fetch_handle_parameters.get("id")
+    status = response.status
+
+    try:
+        if response_type == "json":
+            return status, await response.json(content_type=None)
+        elif response_type == "binary_file":
+            # written beside the target and renamed, a partial file never takes its place
+            loop = asyncio.get_running_loop()
+            part = f"{asset_id}.part"
+            f = await loop.run_in_executor(None, open, part, "wb")
+            try:
+                async for chunk in response.content.iter_chunked(1024 * 1024):
+                    await loop.run_in_executor(None, f.write, chunk)
+            finally:
+                await loop.run_in_executor(None, f.close)
+            os.replace(part, asset_id)
+            return status, asset_id
+        else:
+            return status, await response.text()
+    except RETRY_EXCEPTIONS:
+        # the connection dropped mid-body, the engine may retry
+        raise
+    except ValueError:
+        raise Exception(
+            f"Error parsing response as {response_type}. HTTP status code: {status}"
+        )
+    except IOError:
+        raise Exception(f"Error writing to file {asset_id}. HTTP status code: {status}")
+    except Exception as e:
+        raise Exception(f"Unexpected error: {str(e)}. HTTP status code: {status}")
+
+
+engine = HTTPEngine()
@@ -1,36 +1,211 @@
-import requests
+import asyncio
 import json
+import os
 import time
+from urllib.parse import quote, urlparse
 
-from concurrent.futures import ThreadPoolExecutor
-from multiprocessing import cpu_count
+from .engine import decode_body, engine
+from .downloads import DownloadError, download
+from .http_cache import http_cache
+from .response import NetworkResponse, read_network_response
 
 version = "0.0.1"
 
 
-def fetch_handle(response, response_type, fetch_handle_parameters):
-    asset_id = fetch_handle_parameters.get("id")
-    status = response.status_code
-
-    try:
-        if response_type == "json":
-            resp_json = response.json()
-            return status, resp_json
-        elif response_type == "binary_file":
-            with open(asset_id, "wb") as f:
-                f.write(response.content)
-            return status, asset_id
+async def fetch_async(
+    url,
+    method="GET",
+    payload=None,
+    headers=None,
+    response_type="json",
+    fetch_handle_parameters={},
+    retry_policy=None,
+    cache=False,
+    cache_ttl=None,
+):
+    """
+    fetch a single request, retried by the engine's retry policy unless one is given
+
+    with cache a GET is answered from the shared HTTP cache when it can be, cache_ttl
+    overrides how long the response stays fresh. with response_type "response" the body
+    is a NetworkResponse, a large one already parsed off the event loop
+    """
+    if response_type == "response":
+        if cache and method == "GET":
+            entry = await http_cache.get(engine, url, headers, cache_ttl, retry_policy)
+            status, response_headers, raw = entry.status, entry.headers, entry.body
         else:
-            text = response.text
-            return status, text
-    except ValueError:
-        raise Exception(
-            f"Error parsing response as {response_type}. HTTP status code: {status}"
+            status, response_headers, raw = await engine.send(
+                url, method, payload, headers, read_network_response, retry_policy
+            )
+        return status, await NetworkResponse(None, status, response_headers, raw).parse()
+
+    if response_type == "binary_file" and method == "GET":
+        path = fetch_handle_parameters.get("id")
+        if not path:
+            raise ValueError("a binary_file response needs fetch_handle_parameters['id'], the path to write it to")
+        # streamed to disk, resumable, whatever its size
+        try:
+            result = await download(engine, url, path, headers, retry_policy=retry_policy)
+        except DownloadError as e:
+            if e.status is None:
+                raise
+            # an error response isn't written to the file
+            return e.status, None
+        return result["status"], result["path"]
+
+    if cache and method == "GET":
+        entry = await http_cache.get(engine, url, headers, cache_ttl, retry_policy)
+        return decode_body(
+            entry.status,
+            entry.headers.get("Content-Type"),
+            entry.body,
+            response_type,
+            fetch_handle_parameters,
         )
-    except IOError:
-        raise Exception(f"Error writing to file {asset_id}. HTTP status code: {status}")
-    except Exception as e:
-        raise Exception(f"Unexpected error: {str(e)}. HTTP status code: {status}")
+
+    return await engine.request(
+        url, method, payload, headers, response_type, fetch_handle_parameters, retry_policy
+    )
+
+
+def progress_reporter(node):
+    """sends a node's progress to the user running it as "progress" messages"""
+    memory = getattr(node, "_memory", None) or {}
+    server = memory.get("server")
+    run_record = memory.get("run_record")
+    if server is None or run_record is None or getattr(node, "_node", None) is None:
+        return None
+
+    prompt_id = run_record["prompt_id"]
+    node_id = node._node.node_id
+
+    async def report(done, total):
+        await server.send_json(
+            "progress",
+            {"prompt_id": prompt_id, "node": node_id, "value": done, "max": total},
+            sid=run_record["user_id"],
+            # only the latest progress of a node is worth sending to a slow client
+            coalesce_key=("progress", prompt_id, node_id),
+        )
+
+    return report
+
+
+def results_reporter(node, interval=0.5):
+    """
+    sends a node's results to the user running it as "partial_results" messages
+
+    returns (report, flush): report(index, result) buffers a result and sends what is
+    buffered at most every interval seconds, flush() sends whatever is left
+    """
+    memory = getattr(node, "_memory", None) or {}
+    server = memory.get("server")
+    run_record = memory.get("run_record")
+    if server is None or run_record is None or getattr(node, "_node", None) is None:
+        return None, None
+
+    prompt_id = run_record["prompt_id"]
+    node_id = node._node.node_id
+    pending = []
+    sent_at = [0.0]
+
+    async def flush():
+        if not pending:
+            return
+        results = list(pending)
+        pending.clear()
+        sent_at[0] = time.monotonic()
+        await server.send_json(
+            "partial_results",
+            {"prompt_id": prompt_id, "node": node_id, "results": results},
+            sid=run_record["user_id"],
+        )
+
+    async def report(index, result):
+        pending.append({"index": index, "result": result})
+        if time.monotonic() - sent_at[0] >= interval:
+            await flush()
+
+    return report, flush
+
+
+def bind_server(node):
+    """counts the engine's requests, retries and breaker trips in the server's /metrics"""
+    server = getattr(node, "_memory", {}).get("server")
+    if engine.metrics is None and getattr(server, "metrics", None) is not None:
+        engine.metrics = server.metrics
+
+
+async def process_batch_async(
+    batch,
+    response_type="json",
+    concurrency=None,
+    rate_limiter=None,
+    return_exceptions=False,
+    on_result=None,
+):
+    """
+    process a batch of requests concurrently on the shared engine, results in batch order
+
+    at most concurrency requests are in flight and rate_limiter (a HostRateLimiter) paces
+    each host. with return_exceptions a failed request doesn't fail the batch, its result
+    carries the error instead. on_result(index, result) is awaited as each one finishes.
+    """
+    semaphore = asyncio.Semaphore(concurrency) if concurrency else None
+
+    async def run(index, request):
+        try:
+            # wait for the host's token before taking a slot, so a slow host's queue
+            # doesn't hold slots other hosts could use
+            if rate_limiter is not None:
+                await rate_limiter.acquire(request.get("url"))
+            if semaphore is not None:
+                await semaphore.acquire()
+            try:
+                status, body = await fetch_async(
+                    request.get("url"),
+                    request.get("method", "GET"),
+                    request.get("payload"),
+                    request.get("headers"),
+                    response_type,
+                    fetch_handle_parameters=request.get("fetch_handle_parameters", {}),
+                    cache=request.get("cache", False),
+                    cache_ttl=request.get("cache_ttl"),
+                )
+            finally:
+                if semaphore is not None:
+                    semaphore.release()
+            if response_type == "response":
+                body.request = request
+                result = body
+            else:
+                result = {"request": request, "response": {"status": status, "body": body}}
+        except Exception as e:
+            if not return_exceptions:
+                raise
+            error = f"{type(e).__name__}: {e}"
+            if response_type == "response":
+                result = NetworkResponse(request, None, {}, b"", error=error)
+            else:
+                result = {
+                    "request": request,
+                    "response": {"status": None, "body": None},
+                    "error": error,
+                }
+
+        if on_result is not None:
+            await on_result(index, result)
+        return result
+
+    return list(await asyncio.gather(*(run(i, request) for i, request in enumerate(batch))))
+
+
+async def request_generator_async(batches, response_type, **options):
+    """yields the results of each batch in turn, options as for process_batch_async"""
+    for i, batch in enumerate(batches):
+        print(f"batch_num: {i}")
+        yield await process_batch_async(batch, response_type, **options)
 
 
 def fetch(
@@ -40,53 +215,19 @@ def fetch(
     headers=None,
     response_type="json",
     fetch_handle_parameters={},
+    retry_policy=None,
 ):
-    """fetch a single request with retries and exponential backoff"""
-    retry_count = 0
-    while retry_count < 5:
-        try:
-            if method == "GET":
-                response = requests.get(url, headers=headers)
-            elif method == "POST":
-                response = requests.post(url, json=payload, headers=headers)
-            elif method == "PUT":
-                response = requests.put(url, json=payload, headers=headers)
-            elif method == "PATCH":
-                response = requests.patch(url, json=payload, headers=headers)
-            elif method == "DELETE":
-                response = requests.delete(url, headers=headers)
-            else:
-                raise ValueError("Invalid method")
-            return fetch_handle(response, response_type, fetch_handle_parameters)
-        except Exception as e:
-            print(e)
-            retry_count += 1
-            time.sleep(2**retry_count)
-    return None
-
-
-def process_batch(batch, response_type="json"):
-    """process a batch of requests"""
-
-    num_workers = 5 * cpu_count()
-    with ThreadPoolExecutor(max_workers=num_workers) as executor:
-        futures = []
-        for request in batch:
-            future = executor.submit(
-                fetch,
-                request.get("url"),
-                request.get("method"),
-                request.get("payload"),
-                request.get("headers"),
-                response_type,
-                fetch_handle_parameters=request.get("fetch_handle_parameters", {}),
-            )
-            futures.append(future)
-        request_responses = [future.result() for future in futures]
-    return [
-        {"request": batch[i], "response": {"status": r[0], "body": r[1]}}
-        for i, r in enumerate(request_responses)
-    ]
+    """blocking fetch_async, for callers that can't await"""
+    return engine.run(
+        fetch_async(
+            url, method, payload, headers, response_type, fetch_handle_parameters, retry_policy
+        )
+    )
+
+
+def process_batch(batch, response_type="json", **options):
+    """blocking process_batch_async, for callers that can't await"""
+    return engine.run(process_batch_async(batch, response_type, **options))
 
 
 def request_generator(batches, response_type):
@@ -131,7 +272,9 @@ class POSTJSONNetworkRequest:
     }
 
     # METHODS
-    def evaluate(self, node_inputs):
+    async def evaluate(self, node_inputs):
+        bind_server(self)
+
         uri = node_inputs.get("required_inputs").get("uri").get("values")
         body = node_inputs.get("required_inputs").get("body").get("values")
         headers = node_inputs.get("required_inputs").get("headers").get("values")
@@ -152,11 +295,8 @@ class POSTJSONNetworkRequest:
         ]
 
         print(json.dumps(batches))
-        responses = json.dumps(
-            list(request_generator(batches=batches, response_type="json"))[0][0]
-        )
-
-        return responses
+        # a NetworkResponse, downstream nodes share its one parsed body
+        return (await process_batch_async(batches[0], response_type="response"))[0]
 
 
 class GETJSONNetworkRequest:
@@ -178,7 +318,15 @@ class GETJSONNetworkRequest:
                 "name": "headers",
                 "widget": {"kind": "string", "name": "headers", "default": "{}"},
             },
-        }
+        },
+        "optional_inputs": {
+            # seconds to reuse the response for, overriding its Cache-Control
+            "cache_ttl": {
+                "kind": "number",
+                "name": "cache_ttl",
+                "widget": {"kind": "number", "name": "cache_ttl", "default": None},
+            },
+        },
     }
 
     # OUTPUT TYPES
@@ -189,9 +337,12 @@ class GETJSONNetworkRequest:
     }
 
     # METHODS
-    def evaluate(self, node_inputs):
+    async def evaluate(self, node_inputs):
+        bind_server(self)
+
         uri = node_inputs.get("required_inputs").get("uri").get("values")
         headers = node_inputs.get("required_inputs").get("headers").get("values")
+        cache_ttl = node_inputs.get("optional_inputs", {}).get("cache_ttl", {}).get("values")
 
         print(f"uri: {uri}")
         print(f"headers: {headers}")
@@ -202,16 +353,15 @@ class GETJSONNetworkRequest:
                     "url": uri,
                     "method": "GET",
                     "headers": json.loads(headers),
+                    "cache": True,
+                    "cache_ttl": cache_ttl,
                 }
             ]
         ]
 
         print(json.dumps(batches))
-        responses = json.dumps(
-            list(request_generator(batches=batches, response_type="json"))[0][0]
-        )
-
-        return responses
+        # a NetworkResponse, downstream nodes share its one parsed body
+        return (await process_batch_async(batches[0], response_type="response"))[0]
 
 
 class PUTJSONNetworkRequest:
@@ -249,7 +399,9 @@ class PUTJSONNetworkRequest:
     }
 
     # METHODS
-    def evaluate(self, node_inputs):
+    async def evaluate(self, node_inputs):
+        bind_server(self)
+
         uri = node_inputs.get("required_inputs").get("uri").get("values")
         body = node_inputs.get("required_inputs").get("body").get("values")
         headers = node_inputs.get("required_inputs").get("headers").get("values")
@@ -270,11 +422,8 @@ class PUTJSONNetworkRequest:
         ]
 
         print(json.dumps(batches))
-        responses = json.dumps(
-            list(request_generator(batches=batches, response_type="json"))[0][0]
-        )
-
-        return responses
+        # a NetworkResponse, downstream nodes share its one parsed body
+        return (await process_batch_async(batches[0], response_type="response"))[0]
 
 
 class PATCHJSONNetworkRequest:
@@ -312,7 +461,9 @@ class PATCHJSONNetworkRequest:
     }
 
     # METHODS
-    def evaluate(self, node_inputs):
+    async def evaluate(self, node_inputs):
+        bind_server(self)
+
         uri = node_inputs.get("required_inputs").get("uri").get("values")
         body = node_inputs.get("required_inputs").get("body").get("values")
         headers = node_inputs.get("required_inputs").get("headers").get("values")
@@ -333,11 +484,8 @@ class PATCHJSONNetworkRequest:
         ]
 
         print(json.dumps(batches))
-        responses = json.dumps(
-            list(request_generator(batches=batches, response_type="json"))[0][0]
-        )
-
-        return responses
+        # a NetworkResponse, downstream nodes share its one parsed body
+        return (await process_batch_async(batches[0], response_type="response"))[0]
 
 
 class DELETEJSONNetworkRequest:
@@ -370,7 +518,9 @@ class DELETEJSONNetworkRequest:
     }
 
     # METHODS
-    def evaluate(self, node_inputs):
+    async def evaluate(self, node_inputs):
+        bind_server(self)
+
         uri = node_inputs.get("required_inputs").get("uri").get("values")
         headers = node_inputs.get("required_inputs").get("headers").get("values")
 
@@ -380,11 +530,202 @@ class DELETEJSONNetworkRequest:
         batches = [[{"url": uri, "method": "DELETE", "headers": json.loads(headers)}]]
 
         print(json.dumps(batches))
-        responses = json.dumps(
-            list(request_generator(batches=batches, response_type="json"))[0][0]
+        # a NetworkResponse, downstream nodes share its one parsed body
+        return (await process_batch_async(batches[0], response_type="response"))[0]
+
+
+class DownloadFileNetworkRequest:
+    # LABELS
+    CATEGORY = "networking"
+    SUBCATEGORY = "GET"
+    DESCRIPTION = "Download a file to disk, resuming an interrupted download"
+
+    # INPUT TYPES
+    INPUT = {
+        "required_inputs": {
+            "uri": {
+                "kind": "*",
+                "name": "uri",
+                "widget": {"kind": "string", "name": "uri", "default": ""},
+            },
+            "headers": {
+                "kind": "*",
+                "name": "headers",
+                "widget": {"kind": "string", "name": "headers", "default": "{}"},
+            },
+        },
+        "optional_inputs": {
+            # defaults to downloads/ in the input directory
+            "destination": {
+                "kind": "string",
+                "name": "destination",
+                "widget": {"kind": "string", "name": "destination", "default": ""},
+            },
+            "sha256": {
+                "kind": "string",
+                "name": "sha256",
+                "widget": {"kind": "string", "name": "sha256", "default": ""},
+            },
+        },
+    }
+
+    # OUTPUT TYPES
+    OUTPUT = {
+        "kind": "string",
+        "name": "path",
+        "cacheable": True,
+    }
+
+    # METHODS
+    async def evaluate(self, node_inputs):
+        bind_server(self)
+
+        uri = node_inputs.get("required_inputs").get("uri").get("values")
+        headers = node_inputs.get("required_inputs").get("headers").get("values")
+        optional_inputs = node_inputs.get("optional_inputs", {})
+        destination = optional_inputs.get("destination", {}).get("values")
+        sha256 = optional_inputs.get("sha256", {}).get("values")
+
+        if not destination:
+            server = (getattr(self, "_memory", None) or {}).get("server")
+            upload_store = getattr(server, "upload_store", None)
+            input_directory = os.path.dirname(upload_store.directory) if upload_store else "input"
+            name = os.path.basename(urlparse(uri).path) or "download"
+            destination = os.path.join(input_directory, "downloads", name)
+
+        result = await download(
+            engine,
+            uri,
+            destination,
+            headers=json.loads(headers or "{}"),
+            sha256=sha256 or None,
+            progress=progress_reporter(self),
         )
+        return result["path"]
 
-        return responses
+
+class BatchJSONNetworkRequest:
+    # LABELS
+    CATEGORY = "networking"
+    SUBCATEGORY = "BATCH"
+    DESCRIPTION = "Make many requests concurrently, rate limited per host"
+
+    # INPUT TYPES
+    INPUT = {
+        "required_inputs": {
+            "headers": {
+                "kind": "*",
+                "name": "headers",
+                "widget": {"kind": "string", "name": "headers", "default": "{}"},
+            },
+            "concurrency": {
+                "kind": "*",
+                "name": "concurrency",
+                "widget": {"kind": "number", "name": "concurrency", "default": 16},
+            },
+            # requests per second to any one host, 0 for no limit
+            "rate_per_host": {
+                "kind": "*",
+                "name": "rate_per_host",
+                "widget": {"kind": "number", "name": "rate_per_host", "default": 10},
+            },
+        },
+        "optional_inputs": {
+            # a JSON list of {"url", "method", "headers", "payload"}
+            "requests": {
+                "kind": "*",
+                "name": "requests",
+                "widget": {"kind": "string", "name": "requests", "default": ""},
+            },
+            # or a url with {} fields, formatted with each item of a JSON list of parameters
+            "url_template": {
+                "kind": "string",
+                "name": "url_template",
+                "widget": {"kind": "string", "name": "url_template", "default": ""},
+            },
+            "parameters": {
+                "kind": "*",
+                "name": "parameters",
+                "widget": {"kind": "string", "name": "parameters", "default": "[]"},
+            },
+            "method": {
+                "kind": "string",
+                "name": "method",
+                "widget": {"kind": "string", "name": "method", "default": "GET"},
+            },
+        },
+    }
+
+    # OUTPUT TYPES
+    OUTPUT = {
+        "kind": "RESPONSE",
+        "name": "RESPONSES",
+        "cacheable": True,
+    }
+
+    # METHODS
+    async def evaluate(self, node_inputs):
+        bind_server(self)
+
+        required_inputs = node_inputs.get("required_inputs")
+        optional_inputs = node_inputs.get("optional_inputs", {})
+        headers = json_value(required_inputs.get("headers").get("values")) or {}
+        concurrency = int(required_inputs.get("concurrency").get("values") or 0)
+        rate_per_host = float(required_inputs.get("rate_per_host").get("values") or 0)
+
+        batch = build_batch(
+            json_value(optional_inputs.get("requests", {}).get("values")),
+            optional_inputs.get("url_template", {}).get("values"),
+            json_value(optional_inputs.get("parameters", {}).get("values")),
+            (optional_inputs.get("method", {}).get("values") or "GET").upper(),
+            headers,
+        )
+
+        report, flush = results_reporter(self)
+        results = await process_batch_async(
+            batch,
+            response_type="response",
+            concurrency=concurrency or None,
+            rate_limiter=engine.rate_limiter(rate_per_host) if rate_per_host > 0 else None,
+            return_exceptions=True,
+            on_result=report,
+        )
+        if flush is not None:
+            await flush()
+
+        return results
+
+
+def json_value(value):
+    """inputs arrive as JSON text from widgets, or already decoded from other nodes"""
+    if isinstance(value, str):
+        return json.loads(value) if value.strip() else None
+    return value
+
+
+def build_batch(requests, url_template, parameters, method, headers):
+    """the requests of a batch node, from a list of requests or a url template and parameters"""
+    if requests:
+        batch = []
+        for request in requests:
+            request = dict({"method": method}, **request)
+            request["headers"] = dict(headers, **(request.get("headers") or {}))
+            batch.append(request)
+        return batch
+    if not url_template:
+        raise ValueError("A batch request needs requests or a url_template")
+
+    batch = []
+    for parameter in parameters or []:
+        # each value fills one path segment or query value, its own / & ? are escaped
+        if isinstance(parameter, dict):
+            url = url_template.format(**{k: quote(str(v), safe="") for k, v in parameter.items()})
+        elif isinstance(parameter, list):
+            url = url_template.format(*(quote(str(v), safe="") for v in parameter))
+        else:
+            url = url_template.format(quote(str(parameter), safe=""))
+        batch.append({"url": url, "method": method, "headers": dict(headers)})
+    return batch
 
 
 class ConsoleLog:
@@ -588,6 +929,16 @@ EXTENSION_MAPPINGS = {
             "javascript_class_name": "DELETEJSONNetworkRequest",
             "display_name": "DELETERequest",
         },
+        "DownloadFileNetworkRequest": {
+            "python_class": DownloadFileNetworkRequest,
+            "javascript_class_name": "DownloadFileNetworkRequest",
+            "display_name": "DownloadFile",
+        },
+        "BatchJSONNetworkRequest": {
+            "python_class": BatchJSONNetworkRequest,
+            "javascript_class_name": "BatchJSONNetworkRequest",
+            "display_name": "BatchRequest",
+        },
         "ConsoleLog": {
             "python_class": ConsoleLog,
             "javascript_class_name": "ConsoleLog",
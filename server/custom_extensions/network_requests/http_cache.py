@@ -0,0 +1,277 @@
+import asyncio
+import email.utils
+import hashlib
+import json
+import os
+import struct
+import time
+from collections import OrderedDict
+
+# response headers an entry keeps, enough to decode the body and revalidate it
+STORED_HEADERS = ("Content-Type", "ETag", "Last-Modified", "Cache-Control", "Expires", "Date")
+
+# request headers that carry credentials
+CREDENTIAL_HEADERS = ("authorization", "proxy-authorization", "cookie")
+
+
+def default_cache_directory():
+    return os.getenv("NEOSCAFFOLD_HTTP_CACHE") or os.path.join(
+        os.path.expanduser("~"), ".cache", "neoscaffold", "http"
+    )
+
+
+def parse_cache_control(value):
+    directives = {}
+    for item in (value or "").lower().split(","):
+        name, _, argument = item.strip().partition("=")
+        if name:
+            directives[name] = argument.strip('"')
+    return directives
+
+
+def parse_http_date(value):
+    try:
+        return email.utils.parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError):
+        return None
+
+
+def freshness_lifetime(headers, now, ttl=None):
+    """seconds a response stays fresh, None when it must not be stored at all"""
+    directives = parse_cache_control(headers.get("Cache-Control"))
+    if "no-store" in directives:
+        return None
+    if ttl is not None:
+        return ttl
+    if "no-cache" in directives:
+        return 0
+    if "max-age" in directives:
+        try:
+            return max(0, int(directives["max-age"]) - int(headers.get("Age", 0)))
+        except ValueError:
+            return 0
+
+    date = parse_http_date(headers.get("Date")) or now
+    expires = parse_http_date(headers.get("Expires"))
+    if headers.get("Expires") is not None:
+        return max(0, expires - date) if expires is not None else 0
+
+    # no explicit lifetime: a tenth of the time since it last changed, at most a day
+    last_modified = parse_http_date(headers.get("Last-Modified"))
+    if last_modified is not None:
+        return min(86400, max(0, (date - last_modified) / 10))
+    return 0
+
+
+def persistable(request_headers, response_headers, ttl=None):
+    """
+    whether an entry may be written to the disk tier, which every user of the machine
+    shares: not a private response or one to a request with credentials, unless the
+    node asked for it by setting a ttl
+    """
+    if ttl is not None:
+        return True
+    if "private" in parse_cache_control(response_headers.get("Cache-Control")):
+        return False
+    return not any(name.lower() in CREDENTIAL_HEADERS for name in (request_headers or {}))
+
+
+class CacheEntry:
+    def __init__(self, status, headers, body, expires_at):
+        self.status = status
+        self.headers = headers
+        self.body = body
+        self.expires_at = expires_at
+
+    def fresh(self, now):
+        return now < self.expires_at
+
+    def validators(self):
+        validators = {}
+        if "ETag" in self.headers:
+            validators["If-None-Match"] = self.headers["ETag"]
+        if "Last-Modified" in self.headers:
+            validators["If-Modified-Since"] = self.headers["Last-Modified"]
+        return validators
+
+    def to_bytes(self):
+        meta = json.dumps(
+            {"status": self.status, "headers": self.headers, "expires_at": self.expires_at}
+        ).encode("utf-8")
+        return struct.pack(">I", len(meta)) + meta + self.body
+
+    @classmethod
+    def from_bytes(cls, data):
+        (length,) = struct.unpack_from(">I", data)
+        meta = json.loads(data[4 : 4 + length])
+        return cls(meta["status"], meta["headers"], data[4 + length :], meta["expires_at"])
+
+
+async def read_raw(response):
+    headers = {name: response.headers[name] for name in STORED_HEADERS if name in response.headers}
+    return response.status, headers, await response.read()
+
+
+class HTTPCache:
+    """
+    Shared cache of GET responses for the network nodes.
+
+    Follows Cache-Control (no-store, no-cache, max-age), Expires, and revalidates
+    stale entries with If-None-Match / If-Modified-Since, so an unchanged resource costs
+    a 304 instead of a download. A ttl passed to get() overrides the response's own
+    freshness. Recent entries are kept in memory, up to max_bytes, and written to
+    directory so they survive restarts; private responses and responses to requests
+    with credentials stay in memory unless a ttl is given. Identical requests in flight
+    at the same time share one upstream request.
+    """
+
+    def __init__(
+        self,
+        directory=None,
+        max_bytes=64 * 1024 * 1024,
+        max_entry_bytes=8 * 1024 * 1024,
+        max_disk_bytes=1024 * 1024 * 1024,
+        clock=time.time,
+    ):
+        self.directory = directory or default_cache_directory()
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self.clock = clock
+        self.entries = OrderedDict()
+        self.size = 0
+        self.in_flight = {}
+        self.disk_writes = 0
+
+    def key(self, url, headers):
+        # every request header is part of the key, so different credentials never share an entry
+        request = [url, sorted((name.lower(), str(value)) for name, value in (headers or {}).items())]
+        return hashlib.sha256(json.dumps(request).encode("utf-8")).hexdigest()
+
+    async def get(self, engine, url, headers=None, ttl=None, retry_policy=None):
+        """the cached or fetched entry for GET url"""
+        key = self.key(url, headers)
+        entry = await self.lookup(key)
+        if entry is not None and entry.fresh(self.clock()):
+            engine.count("http.cache.hits")
+            return entry
+
+        # a task can only be awaited on its own loop
+        flight = (key, asyncio.get_running_loop())
+        task = self.in_flight.get(flight)
+        if task is not None:
+            engine.count("http.cache.coalesced")
+        else:
+            task = asyncio.ensure_future(
+                self.fill(engine, key, url, headers, entry, ttl, retry_policy)
+            )
+            self.in_flight[flight] = task
+            task.add_done_callback(lambda _: self.in_flight.pop(flight, None))
+        # one waiter giving up doesn't cancel the request for the others
+        return await asyncio.shield(task)
+
+    async def fill(self, engine, key, url, headers, entry, ttl, retry_policy):
+        request_headers = dict(headers or {})
+        if entry is not None:
+            request_headers.update(entry.validators())
+
+        status, response_headers, body = await engine.send(
+            url, "GET", None, request_headers, read_raw, retry_policy
+        )
+        now = self.clock()
+
+        if status == 304 and entry is not None:
+            engine.count("http.cache.revalidated")
+            entry.headers.update(response_headers)
+            lifetime = freshness_lifetime(entry.headers, now, ttl)
+            if lifetime is not None:
+                entry.expires_at = now + lifetime
+                await self.store(key, entry, persistable(headers, entry.headers, ttl))
+            return entry
+
+        engine.count("http.cache.misses")
+        entry = CacheEntry(status, response_headers, body, now)
+        lifetime = freshness_lifetime(response_headers, now, ttl)
+        if status == 200 and lifetime is not None and len(body) <= self.max_entry_bytes:
+            entry.expires_at = now + lifetime
+            # a response that is stale at once is still worth keeping to revalidate
+            if lifetime > 0 or entry.validators():
+                await self.store(key, entry, persistable(headers, response_headers, ttl))
+        return entry
+
+    async def lookup(self, key):
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.entries.move_to_end(key)
+            return entry
+
+        entry = await asyncio.get_running_loop().run_in_executor(None, self.read_disk, key)
+        if entry is not None:
+            self.remember(key, entry)
+        return entry
+
+    async def store(self, key, entry, persist=True):
+        self.remember(key, entry)
+        if not persist:
+            return
+        try:
+            await asyncio.get_running_loop().run_in_executor(None, self.write_disk, key, entry)
+        except OSError as e:
+            # the memory tier still has it
+            print(f"http cache: could not write {self.path(key)}: {e}")
+
+    def remember(self, key, entry):
+        previous = self.entries.pop(key, None)
+        if previous is not None:
+            self.size -= len(previous.body)
+        self.entries[key] = entry
+        self.size += len(entry.body)
+        while self.size > self.max_bytes and len(self.entries) > 1:
+            _, evicted = self.entries.popitem(last=False)
+            self.size -= len(evicted.body)
+
+    def path(self, key):
+        return os.path.join(self.directory, key[:2], key)
+
+    def read_disk(self, key):
+        try:
+            with open(self.path(key), "rb") as f:
+                return CacheEntry.from_bytes(f.read())
+        except (OSError, ValueError, KeyError, struct.error):
+            return None
+
+    def write_disk(self, key, entry):
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temporary = f"{path}.{os.getpid()}.tmp"
+        with open(temporary, "wb") as f:
+            f.write(entry.to_bytes())
+        os.replace(temporary, path)
+
+        self.disk_writes += 1
+        if self.disk_writes % 100 == 0:
+            self.prune_disk()
+
+    def prune_disk(self):
+        """deletes the least recently written entries until the directory fits max_disk_bytes"""
+        files = []
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                try:
+                    stat = os.stat(os.path.join(root, name))
+                except OSError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, os.path.join(root, name)))
+
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.max_disk_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            total -= size
+
+
+http_cache = HTTPCache()
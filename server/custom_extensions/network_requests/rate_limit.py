@@ -0,0 +1,46 @@
+import asyncio
+import time
+
+from yarl import URL
+
+
+class TokenBucket:
+    """allows rate acquisitions per second on average, and bursts of up to burst at once"""
+
+    def __init__(self, rate, burst=None, clock=time.monotonic):
+        self.rate = rate
+        self.capacity = burst or max(1.0, rate)
+        self.tokens = self.capacity
+        self.clock = clock
+        self.updated = clock()
+
+    async def acquire(self):
+        while True:
+            now = self.clock()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class HostRateLimiter:
+    """
+    a token bucket per host, so a fan-out stays under each API's rate limit
+
+    limiters given the same buckets dict, like the engine's, share a host's bucket
+    whenever their rate and burst are the same
+    """
+
+    def __init__(self, rate, burst=None, buckets=None):
+        self.rate = rate
+        self.burst = burst
+        self.buckets = {} if buckets is None else buckets
+
+    async def acquire(self, url):
+        key = (URL(url).host, self.rate, self.burst)
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            bucket = self.buckets[key] = TokenBucket(self.rate, self.burst)
+        await bucket.acquire()
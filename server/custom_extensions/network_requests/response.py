@@ -0,0 +1,110 @@
+import asyncio
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# bodies at least this large are parsed in the executor rather than on the event loop
+OFFLOAD_SIZE = 256 * 1024
+
+
+def loads(data):
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(bytes(data))
+
+
+class NetworkResponse:
+    """
+    The result of a network request, as network nodes output it.
+
+    The body is kept as the bytes that were received, behind a memoryview, and parsed
+    once, with orjson when it is installed: as JSON when it is JSON, as text otherwise.
+    Nodes pass the response along instead of a JSON string, so the body isn't encoded
+    and parsed again at every hop. It reads like the
+    {"request", "response": {"status", "headers", "body"}} dict nodes used to output,
+    and is serialized as that dict.
+    """
+
+    def __init__(self, request, status, headers, raw, error=None):
+        self.request = request
+        self.status = status
+        self.headers = headers
+        self.raw = memoryview(raw)
+        self.error = error
+        self._body = None
+        self._parsed = False
+
+    @property
+    def text(self):
+        content_type = self.headers.get("Content-Type", "")
+        charset = "utf-8"
+        if "charset=" in content_type:
+            charset = content_type.split("charset=")[-1].split(";")[0].strip()
+        return str(self.raw, charset, errors="replace")
+
+    @property
+    def body(self):
+        if not self._parsed:
+            try:
+                self._body = loads(self.raw) if len(self.raw) else None
+            except ValueError:
+                self._body = self.text
+            self._parsed = True
+        return self._body
+
+    async def parse(self):
+        """parses a large body in the executor, so reading it later doesn't block the loop"""
+        if not self._parsed and len(self.raw) >= OFFLOAD_SIZE:
+            await asyncio.get_running_loop().run_in_executor(None, lambda: self.body)
+        return self
+
+    def select(self, *keys):
+        """the value at keys, e.g. select("response", "body", "items", "0")"""
+        if keys[:2] == ("response", "body"):
+            value, keys = self.body, keys[2:]
+        elif len(keys) > 1 and keys[0] == "response":
+            value, keys = {"status": self.status, "headers": self.headers}, keys[1:]
+        else:
+            value = self.to_dict()
+
+        for key in keys:
+            if isinstance(value, list) and key.isdigit() and int(key) < len(value):
+                value = value[int(key)]
+            elif isinstance(value, dict):
+                value = value.get(key)
+            else:
+                return None
+        return value
+
+    def to_dict(self):
+        result = {
+            "request": self.request,
+            "response": {"status": self.status, "headers": self.headers, "body": self.body},
+        }
+        if self.error is not None:
+            result["error"] = self.error
+        return result
+
+    def get(self, key, default=None):
+        return self.to_dict().get(key, default)
+
+    def __getitem__(self, key):
+        return self.to_dict()[key]
+
+    def __reduce__(self):
+        # memoryviews don't pickle, the worker pool sends outputs between processes
+        return (
+            NetworkResponse,
+            (self.request, self.status, self.headers, bytes(self.raw), self.error),
+        )
+
+    def __repr__(self):
+        url = (self.request or {}).get("url")
+        return f"<NetworkResponse {self.status} {url} {len(self.raw)} bytes>"
+
+
+async def read_network_response(response):
+    return response.status, dict(response.headers), await response.read()
@@ -0,0 +1,147 @@
+import asyncio
+import email.utils
+import random
+import time
+
+import aiohttp
+
+# statuses worth another attempt, and the most attempts each gets
+DEFAULT_RETRY_STATUSES = {408: 3, 429: 5, 500: 3, 502: 5, 503: 5, 504: 5}
+
+RETRY_EXCEPTIONS = (aiohttp.ClientConnectionError, aiohttp.ClientPayloadError, asyncio.TimeoutError)
+
+# methods a server can safely receive twice
+IDEMPOTENT_METHODS = ("GET", "HEAD", "PUT", "DELETE", "OPTIONS")
+
+# failures that mean a request was never processed, safe to retry with any method:
+# the connection was refused, or the server said to come back later
+UNPROCESSED_EXCEPTIONS = (aiohttp.ClientConnectorError,)
+UNPROCESSED_STATUSES = (429,)
+
+
+class CircuitOpenError(Exception):
+    def __init__(self, host, retry_in):
+        super().__init__(f"{host} is failing, not calling it for another {retry_in:.1f}s")
+        self.host = host
+        self.retry_in = retry_in
+
+
+class RetryPolicy:
+    """
+    Which failures are retried and how long to wait before each attempt.
+
+    Connection errors and timeouts are retried up to max_attempts; a response is
+    retried only if its status is in retry_statuses, up to that status's own limit.
+    Waits grow exponentially with full jitter, capped at max_delay. A Retry-After
+    header is honored instead, unless it asks for more than retry_after_limit
+    seconds, in which case the response is returned as it is.
+
+    POST and PATCH may have been processed when they time out, drop mid-response or
+    fail with a 5xx, so they are only retried when the request never got through: a
+    refused connection or a 429. A policy with idempotent=True retries them like
+    any other method, for APIs that deduplicate (e.g. with an idempotency key).
+    """
+
+    def __init__(
+        self,
+        max_attempts=5,
+        base_delay=0.5,
+        max_delay=30.0,
+        retry_statuses=None,
+        retry_after_limit=120.0,
+        idempotent=False,
+    ):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.retry_statuses = DEFAULT_RETRY_STATUSES if retry_statuses is None else retry_statuses
+        self.retry_after_limit = retry_after_limit
+        self.idempotent = idempotent
+
+    def safe_to_repeat(self, method):
+        return self.idempotent or method.upper() in IDEMPOTENT_METHODS
+
+    def backoff(self, attempt):
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2**attempt))
+
+    def exception_delay(self, attempt, exception=None, method="GET"):
+        """seconds to wait before retrying after the attempt-th (from 0) failed with an exception, or None"""
+        if attempt + 1 >= self.max_attempts:
+            return None
+        if not self.safe_to_repeat(method) and not isinstance(exception, UNPROCESSED_EXCEPTIONS):
+            return None
+        return self.backoff(attempt)
+
+    def status_delay(self, attempt, status, retry_after=None, method="GET"):
+        """seconds to wait before retrying a response with this status, or None to keep it"""
+        if attempt + 1 >= min(self.max_attempts, self.retry_statuses.get(status, 0)):
+            return None
+        if not self.safe_to_repeat(method) and status not in UNPROCESSED_STATUSES:
+            return None
+        seconds = parse_retry_after(retry_after)
+        if seconds is None:
+            return self.backoff(attempt)
+        if seconds > self.retry_after_limit:
+            return None
+        return seconds
+
+
+def parse_retry_after(value):
+    """Retry-After as seconds from now, it is either a number of seconds or an HTTP date"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class CircuitBreaker:
+    """
+    Stops calling a host after failure_threshold consecutive failures.
+
+    While open every call fails fast. After reset_timeout seconds one call is let
+    through as a probe: success closes the breaker, failure opens it again. If the
+    probe never reports back, another is let through after reset_timeout.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+
+    def retry_in(self):
+        return max(0.0, self.opened_at + self.reset_timeout - self.clock())
+
+    def allow(self):
+        if self.state == "closed":
+            return True
+        if self.retry_in() > 0:
+            return False
+        # let one probe through, the next waits out another timeout
+        self.state = "half_open"
+        self.opened_at = self.clock()
+        return True
+
+    def record_success(self):
+        self.state = "closed"
+        self.failures = 0
+
+    def record_failure(self):
+        """returns True when this failure opened the breaker"""
+        self.failures += 1
+        if self.state == "half_open" or (
+            self.state == "closed" and self.failures >= self.failure_threshold
+        ):
+            opened = self.state == "closed"
+            self.state = "open"
+            self.opened_at = self.clock()
+            return opened
+        return False
@@ -4,6 +4,8 @@ import asyncio
 from argparse import ArgumentParser, Namespace
 
 from server import Server
+from server.infrastructure.servers.process_group import serve_forked
+from server.infrastructure.servers.session_store import BrokerSessionStore
 
 __version__ = "0.0.1"
 
@@ -12,9 +14,6 @@ def parse_inputs(disabled=False) -> Namespace:
     """Parses the user program input"""
     parser = ArgumentParser(description="Add your arguments")
 
-    if disabled:
-        return parser.parse_args([])
-
     parser.add_argument(
         "--listen",
         type=str,
@@ -51,6 +50,13 @@ def parse_inputs(disabled=False) -> Namespace:
         help="Set the maximum upload size in MB. This prevents 413 Request Entity Too Large errors. Default is 100MB.",
     )
 
+    parser.add_argument(
+        "--compression-min-size",
+        type=int,
+        default=1024,
+        help="Compress responses of at least this many bytes for clients that accept it (gzip, or br and zstd when brotli and zstandard are installed), 0 disables it.",
+    )
+
     parser.add_argument(
         "--extra-model-paths-config",
         type=str,
@@ -106,27 +112,101 @@ def parse_inputs(disabled=False) -> Namespace:
         default=0,
         help="Set the inspection delay for each node to make it easier to see the output of the node in the UI in seconds.",
     )
+    parser.add_argument(
+        "--websocket-queue-size",
+        type=int,
+        default=256,
+        help="Maximum number of messages queued for each websocket before progress updates are dropped.",
+    )
+    parser.add_argument(
+        "--websocket-max-lag",
+        type=float,
+        default=30.0,
+        help="Disconnect a websocket client that stays behind its send queue for this many seconds.",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Number of server processes sharing the listen port and session state (needs fork).",
+    )
+    parser.add_argument(
+        "--session-ttl",
+        type=float,
+        default=3600,
+        help="Forget a workflow's interventions after this many idle seconds.",
+    )
+    parser.add_argument(
+        "--max-workflow-sessions",
+        type=int,
+        default=32,
+        help="Interventions are kept for at most this many workflows per user, least recently used are dropped first.",
+    )
+    parser.add_argument(
+        "--batch-concurrency",
+        type=int,
+        default=4,
+        help="Maximum number of runs of a /prompt/batch submission executing at once.",
+    )
+    parser.add_argument(
+        "--history-file",
+        type=str,
+        default=None,
+        help="Sqlite database the run history is kept in (default: ~/.local/share/neoscaffold/history.sqlite3).",
+    )
+    parser.add_argument(
+        "--history-retention-days",
+        type=float,
+        default=30,
+        help="Delete runs from the history once they are this many days old, 0 keeps them forever.",
+    )
+    parser.add_argument(
+        "--disable-history",
+        action="store_true",
+        help="Don't record finished runs.",
+    )
+    parser.add_argument(
+        "--eager-extensions",
+        action="store_true",
+        help="Import every extension at startup instead of registering nodes from cached manifests and importing on first use.",
+    )
+    parser.add_argument(
+        "--profile-startup",
+        action="store_true",
+        help="Report how long each extension and the heaviest modules take to import at startup.",
+    )
+    parser.add_argument(
+        "--disable-workers",
+        action="store_true",
+        help="Evaluate nodes of extensions that declare a worker process in the server process instead.",
+    )
+    parser.add_argument(
+        "--worker-timeout",
+        type=float,
+        default=None,
+        help="Seconds a node may run in a worker process before the worker is restarted (default: no limit).",
+    )
+
+    # defaults only, used when the server is embedded in another program
+    if disabled:
+        return parser.parse_args([])
 
     return parser.parse_args()
 
 
-async def run(server, address="", port=6166, verbose=True, call_on_start=None):
+async def run(server, address="", port=6166, verbose=True, call_on_start=None, sock=None):
     await asyncio.gather(
-        server.start(address, port, verbose, call_on_start), server.publish_loop()
+        server.start(address, port, verbose, call_on_start, sock=sock), server.publish_loop()
     )
 
 
-def main() -> int:
-    """Build many objects to process into our algolia database"""
-    args = parse_inputs()
-    print(args.port)
-
+def serve(args, sock=None, session_store=None) -> int:
     # create event loop
     loop = asyncio.new_event_loop()
     asyncio.set_event_loop(loop)
 
     # create server
-    server = Server(loop=loop, args=args)
+    server = Server(loop=loop, args=args, session_store=session_store)
 
     # load extensions
     server = server.load_extensions()
@@ -135,7 +215,7 @@ def main() -> int:
     server.add_routes()
 
     call_on_start = None
-    if args.auto_launch:
+    if args.auto_launch and sock is None:
 
         def startup_server(scheme, address, port):
             import webbrowser
@@ -151,6 +231,7 @@ def main() -> int:
                 port=args.port,
                 verbose=not args.dont_print_server,
                 call_on_start=call_on_start,
+                sock=sock,
             )
         )
     except KeyboardInterrupt:
@@ -159,5 +240,24 @@ def main() -> int:
     return 0
 
 
+def main() -> int:
+    """Build many objects to process into our algolia database"""
+    args = parse_inputs()
+    print(args.port)
+
+    if args.workers > 1:
+        return serve_forked(
+            args.listen,
+            args.port,
+            args.workers,
+            {"idle_ttl": args.session_ttl, "max_workflows_per_user": args.max_workflow_sessions},
+            lambda sock, broker_path: serve(
+                args, sock=sock, session_store=BrokerSessionStore(broker_path)
+            ),
+        )
+
+    return serve(args)
+
+
 if __name__ == "__main__":
     main()
@@ -1,8 +1,7 @@
 from dataclasses import asdict, dataclass, field
-import json
 from typing import Any, List, Optional
 
-from ..utilities.fallback_json_encoder import FallbackJSONEncoder
+from ..utilities.encoders import dumps
 
 from ..quality.models.evaluation import Evaluation
 from ..quality.models.rule import Rule
@@ -54,6 +53,18 @@ class Node(DataClassJSONMixin):
     def _evaluate(self, node_inputs: NodeInputGroup) -> NodeOutput:
         """Evaluate the node."""
 
+        node_output = self._begin_evaluate(node_inputs)
+        output = self.class_instance.evaluate(node_inputs.to_dict())
+        return self._end_evaluate(node_inputs, node_output, output)
+
+    async def _evaluate_async(self, node_inputs: NodeInputGroup) -> NodeOutput:
+        """Evaluate a node whose evaluate is a coroutine function."""
+
+        node_output = self._begin_evaluate(node_inputs)
+        output = await self.class_instance.evaluate(node_inputs.to_dict())
+        return self._end_evaluate(node_inputs, node_output, output)
+
+    def _begin_evaluate(self, node_inputs: NodeInputGroup) -> NodeOutput:
         node_output = self.output_template()
 
         # fix any required node_input that is a NodeOutput
@@ -86,9 +97,11 @@ class Node(DataClassJSONMixin):
         if self.class_instance is None:
             raise ValueError(f"Node {self.name} has no class instance")
 
-        # Evaluate the node
-        output = self.class_instance.evaluate(node_inputs.to_dict())
+        return node_output
 
+    def _end_evaluate(
+        self, node_inputs: NodeInputGroup, node_output: NodeOutput, output: Any
+    ) -> NodeOutput:
         node_output.values = output
 
         output_evaluation = Evaluation(passed=True, outcomes={})
@@ -207,7 +220,7 @@ class Node(DataClassJSONMixin):
             yield key, value
 
     def __repr__(self):
-        return json.dumps(dict(self), cls=FallbackJSONEncoder)
+        return dumps(dict(self))
 
     def __str__(self):
         return self.__repr__()
@@ -0,0 +1,180 @@
+import asyncio
+import time
+
+from ..utilities.encoders import dumps
+from ..utilities.generate_id import generate_id
+from .graph_executor import serialize_graph_results
+
+
+class BatchRun:
+    """
+    Many runs of one compiled workflow, each with its own input overrides.
+
+    Finished runs are appended to an ordered log of NDJSON lines. A line's cursor is its
+    position in the log, so a client that lost its stream can reconnect with the last
+    cursor it read and receive everything after it.
+    """
+
+    def __init__(self, batch_id, graph, overrides, concurrency, owner=None):
+        self.batch_id = batch_id
+        self.owner = owner
+        self.graph = graph
+        self.overrides = overrides
+        self.total = len(overrides)
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.lines = []
+        self.changed = asyncio.Condition()
+        self.failed = 0
+        self.done = False
+        self.finished_at = None
+        self.task = None
+
+    @classmethod
+    def replica(cls, batch_id, owner, total):
+        """a copy of a batch another process runs, filled in from what it shares"""
+        batch = cls(batch_id, None, [], 1, owner=owner)
+        batch.total = total
+        return batch
+
+    def run_graph(self, index):
+        """the compiled graph with this run's widget values applied"""
+        graph = self.graph.copy()
+        for node_id, inputs in (self.overrides[index] or {}).items():
+            if node_id not in graph.nodes:
+                raise KeyError(f"run {index} overrides unknown node {node_id}")
+            graph.nodes[node_id].update(inputs)
+        return graph
+
+    async def append(self, entry):
+        """adds a finished run to the log, returns its line"""
+        async with self.changed:
+            entry["cursor"] = len(self.lines) + 1
+            line = dumps(entry).encode("utf-8") + b"\n"
+            self.lines.append(line)
+            self.changed.notify_all()
+        return line
+
+    async def append_line(self, line, failed):
+        async with self.changed:
+            self.lines.append(line)
+            self.failed = failed
+            self.changed.notify_all()
+
+    async def finish(self):
+        async with self.changed:
+            self.done = True
+            self.finished_at = time.monotonic()
+            self.changed.notify_all()
+
+    async def lines_after(self, cursor):
+        """yields the log from cursor on, waiting for runs that have not finished yet"""
+        while True:
+            async with self.changed:
+                while cursor >= len(self.lines) and not self.done:
+                    await self.changed.wait()
+                pending = self.lines[cursor:]
+                done = self.done
+            for line in pending:
+                yield line
+            cursor += len(pending)
+            if done and cursor >= len(self.lines):
+                return
+
+    def summary(self):
+        return {
+            "batch_id": self.batch_id,
+            "total": self.total,
+            "finished": len(self.lines),
+            "failed": self.failed,
+            "done": self.done,
+        }
+
+
+class BatchRunner:
+    """
+    runs batches through the graph executor with a bounded number of runs in flight
+
+    under --workers every process keeps a replica of the batches the others run, shared
+    through the session store, so a client can resume its stream on any of them
+    """
+
+    def __init__(self, server, concurrency=4, retain=32):
+        self.server = server
+        self.concurrency = concurrency
+        self.retain = retain
+        self.batches = {}
+
+    def submit(self, prompt, overrides, concurrency=None, owner=None):
+        # compile once, every run gets a copy of the same graph
+        graph = self.server.graph_executor.prompt_to_graph(prompt)
+
+        batch = BatchRun(
+            generate_id(),
+            graph,
+            overrides,
+            max(1, min(concurrency or self.concurrency, self.concurrency)),
+            owner=owner,
+        )
+        self.batches[batch.batch_id] = batch
+        self.evict()
+        self.share(batch.batch_id, "start", owner, batch.total)
+
+        batch.task = asyncio.create_task(self.run(batch))
+        return batch
+
+    def share(self, batch_id, event, *args):
+        self.server.session_store.share_batch(batch_id, event, args)
+
+    async def replicate(self, batch_id, event, args):
+        """applies an event another process shared about one of its batches"""
+        if event == "start":
+            owner, total = args
+            self.batches[batch_id] = BatchRun.replica(batch_id, owner, total)
+            self.evict()
+            return
+
+        batch = self.batches.get(batch_id)
+        if batch is None:
+            return
+        if event == "line":
+            await batch.append_line(*args)
+        elif event == "done":
+            await batch.finish()
+            self.evict()
+
+    def evict(self):
+        finished = sorted(
+            (batch for batch in self.batches.values() if batch.done),
+            key=lambda batch: batch.finished_at,
+        )
+        while len(self.batches) > self.retain and finished:
+            del self.batches[finished.pop(0).batch_id]
+
+    async def run(self, batch):
+        await asyncio.gather(*[self.run_one(batch, index) for index in range(batch.total)])
+        await batch.finish()
+        self.share(batch.batch_id, "done")
+        self.evict()
+
+    async def run_one(self, batch, index):
+        async with batch.semaphore:
+            prompt_id = f"{batch.batch_id}-{index}"
+            # batch progress is streamed to the submitter instead of sent over the websocket
+            response = {"prompt_id": prompt_id, "number": index, "node_errors": [], "quiet": True}
+            time_start = time.perf_counter()
+            try:
+                graph_results = await self.server.graph_executor.run_sequential(
+                    batch.run_graph(index), response
+                )
+                entry = {
+                    "run": index,
+                    "prompt_id": prompt_id,
+                    "status": "success",
+                    "results": serialize_graph_results(graph_results),
+                }
+            except Exception as e:
+                batch.failed += 1
+                entry = {"run": index, "prompt_id": prompt_id, "status": "error", "error": str(e)}
+            self.server.metrics.observe("batch.run", time.perf_counter() - time_start)
+            line = await batch.append(entry)
+            self.share(batch.batch_id, "line", line, batch.failed)
@@ -1,4 +1,7 @@
 import asyncio
+import functools
+import inspect
+import time
 from typing import Any, Dict, List
 import networkx as nx
 
@@ -94,15 +97,44 @@ class GraphExecutor:
         if self.server.ENABLE_SMART_CACHE:
             memory["graph_node_instances"] = {}
 
+        # what the run history keeps about this run
+        run_record = {
+            "prompt_id": response["prompt_id"],
+            "user_id": self.server.client_id,
+            "workflow_checksum": self.server.current_workflow_id,
+            "started_at": time.time(),
+            "status": "success",
+            "nodes": [],
+        }
+        memory["run_record"] = run_record
+
+        # keep this workflow's interventions while the run may still hit them
+        self.server.session_store.hold(run_record["user_id"], run_record["workflow_checksum"])
+
         current_action = EvaluationAction(
             node_id=graph_nodes[0], runtime_action=RuntimeAction.EVALUATE
         ).to_dict()
 
-        # run each node in the graph
-        while current_action:
-            current_action = await sequential_runtime_step(
-                current_action, memory, response
+        try:
+            # run each node in the graph
+            while current_action:
+                current_action = await sequential_runtime_step(
+                    current_action, memory, response
+                )
+        except BaseException as e:
+            run_record["status"] = "error"
+            # a failed node's message is clearer than the exception wrapping its stack trace
+            run_record["error"] = next(
+                (node["error"] for node in run_record["nodes"] if node["error"]), str(e)
             )
+            raise
+        finally:
+            self.server.session_store.release(
+                run_record["user_id"], run_record["workflow_checksum"]
+            )
+            run_record["finished_at"] = time.time()
+            if self.server.run_history is not None:
+                self.server.run_history.record(run_record)
 
         return graph_results
 
@@ -122,11 +154,10 @@ async def sequential_runtime_step(
     node_id = action.get("node_id")
 
     # TODO: refactor this section to be less repetitive and more readable
-    interventions = (
-        server.sessions.get(server.client_id, {})
-        .get(server.current_workflow_id, {})
-        .get("interventions", {})
-    )
+    session_store = server.session_store
+    client_id = server.client_id
+    workflow_id = server.current_workflow_id
+    interventions = session_store.workflow_session(client_id, workflow_id)["interventions"]
 
     breakpoints = interventions.get("breakpoints")
     if breakpoints:
@@ -143,16 +174,23 @@ async def sequential_runtime_step(
             )
 
             if all_break:
-                # reset the all_break flag
-                breakpoints["all_break"] = False
-                if not in_list:
-                    # create a new event
-                    breakpoints["nodes"][node_id] = asyncio.Event()
-
-            # check if the event has been set
-            event = breakpoints["nodes"][node_id]
-            event.clear()
-            await event.wait()
+                # reset the all_break flag and keep a breakpoint on this node
+                session = await session_store.update(
+                    client_id, workflow_id, "break_at", node_id=node_id
+                )
+                breakpoints = session["interventions"]["breakpoints"]
+
+            # wait for a step through this node, or for its breakpoint to be removed
+            steps = breakpoints["nodes"][node_id]
+            await session_store.wait(
+                client_id,
+                workflow_id,
+                lambda session: session["interventions"]
+                .get("breakpoints", {})
+                .get("nodes", {})
+                .get(node_id)
+                != steps,
+            )
 
     restart_points = interventions.get("restart-points")
     if restart_points:
@@ -175,7 +213,10 @@ async def sequential_runtime_step(
             ).to_dict()
 
             # reset the all_restart flag
-            restart_points["all_restart"] = False
+            if all_restart:
+                await session_store.update(
+                    client_id, workflow_id, "reset_flag", kind="restart-points", flag="all_restart"
+                )
 
     stop_points = interventions.get("stop-points")
     if stop_points:
@@ -198,7 +239,10 @@ async def sequential_runtime_step(
             ).to_dict()
 
             # reset the all_stop flag
-            stop_points["all_stop"] = False
+            if all_stop:
+                await session_store.update(
+                    client_id, workflow_id, "reset_flag", kind="stop-points", flag="all_stop"
+                )
 
     # override the action if there is an override for it planned
     if node_id in evaluation_override_actions:
@@ -268,6 +312,7 @@ async def sequential_runtime_step(
 
         if server.ENABLE_SMART_CACHE:
             node = graph_node.get("node_instance")
+        cache_hit = node is not None
 
         if not node:
             node_class = server.nodes[node_class_name].get("python_class")
@@ -277,6 +322,12 @@ async def sequential_runtime_step(
             # semaphore variables
             node_instance._memory = memory
 
+            if server.worker_pool.runs(node_class_name):
+                # evaluate in the extension's worker process instead
+                node_instance.evaluate = server.worker_pool.remote_evaluate(
+                    node_class_name, node_class
+                )
+
             node = Node(
                 node_id=node_id,
                 name=graph_node["nickname"],
@@ -290,18 +341,54 @@ async def sequential_runtime_step(
 
         node_errors = []
 
+        time_start = time.perf_counter()
         try:
-            execute_node(
-                node=node,
-                graph_node=graph_node,
-                graph_results=graph_results,
-                parameterized_rules=parameterized_rules,
-            )
+            if server.worker_pool.runs(node_class_name):
+                # the worker call blocks until the node returns, keep it off the event loop
+                await asyncio.get_running_loop().run_in_executor(
+                    None,
+                    functools.partial(
+                        execute_node,
+                        node=node,
+                        graph_node=graph_node,
+                        graph_results=graph_results,
+                        parameterized_rules=parameterized_rules,
+                    ),
+                )
+            elif inspect.iscoroutinefunction(node.class_instance.evaluate):
+                # e.g. network requests, awaited on the loop instead of blocking it
+                await execute_async_node(
+                    node=node,
+                    graph_node=graph_node,
+                    graph_results=graph_results,
+                    parameterized_rules=parameterized_rules,
+                )
+            else:
+                execute_node(
+                    node=node,
+                    graph_node=graph_node,
+                    graph_results=graph_results,
+                    parameterized_rules=parameterized_rules,
+                )
         except Exception as e:
             # create a dict that displays the stack trace
             stack_trace = make_stack_trace_dict(e)
             node_errors.append(stack_trace)
 
+        memory["run_record"]["nodes"].append(
+            {
+                "node_id": node_id,
+                "kind": node_class_name,
+                "seconds": time.perf_counter() - time_start,
+                "cache_hit": cache_hit,
+                "error": node_errors[0]["message"] if node_errors else None,
+                # outputs are delivered to the client keyed by prompt and node id
+                "output_handle": f"{response['prompt_id']}/{node_id}"
+                if node_id in graph_results
+                else None,
+            }
+        )
+
         await node_executed_client_update(
             server=server,
             graph_results=graph_results,
@@ -372,6 +459,16 @@ async def sequential_runtime_step(
 
 
 def execute_node(node, graph_node, graph_results, parameterized_rules):
+    node_input_group = resolve_node_inputs(node, graph_node, graph_results, parameterized_rules)
+    graph_results[node.node_id] = node._evaluate(node_input_group)
+
+
+async def execute_async_node(node, graph_node, graph_results, parameterized_rules):
+    node_input_group = resolve_node_inputs(node, graph_node, graph_results, parameterized_rules)
+    graph_results[node.node_id] = await node._evaluate_async(node_input_group)
+
+
+def resolve_node_inputs(node, graph_node, graph_results, parameterized_rules):
     node_input_group = node.input_template()
 
     resolve_input_group_inputs(
@@ -390,7 +487,7 @@ def execute_node(node, graph_node, graph_results, parameterized_rules):
         parameterized_rules=parameterized_rules,
     )
 
-    graph_results[node.node_id] = node._evaluate(node_input_group)
+    return node_input_group
 
 
 def resolve_input_group_inputs(
@@ -512,11 +609,7 @@ def resolve_rule_parameters(
             #     print(graph_node, parameter.name)
 
 
-async def node_executed_client_update(
-    server, graph_results, event, node_errors, response, evaluation_action
-):
-    # send the results to the client
-
+def serialize_graph_results(graph_results):
     response_value = {}
     if graph_results:
         for node_id, node_output in graph_results.items():
@@ -559,11 +652,22 @@ async def node_executed_client_update(
                     "outcomes": outcome_dict,
                 }
 
+    return response_value
+
+
+async def node_executed_client_update(
+    server, graph_results, event, node_errors, response, evaluation_action
+):
+    # runs submitted as part of a batch report their results to the batch stream
+    if response.get("quiet"):
+        return
+
+    # send the results to the client
     response_object = {
         "prompt_id": response["prompt_id"],
         "number": response["number"],
         "node_errors": node_errors,
-        "results": response_value,
+        "results": serialize_graph_results(graph_results),
         "evaluation_action": evaluation_action if evaluation_action else None,
     }
 
@@ -572,4 +676,8 @@ async def node_executed_client_update(
         data=response_object,
         # get sid from clientid while processing the queue and send the data to the client
         sid=server.client_id,
+        # results are cumulative, so a queued progress update is superseded by the next one
+        coalesce_key=None
+        if node_errors
+        else ("results" if graph_results else "evaluating", response["prompt_id"]),
     )
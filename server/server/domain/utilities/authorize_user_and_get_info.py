@@ -1,13 +1,18 @@
 from aiohttp import web
 
-from .verify_google_token import verify_google_token
+from .token_verification import verify_token
 
 import os
 
 
-def authorize_user_and_get_info(request):
+async def authorize_user_and_get_info(request):
     if not str(os.getenv("NEOSCAFFOLD_AUTH_ENABLED", "")).lower() == "true":
-        return {"user_info": {"user_id": "neoscaffold_user"}, "proto_list": ["json"]}
+        # without authentication a client may pick its own user id (e.g. simulated load test clients)
+        user_id = request.rel_url.query.get("user_id") or "neoscaffold_user"
+        # echo the client's protocols so the first one (e.g. "msgpack") can be negotiated
+        ws_proto_header = request.headers.get("Sec-WebSocket-Protocol", "").replace(" ", "")
+        proto_list = ws_proto_header.split(",") if ws_proto_header else ["json"]
+        return {"user_info": {"user_id": user_id}, "proto_list": proto_list}
 
     # if request is a websocket request, then we need to get the token from the query params
     ws_proto_header = request.headers.get("Sec-WebSocket-Protocol", "")
@@ -41,13 +46,8 @@ def authorize_user_and_get_info(request):
 
     authenticator = authenticator_header
 
-    user_info = {}
-    if authenticator == "google":
-        user_info = verify_google_token(bearer_token)
-
-        if user_info.get("error"):
-            return web.json_response(user_info, status=401)
-    else:
-        return web.json_response({"error": "Unknown authenticator"}, status=401)
+    user_info = await verify_token(authenticator, bearer_token)
+    if user_info.get("error"):
+        return web.json_response(user_info, status=401)
 
     return {"user_info": user_info, "proto_list": ws_proto_list}
@@ -0,0 +1,15 @@
+from aiohttp import web
+
+from .encoders import get_encoder
+
+
+def encoded_response(request, data, status=200):
+    """json response, or msgpack when the client lists application/msgpack in its Accept header"""
+    accept = request.headers.get("Accept", "")
+    encoder = get_encoder("msgpack" if "application/msgpack" in accept else "json")
+
+    body = encoder.dumps(data)
+    if not encoder.binary:
+        body = body.encode("utf-8")
+
+    return web.Response(body=body, status=status, content_type=encoder.content_type)
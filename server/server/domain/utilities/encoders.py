@@ -0,0 +1,135 @@
+import base64
+import dataclasses
+import json
+import struct
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# msgpack extension type for numeric arrays, the payload uses the pack_array layout
+ARRAY_EXT_TYPE = 1
+
+NUMERIC_DTYPE_KINDS = "biuf"
+
+
+def is_numeric_array(obj):
+    return (
+        numpy is not None
+        and isinstance(obj, numpy.ndarray)
+        and obj.dtype.kind in NUMERIC_DTYPE_KINDS
+    )
+
+
+def pack_array(array):
+    """
+    Typed binary layout for a numeric array:
+    dtype length (u8), dtype string (e.g. "<f4"), ndim (u8), shape (u32 each), raw C-order data
+    """
+    array = numpy.ascontiguousarray(array)
+    dtype = array.dtype.str.encode("ascii")
+    header = struct.pack(f">B{len(dtype)}sB{array.ndim}I", len(dtype), dtype, array.ndim, *array.shape)
+    return header + array.tobytes()
+
+
+def unpack_array(data):
+    dtype_length = data[0]
+    dtype = data[1 : 1 + dtype_length].decode("ascii")
+    offset = 1 + dtype_length
+    ndim = data[offset]
+    shape = struct.unpack_from(f">{ndim}I", data, offset + 1)
+    offset += 1 + 4 * ndim
+    return numpy.frombuffer(data, dtype=dtype, offset=offset).reshape(shape)
+
+
+def to_serializable(obj):
+    """fallback for values the encoders do not handle natively"""
+    if numpy is not None:
+        if isinstance(obj, numpy.ndarray):
+            return obj.tolist()
+        if isinstance(obj, numpy.generic):
+            return obj.item()
+    if hasattr(obj, "to_dict"):
+        return obj.to_dict()
+    if dataclasses.is_dataclass(obj) and not isinstance(obj, type):
+        return dataclasses.asdict(obj)
+    if isinstance(obj, (bytes, bytearray, memoryview)):
+        return base64.b64encode(obj).decode("ascii")
+    if isinstance(obj, (set, frozenset, tuple)):
+        return list(obj)
+    return str(obj)
+
+
+class JSONEncoder:
+    name = "json"
+    binary = False
+    content_type = "application/json"
+
+    def dumps(self, obj):
+        return json.dumps(obj, default=to_serializable)
+
+
+class OrjsonEncoder(JSONEncoder):
+    """same output as JSONEncoder, with numpy arrays and dataclasses serialized natively"""
+
+    options = (orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS) if orjson else 0
+
+    def dumps(self, obj):
+        try:
+            return orjson.dumps(obj, default=to_serializable, option=self.options).decode("utf-8")
+        except TypeError:
+            # e.g. integers wider than 64 bits
+            return super().dumps(obj)
+
+
+class MsgpackEncoder:
+    name = "msgpack"
+    binary = True
+    content_type = "application/msgpack"
+
+    def default(self, obj):
+        if is_numeric_array(obj):
+            return msgpack.ExtType(ARRAY_EXT_TYPE, pack_array(obj))
+        return to_serializable(obj)
+
+    def dumps(self, obj):
+        return msgpack.packb(obj, default=self.default, use_bin_type=True)
+
+
+ENCODERS = {}
+
+
+def register_encoder(encoder):
+    ENCODERS[encoder.name] = encoder
+
+
+register_encoder(OrjsonEncoder() if orjson else JSONEncoder())
+if msgpack:
+    register_encoder(MsgpackEncoder())
+
+
+def get_encoder(name=None):
+    """the encoder registered for a protocol name, JSON when it is unknown or its library is missing"""
+    return ENCODERS.get(name) or ENCODERS["json"]
+
+
+def dumps(obj):
+    return ENCODERS["json"].dumps(obj)
+
+
+def loads(data):
+    """parses JSON text or utf-8 bytes"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
@@ -0,0 +1,14 @@
+import asyncio
+
+from .encoders import loads
+
+# parsing a body this large would hold up every other request on the loop
+OFFLOAD_SIZE = 256 * 1024
+
+
+async def read_json(request, offload_size=OFFLOAD_SIZE):
+    """the request body parsed as JSON, large bodies are parsed in the default executor"""
+    body = await request.read()
+    if len(body) > offload_size:
+        return await asyncio.get_running_loop().run_in_executor(None, loads, body)
+    return loads(body)
@@ -1,102 +1,302 @@
-import requests
+import asyncio
+import functools
+import hashlib
 import json
 import os
+import random
+import threading
 import time
 
-from concurrent.futures import ThreadPoolExecutor
-from multiprocessing import cpu_count
+import aiohttp
 
+# statuses a bulk fetch tries again before recording the request as failed
+RETRY_STATUSES = (408, 429, 500, 502, 503, 504)
 
-def write_failures(failures_dict, path):
-    if len(failures_dict):
-        data = {}
-        if os.path.exists(path):
-            with open(path, "r") as fg:
-                data = json.load(fg)
-                data.update(failures_dict)
-        with open(path, "w+") as fg:
-            fg.write(json.dumps(data, indent=4))
-            fg.close()
 
+def request_id(request):
+    """the id a request is journaled under, its "id" or a hash of what it asks for"""
+    if request.get("id") is not None:
+        return str(request["id"])
+    key = [request.get("method", "GET"), request.get("url"), request.get("payload")]
+    return hashlib.sha1(json.dumps(key, sort_keys=True).encode("utf-8")).hexdigest()
 
-def fetch_handle(response, response_type, fetch_handle_parameters):
-    asset_id = fetch_handle_parameters.get("id")
-    if response_type == "json":
-        resp_json = response.json()
-        status = response.status_code
-        return status, resp_json
-    if response_type == "binary_file":
-        with open(asset_id, "wb") as f:
-            f.write(response.content)
-        status = response.status_code
-        return status, asset_id
-    else:
-        text = response.text
-        status = response.status_code
-        return status, text
-
-
-def fetch(
-    url,
-    method="GET",
-    payload=None,
-    headers=None,
-    response_type="json",
-    fetch_handle_parameters={},
-):
-    """fetch a single request with retries and exponential backoff"""
-    retry_count = 0
-    while retry_count < 5:
+
+class Journal:
+    """
+    Append-only record of which requests of a bulk fetch completed and which failed.
+    Without a path nothing is recorded.
+
+    Each line is {"id", "state": "done" | "failed", ...}, the latest line for an id
+    wins. Lines are only ever appended, so a crash loses at most the lines that were
+    not flushed yet, and a torn last line is ignored when the journal is read back.
+    """
+
+    def __init__(self, path, flush_every=100):
+        self.path = path
+        self.flush_every = flush_every
+        self.file = None
+        self.unflushed = 0
+        # records are written from executor threads
+        self.lock = threading.Lock()
+
+    def load(self):
+        """{id: entry} of the latest entry of every id"""
+        entries = {}
+        if self.path is None or not os.path.exists(self.path):
+            return entries
+        with open(self.path, "r") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                entries[entry["id"]] = entry
+        return entries
+
+    def record(self, id, state, **details):
+        if self.path is None:
+            return
+        with self.lock:
+            if self.file is None:
+                if os.path.dirname(self.path):
+                    os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                self.file = open(self.path, "a")
+            self.file.write(json.dumps({"id": id, "state": state, **details}) + "\n")
+            self.unflushed += 1
+            if self.unflushed >= self.flush_every:
+                self.sync()
+
+    def flush(self):
+        with self.lock:
+            self.sync()
+
+    def sync(self):
+        if self.file is not None and self.unflushed:
+            self.file.flush()
+            os.fsync(self.file.fileno())
+            self.unflushed = 0
+
+    def close(self):
+        with self.lock:
+            self.sync()
+            if self.file is not None:
+                self.file.close()
+                self.file = None
+
+
+def percentile(values, fraction):
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+class Throughput:
+    """
+    requests per second and latency percentiles of a bulk fetch
+
+    percentiles come from a uniform sample of at most sample_size latencies, so a long
+    job doesn't keep one per request
+    """
+
+    def __init__(self, sample_size=10000):
+        self.started_at = time.monotonic()
+        self.sample_size = sample_size
+        self.latencies = []
+        self.done = 0
+        self.failed = 0
+        self.skipped = 0
+
+    def observe(self, seconds, ok):
+        observed = self.done + self.failed + 1
+        if len(self.latencies) < self.sample_size:
+            self.latencies.append(seconds)
+        else:
+            slot = random.randrange(observed)
+            if slot < self.sample_size:
+                self.latencies[slot] = seconds
+        if ok:
+            self.done += 1
+        else:
+            self.failed += 1
+
+    def report(self):
+        elapsed = time.monotonic() - self.started_at
+        count = self.done + self.failed
+        return {
+            "requests": count,
+            "done": self.done,
+            "failed": self.failed,
+            "skipped": self.skipped,
+            "elapsed_seconds": elapsed,
+            "requests_per_second": count / elapsed if elapsed else 0.0,
+            "latency_p50_ms": (percentile(self.latencies, 0.5) or 0) * 1000,
+            "latency_p99_ms": (percentile(self.latencies, 0.99) or 0) * 1000,
+        }
+
+
+class BulkFetch:
+    """
+    Fetches a large, possibly lazy, iterable of requests and can pick up where it stopped.
+
+    Every finished request is appended to a Journal. Running again with the same journal
+    skips the requests it already has, and with retry_failures only the requests whose
+    latest entry failed are fetched again. At most concurrency requests are in flight and
+    requests are pulled from the iterable only as slots free up, so memory stays flat
+    however many there are. Responses are handed to on_result(request, status, body) as
+    they arrive; the journal records ids, not bodies. Progress is printed every
+    report_interval seconds.
+    """
+
+    def __init__(
+        self,
+        journal_path,
+        concurrency=64,
+        response_type="json",
+        retry_failures=False,
+        max_attempts=3,
+        on_result=None,
+        report_interval=10.0,
+        timeout=60.0,
+    ):
+        self.journal = Journal(journal_path)
+        self.concurrency = concurrency
+        self.response_type = response_type
+        self.retry_failures = retry_failures
+        self.max_attempts = max_attempts
+        self.on_result = on_result
+        self.report_interval = report_interval
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self.throughput = Throughput()
+        # the journal as of the first run, kept current as requests finish
+        self.entries = None
+
+    def should_fetch(self, id):
+        entry = self.entries.get(id)
+        if self.retry_failures:
+            return entry is not None and entry["state"] == "failed"
+        return entry is None
+
+    async def run(self, all_requests):
+        """fetches every request the journal doesn't account for, returns the throughput report"""
+        loop = asyncio.get_running_loop()
+        if self.entries is None:
+            self.entries = await loop.run_in_executor(None, self.journal.load)
+        self.throughput = Throughput()
+        pending = iter(all_requests)
+
+        async def worker(session):
+            for request in pending:
+                id = request_id(request)
+                if not self.should_fetch(id):
+                    self.throughput.skipped += 1
+                    continue
+                await self.fetch(session, id, request)
+
+        connector = aiohttp.TCPConnector(limit=self.concurrency)
+        reporter = asyncio.create_task(self.report_progress())
         try:
-            if method == "GET":
-                response = requests.get(url, headers=headers)
-            elif method == "POST":
-                response = requests.post(url, json=payload, headers=headers)
-            elif method == "PUT":
-                response = requests.put(url, json=payload, headers=headers)
-            elif method == "PATCH":
-                response = requests.patch(url, json=payload, headers=headers)
-            elif method == "DELETE":
-                response = requests.delete(url, headers=headers)
-            else:
-                raise ValueError("Invalid method")
-            return fetch_handle(response, response_type, fetch_handle_parameters)
-        except Exception as e:
-            print(e)
-            retry_count += 1
-            time.sleep(2**retry_count)
-    return None
-
-
-def process_batch(batch, response_type="json"):
-    """process a batch of requests"""
-
-    num_workers = 5 * cpu_count()
-    with ThreadPoolExecutor(max_workers=num_workers) as executor:
-        futures = []
-        for request in batch:
-            future = executor.submit(
-                fetch,
-                request.get("url"),
-                request.get("method"),
-                request.get("payload"),
-                request.get("headers"),
-                response_type,
-                fetch_handle_parameters=request.get("fetch_handle_parameters", {}),
+            async with aiohttp.ClientSession(connector=connector, timeout=self.timeout) as session:
+                await asyncio.gather(*(worker(session) for _ in range(self.concurrency)))
+        finally:
+            reporter.cancel()
+            await loop.run_in_executor(None, self.journal.close)
+        return self.throughput.report()
+
+    async def fetch(self, session, id, request):
+        time_start = time.monotonic()
+        status, body, error = None, None, None
+        for attempt in range(self.max_attempts):
+            if attempt:
+                await asyncio.sleep(min(30, 0.1 * 2**attempt))
+            try:
+                async with session.request(
+                    request.get("method", "GET"),
+                    request.get("url"),
+                    json=request.get("payload"),
+                    headers=request.get("headers"),
+                ) as response:
+                    status = response.status
+                    if status in RETRY_STATUSES:
+                        await response.read()
+                        error = f"HTTP {status}"
+                        continue
+                    body = await read_body(response, self.response_type)
+                    error = f"HTTP {status}" if status >= 400 else None
+                    break
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                error = f"{type(e).__name__}: {e}"
+            except ValueError as e:
+                # a body that doesn't parse won't parse next time either
+                error = f"{type(e).__name__}: {e}"
+                break
+
+        ok = error is None
+        self.throughput.observe(time.monotonic() - time_start, ok)
+        entry = {"status": status} if ok else {"status": status, "error": error}
+        self.entries[id] = {"id": id, "state": "done" if ok else "failed", **entry}
+        # writes, and every so often an fsync, stay off the event loop
+        await asyncio.get_running_loop().run_in_executor(
+            None, functools.partial(self.journal.record, id, self.entries[id]["state"], **entry)
+        )
+        if self.on_result is not None:
+            self.on_result(request, status, body)
+
+    async def report_progress(self):
+        while True:
+            await asyncio.sleep(self.report_interval)
+            report = self.throughput.report()
+            print(
+                f"bulk fetch: {report['done']} done, {report['failed']} failed, "
+                f"{report['skipped']} skipped, {report['requests_per_second']:.1f} req/s, "
+                f"p50 {report['latency_p50_ms']:.1f}ms, p99 {report['latency_p99_ms']:.1f}ms"
             )
-            futures.append(future)
-        request_responses = [future.result() for future in futures]
-    return [
-        {"request": batch[i], "response": r} for i, r in enumerate(request_responses)
-    ]
-
-
-def request_generator(batches, response_type, failure_path=None):
-    """Generator function that yields batches of requests"""
-    ids_that_failed = {}
-
-    for i, batch in enumerate(batches):
-        print(f"batch_num: {i}")
-        if failure_path:
-            write_failures(ids_that_failed, failure_path)
-        yield process_batch(batch, response_type)
+
+
+async def read_body(response, response_type):
+    if response_type == "json":
+        return await response.json(content_type=None)
+    if response_type == "bytes":
+        return await response.read()
+    return await response.text()
+
+
+def bulk_fetch(all_requests, journal_path, **options):
+    """blocking BulkFetch(journal_path, **options).run(all_requests)"""
+    return asyncio.run(BulkFetch(journal_path, **options).run(all_requests))
+
+
+def request_generator(
+    batches, response_type="json", journal_path=None, retry_failures=False, concurrency=64
+):
+    """
+    Generator function that yields the results of each batch of requests
+
+    The batches are fetched by one BulkFetch, so with a journal_path a generator restarted
+    after a crash skips the requests that already completed, and with retry_failures only
+    the ones that failed are fetched. Each batch yields the requests it fetched, in batch
+    order, as {"request", "response": (status, body)}.
+    """
+    results = {}
+    bulk = BulkFetch(
+        journal_path,
+        concurrency=concurrency,
+        response_type=response_type,
+        retry_failures=retry_failures,
+        on_result=lambda request, status, body: results.__setitem__(id(request), (status, body)),
+    )
+    loop = asyncio.new_event_loop()
+    try:
+        for i, batch in enumerate(batches):
+            print(f"batch_num: {i}")
+            results.clear()
+            loop.run_until_complete(bulk.run(batch))
+            yield [
+                {"request": request, "response": results[id(request)]}
+                for request in batch
+                if id(request) in results
+            ]
+    finally:
+        loop.run_until_complete(loop.shutdown_default_executor())
+        loop.close()
@@ -0,0 +1,227 @@
+import asyncio
+import hashlib
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+GOOGLE_CERTS_URL = "https://www.googleapis.com/oauth2/v1/certs"
+GOOGLE_ISSUERS = ("accounts.google.com", "https://accounts.google.com")
+
+
+class TokenVerifier:
+    """
+    Verifies a bearer token for one authenticator.
+
+    verify is blocking and runs on a thread; it returns the user info dict with at least
+    "user_id" and "expiration" (unix seconds), or a dict with an "error".
+    """
+
+    def verify(self, token):
+        raise NotImplementedError
+
+
+class CertStore:
+    """
+    Signing certificates fetched from a JWKS-style url and kept until the response's max-age.
+
+    Once most of the lifetime has passed the certificates are refreshed on a background
+    thread while the current ones keep being served. Failed fetches are logged and
+    counted as auth.certs.fetch_failures.
+    """
+
+    def __init__(self, url, default_max_age=3600, refresh_fraction=0.8, logger=None, metrics=None):
+        self.url = url
+        self.default_max_age = default_max_age
+        self.refresh_fraction = refresh_fraction
+        self.logger = logger or logging.getLogger(__name__)
+        self.metrics = metrics
+        self.certs = None
+        self.fetched_at = 0.0
+        self.max_age = default_max_age
+        self.lock = threading.Lock()
+        self.refreshing = False
+
+    def count(self, name):
+        if self.metrics is not None:
+            self.metrics.increment(name)
+
+    def fetch(self):
+        import requests
+
+        try:
+            response = requests.get(self.url, timeout=10)
+            response.raise_for_status()
+            certs = response.json()
+        except Exception:
+            self.count("auth.certs.fetch_failures")
+            raise
+        self.count("auth.certs.fetches")
+
+        max_age = self.default_max_age
+        match = re.search(r"max-age=(\d+)", response.headers.get("Cache-Control", ""))
+        if match:
+            max_age = int(match.group(1))
+
+        with self.lock:
+            self.certs = certs
+            self.fetched_at = time.monotonic()
+            self.max_age = max_age
+
+    def refresh_in_background(self):
+        with self.lock:
+            if self.refreshing:
+                return
+            self.refreshing = True
+
+        def refresh():
+            try:
+                self.fetch()
+            except Exception as e:
+                # the current certificates are kept until they expire
+                self.logger.warning(f"refreshing certificates from {self.url} failed / {e}")
+            finally:
+                self.refreshing = False
+
+        threading.Thread(target=refresh, name="cert-refresh", daemon=True).start()
+
+    def get(self, force_refresh=False):
+        age = time.monotonic() - self.fetched_at
+        if self.certs is None or force_refresh or age > self.max_age:
+            self.fetch()
+        elif age > self.max_age * self.refresh_fraction:
+            self.refresh_in_background()
+        return self.certs
+
+
+class GoogleTokenVerifier(TokenVerifier):
+    def __init__(self, client_id=None, cert_store=None):
+        self.client_id = client_id
+        self.cert_store = cert_store or CertStore(GOOGLE_CERTS_URL)
+
+    def decode(self, token, force_refresh=False):
+        from google.auth import jwt
+
+        return jwt.decode(
+            token,
+            certs=self.cert_store.get(force_refresh=force_refresh),
+            audience=self.client_id or os.getenv("GOOGLE_SIGN_IN_CLIENT_ID"),
+            clock_skew_in_seconds=10,
+        )
+
+    def verify(self, token):
+        if token is None:
+            return {"error": "Invalid token"}
+        try:
+            try:
+                user_info = self.decode(token)
+            except ValueError as e:
+                # google rotates its keys, an unknown key id means our certificates are stale
+                if "Certificate for key id" not in str(e):
+                    raise
+                user_info = self.decode(token, force_refresh=True)
+
+            if user_info.get("iss") not in GOOGLE_ISSUERS:
+                raise ValueError(f"Wrong issuer. 'iss' should be one of {GOOGLE_ISSUERS}")
+
+            return {
+                "user_id": user_info["sub"],
+                "email": user_info["email"],
+                "name": user_info.get("name"),
+                "email_verified": user_info.get("email_verified"),
+                "picture": user_info.get("picture"),
+                "hosted_domain": user_info.get("hd"),
+                "not_before": user_info.get("nbf"),
+                "issued_at": user_info["iat"],
+                "expiration": user_info["exp"],
+                "jwt_id": user_info.get("jti"),
+                "issuer": user_info["iss"],
+            }
+        except Exception as e:
+            print(e)
+            return {"error": str(e)}
+
+
+class VerifiedTokenCache:
+    """verified user info keyed by token hash, each entry living until the token expires or max_ttl"""
+
+    def __init__(self, max_entries=10000, max_ttl=300.0):
+        self.max_entries = max_entries
+        self.max_ttl = max_ttl
+        self.entries = OrderedDict()
+
+    @staticmethod
+    def key(authenticator, token):
+        return hashlib.sha256(f"{authenticator}:{token}".encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        expires_at, info = entry
+        if time.time() >= expires_at:
+            del self.entries[key]
+            return None
+        self.entries.move_to_end(key)
+        return info
+
+    def put(self, key, info):
+        expires_at = time.time() + self.max_ttl
+        if info.get("expiration"):
+            expires_at = min(expires_at, float(info["expiration"]))
+        if expires_at <= time.time():
+            return
+
+        self.entries[key] = (expires_at, info)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+
+VERIFIERS = {"google": GoogleTokenVerifier()}
+
+token_cache = VerifiedTokenCache()
+
+# verifications in progress, so a burst of requests with one new token verifies it once
+in_flight = {}
+
+
+def register_verifier(authenticator, verifier):
+    VERIFIERS[authenticator] = verifier
+
+
+def report_to(logger, metrics):
+    """sends what the verifiers' certificate stores log and count to the server"""
+    for verifier in VERIFIERS.values():
+        cert_store = getattr(verifier, "cert_store", None)
+        if cert_store is not None:
+            cert_store.logger = logger
+            cert_store.metrics = metrics
+
+
+async def verify_token(authenticator, token):
+    """user info for a token, from the cache or verified on a thread"""
+    verifier = VERIFIERS.get(authenticator)
+    if verifier is None:
+        return {"error": "Unknown authenticator"}
+
+    key = VerifiedTokenCache.key(authenticator, token)
+    info = token_cache.get(key)
+    if info is not None:
+        return info
+
+    future = in_flight.get(key)
+    if future is None:
+        future = asyncio.get_running_loop().run_in_executor(None, verifier.verify, token)
+        in_flight[key] = future
+        try:
+            info = await future
+        finally:
+            in_flight.pop(key, None)
+        if not info.get("error"):
+            token_cache.put(key, info)
+        return info
+
+    return await asyncio.shield(future)
@@ -1,10 +1,13 @@
 import asyncio
+import functools
 import json
 from aiohttp import web
 
-from ...domain.utilities.verify_google_token import verify_google_token
+from ...domain.utilities.token_verification import verify_token
 from ...domain.utilities.authorize_user_and_get_info import authorize_user_and_get_info
-from ...domain.utilities.fallback_json_encoder import dumps
+from ...domain.utilities.encoded_response import encoded_response
+from ...domain.utilities.read_json import read_json
+from ..servers.extension_catalog import precompressed_response
 
 
 def base_routes(server):
@@ -12,7 +15,7 @@ def base_routes(server):
 
     @routes.post("/interventions/stop-points")
     async def toggle_stop_points(request):
-        info = authorize_user_and_get_info(request)
+        info = await authorize_user_and_get_info(request)
 
         if isinstance(info, web.Response):
             return info
@@ -26,7 +29,7 @@ def base_routes(server):
         json_data = await request.json()
 
         if "workflow_id" in json_data and ("node_ids" in json_data):
-            workflow_session = server.toggle_stop_points(
+            workflow_session = await server.toggle_stop_points(
                 client_id=user_id,
                 workflow_id=json_data.get("workflow_id"),
                 node_ids=json_data.get("node_ids"),
@@ -34,14 +37,14 @@ def base_routes(server):
             )
             server.logger.info(workflow_session)
 
-            return web.json_response(
+            return encoded_response(
+                request,
                 {
                     "user_id": user_id,
                     "workflow_id": json_data.get("workflow_id"),
                     "workflow_session": workflow_session,
                     "node_ids": json_data.get("node_ids"),
                 },
-                dumps=dumps
             )
         else:
             return web.json_response(
@@ -50,7 +53,7 @@ def base_routes(server):
 
     @routes.post("/interventions/restart-points")
     async def toggle_restart_points(request):
-        info = authorize_user_and_get_info(request)
+        info = await authorize_user_and_get_info(request)
 
         if isinstance(info, web.Response):
             return info
@@ -64,7 +67,7 @@ def base_routes(server):
         json_data = await request.json()
 
         if "workflow_id" in json_data and ("node_ids" in json_data):
-            workflow_session = server.toggle_restart_points(
+            workflow_session = await server.toggle_restart_points(
                 client_id=user_id,
                 workflow_id=json_data.get("workflow_id"),
                 node_ids=json_data.get("node_ids"),
@@ -72,14 +75,14 @@ def base_routes(server):
             )
             server.logger.info(workflow_session)
 
-            return web.json_response(
+            return encoded_response(
+                request,
                 {
                     "user_id": user_id,
                     "workflow_id": json_data.get("workflow_id"),
                     "workflow_session": workflow_session,
                     "node_ids": json_data.get("node_ids"),
                 },
-                dumps=dumps
             )
         else:
             return web.json_response(
@@ -88,7 +91,7 @@ def base_routes(server):
 
     @routes.post("/interventions/breakpoints/step-through")
     async def step_through_breakpoints(request):
-        info = authorize_user_and_get_info(request)
+        info = await authorize_user_and_get_info(request)
 
         if isinstance(info, web.Response):
             return info
@@ -102,21 +105,21 @@ def base_routes(server):
         json_data = await request.json()
 
         if "workflow_id" in json_data and ("node_ids" in json_data):
-            workflow_session = server.step_through_breakpoints(
+            workflow_session = await server.step_through_breakpoints(
                 client_id=user_id,
                 workflow_id=json_data.get("workflow_id"),
                 node_ids=json_data.get("node_ids")
             )
             server.logger.info(workflow_session)
 
-            return web.json_response(
+            return encoded_response(
+                request,
                 {
                     "user_id": user_id,
                     "workflow_id": json_data.get("workflow_id"),
                     "workflow_session": workflow_session,
                     "node_ids": json_data.get("node_ids"),
                 },
-                dumps=dumps
             )
         else:
             return web.json_response(
@@ -125,7 +128,7 @@ def base_routes(server):
 
     @routes.post("/interventions/breakpoints")
     async def toggle_breakpoints(request):
-        info = authorize_user_and_get_info(request)
+        info = await authorize_user_and_get_info(request)
 
         if isinstance(info, web.Response):
             return info
@@ -139,7 +142,7 @@ def base_routes(server):
         json_data = await request.json()
 
         if "workflow_id" in json_data and ("node_ids" in json_data):
-            workflow_session = server.toggle_breakpoints(
+            workflow_session = await server.toggle_breakpoints(
                 client_id=user_id,
                 workflow_id=json_data.get("workflow_id"),
                 node_ids=json_data.get("node_ids"),
@@ -147,14 +150,14 @@ def base_routes(server):
             )
             server.logger.info(workflow_session)
 
-            return web.json_response(
+            return encoded_response(
+                request,
                 {
                     "user_id": user_id,
                     "workflow_id": json_data.get("workflow_id"),
                     "workflow_session": workflow_session,
                     "node_ids": json_data.get("node_ids"),
                 },
-                dumps=dumps
             )
         else:
             return web.json_response(
@@ -163,7 +166,7 @@ def base_routes(server):
 
     @routes.post("/prompt")
     async def post_prompt(request):
-        info = authorize_user_and_get_info(request)
+        info = await authorize_user_and_get_info(request)
 
         if isinstance(info, web.Response):
             return info
@@ -176,7 +179,7 @@ def base_routes(server):
 
         server.client_id = user_id
 
-        json_data = await request.json()
+        json_data = await read_json(request)
 
         # on prompt handler
         json_data = server.trigger_on_prompt(json_data)
@@ -215,9 +218,27 @@ def base_routes(server):
                 {"error": "no prompt", "node_errors": []}, status=400
             )
 
-    @routes.get("/extensions")
-    async def get_extensions(request):
-        info = authorize_user_and_get_info(request)
+    async def stream_batch(request, batch, cursor):
+        response = web.StreamResponse(
+            headers={"Content-Type": "application/x-ndjson", "X-Batch-Id": batch.batch_id}
+        )
+        response.enable_chunked_encoding()
+        await response.prepare(request)
+
+        # the batch keeps running if the client goes away, it can resume from its last cursor
+        try:
+            await response.write((json.dumps(batch.summary()) + "\n").encode("utf-8"))
+            async for line in batch.lines_after(cursor):
+                await response.write(line)
+            await response.write((json.dumps(batch.summary()) + "\n").encode("utf-8"))
+            await response.write_eof()
+        except ConnectionResetError:
+            pass
+        return response
+
+    @routes.post("/prompt/batch")
+    async def post_prompt_batch(request):
+        info = await authorize_user_and_get_info(request)
 
         if isinstance(info, web.Response):
             return info
@@ -228,60 +249,107 @@ def base_routes(server):
         if not user_id:
             return web.json_response({"error": "No user id"}, status=401)
 
-        # get list of loaded extensions from server
-        extensions = server.extensions
-        # compile response
-        response_data = {}
-        for ext_name, ext in extensions.items():
-            ext_dict = {}
-            ext_dict["name"] = ext.get("name", "")
-            ext_dict["version"] = ext.get("version", "")
-            ext_dict["description"] = ext.get("description", "")
-            ext_dict["javascript"] = ext.get("javascript", "")
-            ext_dict["javascript_class_name"] = ext.get("javascript_class_name", "")
-            ext_dict["nodes"] = {}
-            ext_dict["rules"] = {}
-
-            for node_name, node in ext.get("nodes", {}).items():
-                node_dict = {}
-                node_dict["javascript_class_name"] = node.get(
-                    "javascript_class_name", ""
-                )
-                node_dict["display_name"] = node.get("display_name", "")
+        server.client_id = user_id
+
+        json_data = await read_json(request)
 
-                # from within the python class static values
-                node_dict["category"] = node.get("python_class").CATEGORY
-                node_dict["subcategory"] = node.get("python_class").SUBCATEGORY
-                node_dict["description"] = node.get("python_class").DESCRIPTION
+        # on prompt handler
+        json_data = server.trigger_on_prompt(json_data)
 
-                node_dict["input"] = node.get("python_class").INPUT
-                node_dict["output"] = node.get("python_class").OUTPUT
+        if "prompt" not in json_data:
+            return web.json_response(
+                {"error": "no prompt", "node_errors": []}, status=400
+            )
 
-                ext_dict["nodes"][node_name] = node_dict
+        # each run is a mapping of node id to the widget values it overrides
+        runs = json_data.get("runs")
+        if not isinstance(runs, list) or not all(isinstance(run, dict) for run in runs):
+            return web.json_response(
+                {"error": "runs must be a list of {node_id: {input: value}} overrides"},
+                status=400,
+            )
 
-            for rule_name, rule in ext.get("rules", {}).items():
-                rule_dict = {}
-                rule_dict["javascript_class_name"] = rule.get(
-                    "javascript_class_name", ""
-                )
-                rule_dict["display_name"] = rule.get("display_name", "")
+        server.current_workflow_id = json_data.get("workflow", {}).get("checksum")
 
-                rule_dict["category"] = rule.get("python_class").CATEGORY
-                rule_dict["subcategory"] = rule.get("python_class").SUBCATEGORY
-                rule_dict["description"] = rule.get("python_class").DESCRIPTION
+        batch = server.batch_runner.submit(
+            json_data["prompt"],
+            runs,
+            concurrency=json_data.get("concurrency"),
+            owner=user_id,
+        )
+        return await stream_batch(request, batch, 0)
 
-                rule_dict["parameters"] = rule.get("python_class").PARAMETERS
+    @routes.get("/prompt/batch/{batch_id}")
+    async def get_prompt_batch(request):
+        info = await authorize_user_and_get_info(request)
 
-                ext_dict["rules"][rule_name] = rule_dict
+        if isinstance(info, web.Response):
+            return info
 
-            # add extension info to response
-            response_data[ext_name] = ext_dict
+        user_info = info.get("user_info", {})
 
-        return web.json_response(response_data)
+        user_id = user_info.get("user_id")
+        if not user_id:
+            return web.json_response({"error": "No user id"}, status=401)
+
+        batch = server.batch_runner.batches.get(request.match_info["batch_id"])
+        if batch is None or batch.owner != user_id:
+            return web.json_response({"error": "Unknown batch"}, status=404)
+
+        try:
+            cursor = int(request.rel_url.query.get("cursor", 0))
+        except ValueError:
+            return web.json_response({"error": "cursor must be an integer"}, status=400)
+
+        return await stream_batch(request, batch, max(0, cursor))
+
+    @routes.get("/extensions")
+    async def get_extensions(request):
+        info = await authorize_user_and_get_info(request)
+
+        if isinstance(info, web.Response):
+            return info
+
+        user_info = info.get("user_info", {})
+
+        user_id = user_info.get("user_id")
+        if not user_id:
+            return web.json_response({"error": "No user id"}, status=401)
+
+        # ?javascript=url leaves each web.js out so it can be fetched and cached on its own
+        accept = request.headers.get("Accept", "")
+        representation = server.extension_catalog.representation(
+            encoder_name="msgpack" if "application/msgpack" in accept else "json",
+            inline_javascript=request.rel_url.query.get("javascript") != "url",
+        )
+        return precompressed_response(request, representation)
+
+    @routes.get("/extensions/{name}/web.js")
+    async def get_extension_javascript(request):
+        info = await authorize_user_and_get_info(request)
+
+        if isinstance(info, web.Response):
+            return info
+
+        user_info = info.get("user_info", {})
+
+        user_id = user_info.get("user_id")
+        if not user_id:
+            return web.json_response({"error": "No user id"}, status=401)
+
+        representation = server.extension_catalog.javascript.get(request.match_info["name"])
+        if representation is None:
+            return web.json_response({"error": "No javascript for extension"}, status=404)
+
+        # the catalog links to a versioned url, so that exact content never changes
+        cache_control = "no-cache"
+        if request.rel_url.query.get("v") == representation.etag:
+            cache_control = "private, max-age=31536000, immutable"
+        return precompressed_response(request, representation, cache_control=cache_control)
 
     @routes.get("/info")
     async def get_queue_info(request):
-        info = authorize_user_and_get_info(request)
+        info = await authorize_user_and_get_info(request)
 
         if isinstance(info, web.Response):
             return info
@@ -294,9 +362,41 @@ def base_routes(server):
 
         return web.json_response(server.get_queue_info())
 
+    @routes.get("/metrics")
+    async def get_metrics(request):
+        info = await authorize_user_and_get_info(request)
+
+        if isinstance(info, web.Response):
+            return info
+
+        user_info = info.get("user_info", {})
+
+        user_id = user_info.get("user_id")
+        if not user_id:
+            return web.json_response({"error": "No user id"}, status=401)
+
+        return encoded_response(request, server.metrics.snapshot())
+
+    @routes.get("/memory")
+    async def get_memory(request):
+        info = await authorize_user_and_get_info(request)
+
+        if isinstance(info, web.Response):
+            return info
+
+        user_info = info.get("user_info", {})
+
+        user_id = user_info.get("user_id")
+        if not user_id:
+            return web.json_response({"error": "No user id"}, status=401)
+
+        # ?objects=true adds counts of live objects by type, which is slow on a big heap
+        objects = request.rel_url.query.get("objects", "").lower() == "true"
+        return encoded_response(request, server.memory_report(objects=objects))
+
     @routes.get("/history")
     async def get_history(request):
-        info = authorize_user_and_get_info(request)
+        info = await authorize_user_and_get_info(request)
 
         if isinstance(info, web.Response):
             return info
@@ -307,14 +407,60 @@ def base_routes(server):
         if not user_id:
             return web.json_response({"error": "No user id"}, status=401)
 
-        max_items = request.rel_url.query.get("max_items", None)
-        if max_items is not None:
-            max_items = int(max_items)
-        return web.json_response(server.prompt_queue.get_history(max_items=max_items))
+        if server.run_history is None:
+            return web.json_response({"error": "Run history is disabled"}, status=404)
+
+        query = request.rel_url.query
+        try:
+            max_items = min(int(query.get("max_items", 100)), 10000)
+            since = float(query["since"]) if "since" in query else None
+            until = float(query["until"]) if "until" in query else None
+        except ValueError:
+            return web.json_response(
+                {"error": "max_items, since and until must be numbers"}, status=400
+            )
+
+        # users only see their own runs
+        runs = await asyncio.get_running_loop().run_in_executor(
+            None,
+            functools.partial(
+                server.run_history.query,
+                user_id=user_id,
+                workflow_checksum=query.get("workflow"),
+                status=query.get("status"),
+                since=since,
+                until=until,
+                max_items=max_items,
+            ),
+        )
+        return encoded_response(request, {run["prompt_id"]: run for run in runs})
+
+    @routes.get("/history/{prompt_id}")
+    async def get_history_prompt(request):
+        info = await authorize_user_and_get_info(request)
+
+        if isinstance(info, web.Response):
+            return info
+
+        user_info = info.get("user_info", {})
+
+        user_id = user_info.get("user_id")
+        if not user_id:
+            return web.json_response({"error": "No user id"}, status=401)
+
+        if server.run_history is None:
+            return web.json_response({"error": "Run history is disabled"}, status=404)
+
+        runs = await asyncio.get_running_loop().run_in_executor(
+            None, server.run_history.get, request.match_info["prompt_id"], user_id
+        )
+        if not runs:
+            return web.json_response({"error": "Unknown prompt"}, status=404)
+        return encoded_response(request, {"runs": runs})
 
     @routes.get("/queue")
     async def get_queue(request):
-        info = authorize_user_and_get_info(request)
+        info = await authorize_user_and_get_info(request)
 
         if isinstance(info, web.Response):
             return info
@@ -344,7 +490,7 @@ def base_routes(server):
         info = {}
 
         try:
-            info = verify_google_token(token)
+            info = await verify_token("google", token)
             if info.get("error"):
                 raise Exception(info.get("error"))
         except Exception as e:
@@ -362,7 +508,7 @@ def base_routes(server):
         info = {}
 
         try:
-            info = verify_google_token(token)
+            info = await verify_token("google", token)
             if info.get("error"):
                 raise Exception(info.get("error"))
         except Exception as e:
@@ -0,0 +1,132 @@
+from aiohttp import web
+
+from ...domain.utilities.authorize_user_and_get_info import authorize_user_and_get_info
+from ...domain.utilities.encoded_response import encoded_response
+from ..servers.upload_store import CHUNK_SIZE, UploadError
+
+
+async def part_chunks(part):
+    while chunk := await part.read_chunk(CHUNK_SIZE):
+        yield chunk
+
+
+def upload_error_response(error):
+    return web.json_response({"error": str(error), **error.details}, status=error.status)
+
+
+def upload_routes(server):
+    routes = server.routes
+
+    @routes.post("/upload")
+    async def post_upload(request):
+        info = await authorize_user_and_get_info(request)
+
+        if isinstance(info, web.Response):
+            return info
+
+        user_info = info.get("user_info", {})
+
+        user_id = user_info.get("user_id")
+        if not user_id:
+            return web.json_response({"error": "No user id"}, status=401)
+
+        # multipart/form-data with a "file" field, or the file itself as the body
+        try:
+            if request.content_type.startswith("multipart/"):
+                reader = await request.multipart()
+                part = await reader.next()
+                while part is not None and part.name != "file":
+                    await part.release()
+                    part = await reader.next()
+                if part is None:
+                    return web.json_response({"error": "no file field"}, status=400)
+                upload = await server.upload_store.store(part.filename, part_chunks(part))
+            else:
+                upload = await server.upload_store.store(
+                    request.rel_url.query.get("name"),
+                    request.content.iter_chunked(CHUNK_SIZE),
+                )
+        except UploadError as error:
+            return upload_error_response(error)
+
+        return encoded_response(request, upload)
+
+    @routes.post("/upload/sessions")
+    async def post_upload_session(request):
+        info = await authorize_user_and_get_info(request)
+
+        if isinstance(info, web.Response):
+            return info
+
+        user_info = info.get("user_info", {})
+
+        user_id = user_info.get("user_id")
+        if not user_id:
+            return web.json_response({"error": "No user id"}, status=401)
+
+        json_data = await request.json()
+        size = json_data.get("size")
+        if not isinstance(size, int) or size < 0:
+            return web.json_response({"error": "size must be a byte count"}, status=400)
+
+        # a known sha256 finishes the upload before any bytes are sent
+        try:
+            upload = await server.loop.run_in_executor(
+                None, server.upload_store.create, json_data.get("name"), size, json_data.get("sha256")
+            )
+        except UploadError as error:
+            return upload_error_response(error)
+
+        if "handle" in upload:
+            return encoded_response(request, upload)
+        return web.json_response(upload, status=201)
+
+    @routes.get("/upload/sessions/{upload_id}")
+    async def get_upload_session(request):
+        info = await authorize_user_and_get_info(request)
+
+        if isinstance(info, web.Response):
+            return info
+
+        user_info = info.get("user_info", {})
+
+        user_id = user_info.get("user_id")
+        if not user_id:
+            return web.json_response({"error": "No user id"}, status=401)
+
+        try:
+            upload = await server.upload_store.status(request.match_info["upload_id"])
+        except UploadError as error:
+            return upload_error_response(error)
+
+        return encoded_response(request, upload)
+
+    @routes.patch("/upload/sessions/{upload_id}")
+    async def patch_upload_session(request):
+        info = await authorize_user_and_get_info(request)
+
+        if isinstance(info, web.Response):
+            return info
+
+        user_info = info.get("user_info", {})
+
+        user_id = user_info.get("user_id")
+        if not user_id:
+            return web.json_response({"error": "No user id"}, status=401)
+
+        try:
+            offset = int(request.headers.get("Upload-Offset", ""))
+        except ValueError:
+            return web.json_response({"error": "Upload-Offset header is required"}, status=400)
+
+        # after a dropped connection the client resumes from the offset GET reports
+        try:
+            upload = await server.upload_store.append(
+                request.match_info["upload_id"],
+                offset,
+                request.content.iter_chunked(CHUNK_SIZE),
+            )
+        except UploadError as error:
+            return upload_error_response(error)
+
+        return encoded_response(request, upload)
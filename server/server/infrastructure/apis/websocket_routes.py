@@ -1,5 +1,6 @@
 from aiohttp import web, WSMsgType
 from ...domain.utilities.authorize_user_and_get_info import authorize_user_and_get_info
+from ...domain.utilities.encoders import ENCODERS
 
 
 def base_websocket(server):
@@ -7,7 +8,7 @@ def base_websocket(server):
 
     @routes.get("/ws")
     async def websocket_handler(request):
-        info = authorize_user_and_get_info(request)
+        info = await authorize_user_and_get_info(request)
 
         if isinstance(info, web.Response):
             return info
@@ -21,14 +22,21 @@ def base_websocket(server):
         # sessions are scoped to the user
         session_id = user_id
 
-        ws = web.WebSocketResponse(protocols=info.get("proto_list", []))
+        # the first protocol names the encoding, the rest carry credentials
+        proto_list = info.get("proto_list", [])
+        if proto_list and proto_list[0] not in ENCODERS:
+            # agreeing to an encoding we can't produce would send frames the client can't read
+            server.logger.warning(f"refused websocket protocol {proto_list[0]!r}")
+            return web.json_response(
+                {"error": f"Unsupported protocol {proto_list[0]!r}, use one of {sorted(ENCODERS)}"},
+                status=400,
+            )
 
-        await ws.prepare(request)
+        ws = web.WebSocketResponse(protocols=proto_list[:1])
 
-        # Reusing existing session, remove old
-        server.sockets.pop(session_id, None)
+        await ws.prepare(request)
 
-        server.sockets[session_id] = ws
+        connection = server.connect_socket(session_id, ws)
 
         try:
             # Send initial state to the new client
@@ -50,6 +58,6 @@ def base_websocket(server):
                         "ws connection closed with exception %s" % ws.exception()
                     )
         finally:
-            server.sockets.pop(session_id, None)
+            await server.disconnect_socket(session_id, connection)
 
         return ws
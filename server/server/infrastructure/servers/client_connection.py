@@ -0,0 +1,127 @@
+import asyncio
+import time
+from collections import deque
+
+import aiohttp
+
+
+class ClientConnection:
+    """
+    Outbound side of one websocket.
+
+    Messages are queued without blocking the caller and written by a dedicated sender
+    task, so a slow client only delays itself. Messages that share a coalesce key
+    replace each other while queued (e.g. cumulative node results for one prompt), and
+    a client that stays behind for longer than max_lag_seconds is disconnected.
+    """
+
+    def __init__(self, sid, ws, encoder, metrics, logger, max_queue=256, max_lag_seconds=30.0):
+        self.sid = sid
+        self.ws = ws
+        self.encoder = encoder
+        self.metrics = metrics
+        self.logger = logger
+        self.max_queue = max_queue
+        self.max_lag_seconds = max_lag_seconds
+
+        # entries are [is_binary, payload, coalesce_key], a payload of None marks a replaced entry
+        self.queue = deque()
+        self.pending = {}
+        self.queued = 0
+        self.behind_since = None
+        self.closed = False
+
+        self.wakeup = asyncio.Event()
+        self.sender = asyncio.create_task(self.send_loop())
+
+    def put(self, payload, is_binary=False, coalesce_key=None):
+        if self.closed:
+            return
+
+        if coalesce_key is not None and coalesce_key in self.pending:
+            self.pending.pop(coalesce_key)[1] = None
+            self.queued -= 1
+            self.metrics.increment("websocket.coalesced")
+
+        if self.queued >= self.max_queue and not self.drop_oldest_coalescible():
+            # nothing left that is safe to drop
+            self.disconnect("send queue full")
+            return
+
+        entry = [is_binary, payload, coalesce_key]
+        self.queue.append(entry)
+        self.queued += 1
+        if coalesce_key is not None:
+            self.pending[coalesce_key] = entry
+
+        self.check_lag()
+        self.wakeup.set()
+
+    def drop_oldest_coalescible(self):
+        for entry in self.queue:
+            if entry[1] is not None and entry[2] is not None:
+                del self.pending[entry[2]]
+                entry[1] = None
+                self.queued -= 1
+                self.metrics.increment("websocket.dropped")
+                return True
+        return False
+
+    def check_lag(self):
+        if self.queued <= self.max_queue // 2:
+            self.behind_since = None
+        elif self.behind_since is None:
+            self.behind_since = time.monotonic()
+        elif time.monotonic() - self.behind_since > self.max_lag_seconds:
+            self.disconnect("client fell behind")
+
+    def disconnect(self, reason):
+        if self.closed:
+            return
+        self.closed = True
+        self.queue.clear()
+        self.pending.clear()
+        self.queued = 0
+        self.metrics.increment("websocket.disconnected_slow")
+        self.logger.warning(f"disconnecting {self.sid}: {reason}")
+        self.sender.cancel()
+        asyncio.ensure_future(self.ws.close(code=aiohttp.WSCloseCode.TRY_AGAIN_LATER))
+
+    async def send_loop(self):
+        while True:
+            if not self.queue:
+                self.wakeup.clear()
+                await self.wakeup.wait()
+                continue
+
+            is_binary, payload, coalesce_key = self.queue.popleft()
+            if payload is None:
+                continue
+            self.queued -= 1
+            if coalesce_key is not None:
+                del self.pending[coalesce_key]
+
+            try:
+                send = self.ws.send_bytes(payload) if is_binary else self.ws.send_str(payload)
+                await asyncio.wait_for(send, timeout=self.max_lag_seconds)
+                self.metrics.increment("websocket.messages_sent")
+            except asyncio.TimeoutError:
+                self.disconnect("send timed out")
+                return
+            except (
+                aiohttp.ClientError,
+                aiohttp.ClientPayloadError,
+                ConnectionResetError,
+            ) as err:
+                self.metrics.increment("websocket.send_errors")
+                self.logger.warning("send error: {}".format(err))
+
+            self.check_lag()
+
+    async def close(self):
+        self.closed = True
+        self.sender.cancel()
+        try:
+            await self.sender
+        except asyncio.CancelledError:
+            pass
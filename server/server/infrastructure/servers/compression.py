@@ -0,0 +1,109 @@
+import asyncio
+import gzip
+
+from aiohttp import web
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+COMPRESSIBLE_TYPES = (
+    "application/json",
+    "application/x-ndjson",
+    "application/javascript",
+    "application/msgpack",
+    "image/svg+xml",
+    "text/",
+)
+
+
+def available_encodings():
+    """response encodings this process can produce, best first"""
+    encodings = []
+    if zstandard is not None:
+        encodings.append("zstd")
+    if brotli is not None:
+        encodings.append("br")
+    encodings.append("gzip")
+    return encodings
+
+
+def preferred_encoding(accept_encoding, encodings):
+    """the first of encodings the Accept-Encoding header allows, or None"""
+    weights = {}
+    for item in accept_encoding.lower().split(","):
+        name, _, parameters = item.strip().partition(";")
+        weight = 1.0
+        if parameters.strip().startswith("q="):
+            try:
+                weight = float(parameters.strip()[2:])
+            except ValueError:
+                weight = 0.0
+        weights[name.strip()] = weight
+
+    acceptable = [
+        encoding for encoding in encodings if weights.get(encoding, weights.get("*", 0.0)) > 0
+    ]
+    if not acceptable:
+        return None
+    return max(acceptable, key=lambda encoding: weights.get(encoding, weights.get("*", 0.0)))
+
+
+def compress(body, encoding):
+    if encoding == "zstd":
+        return zstandard.ZstdCompressor(level=3).compress(body)
+    if encoding == "br":
+        return brotli.compress(body, quality=5)
+    return gzip.compress(body, compresslevel=6)
+
+
+def compression_middleware(min_size=1024, offload_size=64 * 1024):
+    """
+    Compresses response bodies of at least min_size bytes with the best encoding the
+    client accepts. Bodies over offload_size are compressed in the default executor.
+
+    Streamed responses and responses that already carry a Content-Encoding (e.g. the
+    pre-compressed /extensions catalog) are left alone. Compressed request bodies need
+    no middleware: aiohttp's parser decompresses them incrementally as they arrive.
+    """
+    encodings = available_encodings()
+
+    @web.middleware
+    async def middleware(request: web.Request, handler):
+        response = await handler(request)
+
+        if (
+            type(response) is not web.Response
+            or request.method == "HEAD"
+            or response.status in (204, 304)
+            or "Content-Encoding" in response.headers
+            or not isinstance(response.body, (bytes, bytearray))
+            or len(response.body) < min_size
+            or not response.content_type.startswith(COMPRESSIBLE_TYPES)
+        ):
+            return response
+
+        encoding = preferred_encoding(request.headers.get("Accept-Encoding", ""), encodings)
+        if encoding is None:
+            return response
+
+        body = bytes(response.body)
+        if len(body) > offload_size:
+            body = await asyncio.get_running_loop().run_in_executor(
+                None, compress, body, encoding
+            )
+        else:
+            body = compress(body, encoding)
+
+        response.body = body
+        response.headers["Content-Encoding"] = encoding
+        response.headers.add("Vary", "Accept-Encoding")
+        return response
+
+    return middleware
@@ -0,0 +1,154 @@
+import gzip
+import hashlib
+
+from aiohttp import web
+
+from ...domain.utilities.encoders import get_encoder
+from .compression import preferred_encoding
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+def class_attribute(entry, key, attribute):
+    """prefer the value recorded in an extension manifest so the class is not imported"""
+    if key in entry:
+        return entry[key]
+    return getattr(entry.get("python_class"), attribute)
+
+
+class Representation:
+    """an encoded response body with its ETag and pre-compressed variants"""
+
+    def __init__(self, body, content_type):
+        self.body = body
+        self.content_type = content_type
+        self.etag = hashlib.sha256(body).hexdigest()[:32]
+        self.encoded = {"gzip": gzip.compress(body, compresslevel=6)}
+        if brotli is not None:
+            self.encoded["br"] = brotli.compress(body, quality=9)
+
+
+class ExtensionCatalog:
+    """
+    The /extensions payload, built once whenever extensions are (re)loaded.
+
+    Each extension's web.js can be inlined (the original format) or served separately
+    from /extensions/{name}/web.js, in which case the catalog carries a javascript_url
+    that changes with the file's content.
+    """
+
+    def __init__(self):
+        self.catalog = {}
+        self.javascript = {}
+        self.representations = {}
+
+    def build(self, extensions):
+        catalog = {}
+        javascript = {}
+        for ext_name, ext in extensions.items():
+            ext_dict = {}
+            ext_dict["name"] = ext.get("name", "")
+            ext_dict["version"] = ext.get("version", "")
+            ext_dict["description"] = ext.get("description", "")
+            ext_dict["javascript"] = ext.get("javascript", "")
+            ext_dict["javascript_class_name"] = ext.get("javascript_class_name", "")
+            ext_dict["nodes"] = {}
+            ext_dict["rules"] = {}
+
+            for node_name, node in ext.get("nodes", {}).items():
+                node_dict = {}
+                node_dict["javascript_class_name"] = node.get(
+                    "javascript_class_name", ""
+                )
+                node_dict["display_name"] = node.get("display_name", "")
+
+                # from the manifest, or else the python class static values
+                node_dict["category"] = class_attribute(node, "category", "CATEGORY")
+                node_dict["subcategory"] = class_attribute(node, "subcategory", "SUBCATEGORY")
+                node_dict["description"] = class_attribute(node, "description", "DESCRIPTION")
+
+                node_dict["input"] = class_attribute(node, "input", "INPUT")
+                node_dict["output"] = class_attribute(node, "output", "OUTPUT")
+
+                ext_dict["nodes"][node_name] = node_dict
+
+            for rule_name, rule in ext.get("rules", {}).items():
+                rule_dict = {}
+                rule_dict["javascript_class_name"] = rule.get(
+                    "javascript_class_name", ""
+                )
+                rule_dict["display_name"] = rule.get("display_name", "")
+
+                rule_dict["category"] = class_attribute(rule, "category", "CATEGORY")
+                rule_dict["subcategory"] = class_attribute(rule, "subcategory", "SUBCATEGORY")
+                rule_dict["description"] = class_attribute(rule, "description", "DESCRIPTION")
+
+                rule_dict["parameters"] = class_attribute(rule, "parameters", "PARAMETERS")
+
+                ext_dict["rules"][rule_name] = rule_dict
+
+            if ext_dict["javascript"]:
+                javascript[ext_name] = Representation(
+                    ext_dict["javascript"].encode("utf-8"), "application/javascript"
+                )
+
+            catalog[ext_name] = ext_dict
+
+        self.catalog = catalog
+        self.javascript = javascript
+        self.representations = {}
+
+        # the representation every UI load asks for
+        self.representation()
+        return self
+
+    def representation(self, encoder_name="json", inline_javascript=True):
+        key = (encoder_name, inline_javascript)
+        if key not in self.representations:
+            catalog = self.catalog
+            if not inline_javascript:
+                catalog = {name: dict(ext_dict) for name, ext_dict in catalog.items()}
+                for name, ext_dict in catalog.items():
+                    del ext_dict["javascript"]
+                    if name in self.javascript:
+                        ext_dict["javascript_url"] = (
+                            f"/extensions/{name}/web.js?v={self.javascript[name].etag}"
+                        )
+
+            encoder = get_encoder(encoder_name)
+            body = encoder.dumps(catalog)
+            if not encoder.binary:
+                body = body.encode("utf-8")
+            self.representations[key] = Representation(body, encoder.content_type)
+        return self.representations[key]
+
+
+def precompressed_response(request, representation, cache_control="no-cache"):
+    """serves a Representation with 304 revalidation and the best encoding the client accepts"""
+    etag = f'"{representation.etag}"'
+    headers = {"ETag": etag, "Cache-Control": cache_control, "Vary": "Accept-Encoding"}
+
+    if_none_match = request.headers.get("If-None-Match", "")
+    if etag in [tag.strip() for tag in if_none_match.split(",")] or if_none_match.strip() == "*":
+        return web.Response(status=304, headers=headers)
+
+    encoding = preferred_encoding(
+        request.headers.get("Accept-Encoding", ""),
+        [encoding for encoding in ("br", "gzip") if encoding in representation.encoded],
+    )
+    if encoding is not None:
+        headers["Content-Encoding"] = encoding
+        return web.Response(
+            body=representation.encoded[encoding],
+            content_type=representation.content_type,
+            headers=headers,
+        )
+
+    return web.Response(
+        body=representation.body,
+        content_type=representation.content_type,
+        headers=headers,
+    )
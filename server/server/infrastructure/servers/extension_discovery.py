@@ -0,0 +1,150 @@
+import importlib.metadata
+import json
+import os
+import sys
+import threading
+import time
+
+from .extension_manifest import manifest_cache_directory
+
+# packages can register an extension module under this entry point group, e.g.
+# [project.entry-points."neoscaffold.extensions"]
+# my_extension = "neos_my_extension.extension"
+ENTRY_POINT_GROUP = "neoscaffold.extensions"
+
+INDEX_FORMAT = 1
+
+
+def index_path():
+    return os.path.join(manifest_cache_directory(), "distributions.json")
+
+
+def site_packages_fingerprint():
+    """installing or removing a distribution touches the directory it lives in"""
+    fingerprint = []
+    for path in sys.path:
+        try:
+            fingerprint.append([path, os.stat(path or ".").st_mtime_ns])
+        except OSError:
+            continue
+    return fingerprint
+
+
+def scan_distributions():
+    packages = []
+    seen = set()
+    for distribution in importlib.metadata.distributions():
+        name = distribution.metadata.get("Name") or ""
+        if name in seen:
+            continue
+        seen.add(name)
+
+        entry_points = [
+            entry_point
+            for entry_point in distribution.entry_points
+            if entry_point.group == ENTRY_POINT_GROUP
+        ]
+        for entry_point in entry_points:
+            packages.append({"name": name, "module": entry_point.value.split(":")[0]})
+
+        # if the package name starts with "neos-" and "neoscaffold" is in the keywords it's a NeoScaffold package
+        if (
+            not entry_points
+            and name.startswith("neos-")
+            and "neoscaffold" in (distribution.metadata.get("Keywords") or "")
+        ):
+            packages.append({"name": name, "module": name.replace("-", "_") + ".extension"})
+    return packages
+
+
+def discover_extension_packages(logger=None):
+    """installed extension packages, from a cached index while site-packages is unchanged"""
+    fingerprint = site_packages_fingerprint()
+    try:
+        with open(index_path(), "r") as f:
+            index = json.load(f)
+        if index.get("format") == INDEX_FORMAT and index.get("fingerprint") == fingerprint:
+            return index["packages"]
+    except (OSError, ValueError):
+        pass
+
+    packages = scan_distributions()
+
+    try:
+        os.makedirs(os.path.dirname(index_path()), exist_ok=True)
+        temporary_path = f"{index_path()}.{os.getpid()}.tmp"
+        with open(temporary_path, "w") as f:
+            json.dump({"format": INDEX_FORMAT, "fingerprint": fingerprint, "packages": packages}, f)
+        os.replace(temporary_path, index_path())
+    except OSError as e:
+        if logger:
+            logger.warning(f"Could not write the extension package index / {e}")
+
+    return packages
+
+
+class ImportProfiler:
+    """
+    Records how long every module imported while it is active takes to execute.
+
+    Installed as the first meta path finder; it finds specs through the remaining
+    finders and times each loader's exec_module. Self time excludes nested imports.
+    """
+
+    def __init__(self):
+        self.timings = {}
+        self.local = threading.local()
+        self.lock = threading.Lock()
+
+    def __enter__(self):
+        sys.meta_path.insert(0, self)
+        return self
+
+    def __exit__(self, *exc_info):
+        if self in sys.meta_path:
+            sys.meta_path.remove(self)
+
+    def find_spec(self, fullname, path=None, target=None):
+        for finder in sys.meta_path:
+            if finder is self or not hasattr(finder, "find_spec"):
+                continue
+            spec = finder.find_spec(fullname, path, target)
+            if spec is not None:
+                # builtin and frozen importers are classes, patching them would leak past the profile
+                if spec.loader is not None and not isinstance(spec.loader, type):
+                    try:
+                        spec.loader.exec_module = self.timed(fullname, spec.loader.exec_module)
+                    except AttributeError:
+                        pass
+                return spec
+        return None
+
+    def timed(self, fullname, exec_module):
+        def exec_module_timed(module):
+            stack = self.local.__dict__.setdefault("stack", [])
+            stack.append(0.0)
+            time_start = time.perf_counter()
+            try:
+                exec_module(module)
+            finally:
+                inclusive = time.perf_counter() - time_start
+                children = stack.pop()
+                if stack:
+                    stack[-1] += inclusive
+                with self.lock:
+                    self.timings[fullname] = {"inclusive": inclusive, "self": inclusive - children}
+
+        return exec_module_timed
+
+    def report(self, extension_timings, top=20):
+        lines = ["startup profile", f"  {'extension':<60}{'how':>10}{'seconds':>10}"]
+        for module_name, timing in sorted(
+            extension_timings.items(), key=lambda item: item[1]["seconds"], reverse=True
+        ):
+            lines.append(f"  {module_name:<60}{timing['how']:>10}{timing['seconds']:>10.4f}")
+
+        lines.append(f"  {'heaviest modules':<60}{'self':>10}{'total':>10}")
+        heaviest = sorted(self.timings.items(), key=lambda item: item[1]["self"], reverse=True)
+        for module_name, timing in heaviest[:top]:
+            lines.append(f"  {module_name:<60}{timing['self']:>10.4f}{timing['inclusive']:>10.4f}")
+        return "\n".join(lines)
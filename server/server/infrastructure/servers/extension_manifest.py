@@ -0,0 +1,140 @@
+import importlib
+import json
+import os
+
+from ...domain.utilities.encoders import to_serializable
+
+# bump when the manifest layout changes so stale caches are regenerated
+MANIFEST_FORMAT = 2
+
+
+def manifest_cache_directory():
+    return os.getenv("NEOSCAFFOLD_MANIFEST_CACHE") or os.path.join(
+        os.path.expanduser("~"), ".cache", "neoscaffold", "manifests"
+    )
+
+
+def source_fingerprint(source_path):
+    """changes whenever the extension source is edited or reinstalled"""
+    stat = os.stat(source_path)
+    return f"{stat.st_mtime_ns}-{stat.st_size}"
+
+
+def manifest_path(module_name):
+    return os.path.join(manifest_cache_directory(), f"{module_name}.json")
+
+
+def build_manifest(module_name, module, fingerprint):
+    """the static parts of EXTENSION_MAPPINGS, enough to list and validate nodes without importing"""
+    mappings = module.EXTENSION_MAPPINGS
+
+    def class_spec(entry, attributes):
+        python_class = entry.get("python_class")
+        spec = {
+            "javascript_class_name": entry.get("javascript_class_name", ""),
+            "display_name": entry.get("display_name", ""),
+            "class_name": python_class.__name__,
+            "module": python_class.__module__,
+        }
+        for key, attribute in attributes.items():
+            spec[key] = getattr(python_class, attribute, None)
+        return spec
+
+    node_attributes = {
+        "category": "CATEGORY",
+        "subcategory": "SUBCATEGORY",
+        "description": "DESCRIPTION",
+        "input": "INPUT",
+        "output": "OUTPUT",
+    }
+    rule_attributes = {
+        "category": "CATEGORY",
+        "subcategory": "SUBCATEGORY",
+        "description": "DESCRIPTION",
+        "parameters": "PARAMETERS",
+    }
+
+    return {
+        "format": MANIFEST_FORMAT,
+        "module": module_name,
+        "fingerprint": fingerprint,
+        "name": mappings.get("name"),
+        "version": mappings.get("version", ""),
+        "description": mappings.get("description", ""),
+        "javascript_class_name": mappings.get("javascript_class_name", ""),
+        "worker": mappings.get("worker"),
+        "nodes": {
+            name: class_spec(entry, node_attributes)
+            for name, entry in mappings.get("nodes", {}).items()
+        },
+        "rules": {
+            name: class_spec(entry, rule_attributes)
+            for name, entry in mappings.get("rules", {}).items()
+        },
+    }
+
+
+def read_manifest(module_name, fingerprint):
+    try:
+        with open(manifest_path(module_name), "r") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    if manifest.get("format") != MANIFEST_FORMAT or manifest.get("fingerprint") != fingerprint:
+        return None
+    return manifest
+
+
+def write_manifest(manifest):
+    path = manifest_path(manifest["module"])
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    # write then rename so a concurrent reader never sees half a file
+    temporary_path = f"{path}.{os.getpid()}.tmp"
+    with open(temporary_path, "w") as f:
+        json.dump(manifest, f, default=to_serializable)
+    os.replace(temporary_path, path)
+
+
+class LazyClassEntry(dict):
+    """
+    A node or rule entry built from a manifest.
+
+    It reads like an EXTENSION_MAPPINGS entry, but the implementing module is only
+    imported the first time "python_class" is looked up.
+    """
+
+    def __init__(self, spec):
+        super().__init__(spec)
+        self.module_name = self.pop("module")
+        self.class_name = self.pop("class_name")
+
+    def resolve(self):
+        module = importlib.import_module(self.module_name)
+        python_class = getattr(module, self.class_name)
+        dict.__setitem__(self, "python_class", python_class)
+        return python_class
+
+    def __getitem__(self, key):
+        if key == "python_class" and not dict.__contains__(self, key):
+            return self.resolve()
+        return super().__getitem__(key)
+
+    def get(self, key, default=None):
+        if key == "python_class":
+            return self[key]
+        return super().get(key, default)
+
+
+def mappings_from_manifest(manifest):
+    """an EXTENSION_MAPPINGS-shaped dict whose node and rule classes load lazily"""
+    return {
+        "name": manifest["name"],
+        "version": manifest["version"],
+        "description": manifest["description"],
+        "javascript_class_name": manifest["javascript_class_name"],
+        "worker": manifest["worker"],
+        "nodes": {name: LazyClassEntry(spec) for name, spec in manifest["nodes"].items()},
+        "rules": {name: LazyClassEntry(spec) for name, spec in manifest["rules"].items()},
+    }
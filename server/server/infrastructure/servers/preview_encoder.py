@@ -0,0 +1,105 @@
+import asyncio
+import hashlib
+import struct
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from PIL import Image, ImageOps
+
+# the type number that prefixes every encoded preview
+PREVIEW_FORMATS = {"JPEG": 1, "PNG": 2, "WEBP": 3}
+
+# lossy previews are sent at each quality in turn so a fast, rough image shows up first
+QUALITY_LEVELS = (40, 90)
+
+
+class PreviewEncoder:
+    """
+    Resizes and encodes preview images on a thread pool.
+
+    Encoded previews are cached by image fingerprint, format, max size and quality. Each
+    preview key (e.g. one node for one client) tracks its latest request so work for a
+    preview that has been superseded is skipped.
+    """
+
+    def __init__(self, max_workers=2, cache_size=64):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="preview")
+        self.cache = OrderedDict()
+        self.cache_size = cache_size
+        self.cache_lock = threading.Lock()
+        self.latest = {}
+        self.sequence = 0
+
+    def begin(self, key):
+        self.sequence += 1
+        self.latest[key] = self.sequence
+        return self.sequence
+
+    def superseded(self, key, sequence):
+        return self.latest.get(key) != sequence
+
+    def finish(self, key, sequence):
+        if not self.superseded(key, sequence):
+            del self.latest[key]
+
+    def quality_levels(self, image_format):
+        if image_format == "PNG":
+            return (None,)
+        return QUALITY_LEVELS
+
+    async def encode(self, image, image_format, max_size, quality, key=None, sequence=None):
+        """returns (preview bytes, encode seconds, cache hit), or None if superseded before it started"""
+
+        def work():
+            # the pool may be backed up, so check again once a worker picks this up
+            if key is not None and self.superseded(key, sequence):
+                return None
+            return self.encode_sync(image, image_format, max_size, quality)
+
+        return await asyncio.get_running_loop().run_in_executor(self.executor, work)
+
+    def encode_sync(self, image, image_format, max_size, quality):
+        time_start = time.perf_counter()
+        fingerprint = hashlib.blake2b(image.tobytes(), digest_size=16).hexdigest()
+        cache_key = (fingerprint, image.mode, image.size, image_format, max_size, quality)
+
+        with self.cache_lock:
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                self.cache.move_to_end(cache_key)
+                return cached, time.perf_counter() - time_start, True
+
+        if max_size is not None:
+            if hasattr(Image, "Resampling"):
+                resampling = Image.Resampling.BILINEAR
+            else:
+                resampling = Image.ANTIALIAS
+
+            image = ImageOps.contain(image, (max_size, max_size), resampling)
+
+        if image_format in ("JPEG", "WEBP") and image.mode not in ("RGB", "L"):
+            image = image.convert("RGB")
+
+        bytesIO = BytesIO()
+        # big-endian unsigned int packed
+        bytesIO.write(struct.pack(">I", PREVIEW_FORMATS.get(image_format, 1)))
+        if image_format == "PNG":
+            image.save(bytesIO, format=image_format, compress_level=1)
+        elif image_format == "JPEG":
+            image.save(bytesIO, format=image_format, quality=quality, progressive=quality >= QUALITY_LEVELS[-1])
+        else:
+            image.save(bytesIO, format=image_format, quality=quality)
+        preview_bytes = bytesIO.getvalue()
+
+        with self.cache_lock:
+            self.cache[cache_key] = preview_bytes
+            while len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+
+        return preview_bytes, time.perf_counter() - time_start, False
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,96 @@
+import asyncio
+import logging
+import os
+import shutil
+import signal
+import socket
+import tempfile
+import time
+import traceback
+
+from .session_store import SessionBroker
+
+logger = logging.getLogger(__name__)
+
+
+def fork(target):
+    pid = os.fork()
+    if pid == 0:
+        code = 0
+        try:
+            target()
+        except KeyboardInterrupt:
+            pass
+        except BaseException:
+            traceback.print_exc()
+            code = 1
+        finally:
+            os._exit(code)
+    return pid
+
+
+def serve_forked(address, port, workers, session_options, run_server, restart_delay=1.0):
+    """
+    Runs `workers` server processes that accept on one listening socket.
+
+    Session state lives in a broker process, created with session_options, that the
+    servers reach over a unix socket. run_server(listen_socket, broker_path) runs a
+    server process until it exits; it is started again if it dies. The parent process
+    only supervises.
+    """
+    if not hasattr(os, "fork"):
+        raise RuntimeError("--workers needs a platform with fork()")
+
+    listen_socket = socket.create_server((address, port), backlog=1024)
+    listen_socket.set_inheritable(True)
+
+    directory = tempfile.mkdtemp(prefix="neoscaffold-")
+    broker_path = os.path.join(directory, "sessions.sock")
+    broker_socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    broker_socket.bind(broker_path)
+    broker_socket.listen()
+
+    def run_broker():
+        listen_socket.close()
+        asyncio.run(SessionBroker(**session_options).serve(broker_socket))
+
+    broker_pid = fork(run_broker)
+    broker_socket.close()
+
+    def start_server():
+        return fork(lambda: run_server(listen_socket, broker_path))
+
+    servers = {start_server(): time.monotonic() for _ in range(workers)}
+    logger.info(f"started {workers} server processes on {address}:{port}")
+
+    try:
+        while True:
+            pid, status = os.wait()
+            if pid == broker_pid:
+                logger.error("the session broker exited, stopping")
+                break
+            if pid not in servers:
+                continue
+
+            started = servers.pop(pid)
+            logger.warning(f"server process {pid} exited with status {status}, restarting it")
+            # don't spin on a process that can't start
+            if time.monotonic() - started < restart_delay:
+                time.sleep(restart_delay)
+            servers[start_server()] = time.monotonic()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for pid in [*servers, broker_pid]:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        for pid in [*servers, broker_pid]:
+            try:
+                os.waitpid(pid, 0)
+            except ChildProcessError:
+                pass
+        listen_socket.close()
+        shutil.rmtree(directory, ignore_errors=True)
+    return 0
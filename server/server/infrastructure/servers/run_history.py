@@ -0,0 +1,220 @@
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+from ...domain.utilities.encoders import to_serializable
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    prompt_id TEXT NOT NULL,
+    user_id TEXT,
+    workflow_checksum TEXT,
+    started_at REAL NOT NULL,
+    finished_at REAL,
+    status TEXT NOT NULL,
+    error TEXT,
+    node_count INTEGER NOT NULL DEFAULT 0,
+    cache_hits INTEGER NOT NULL DEFAULT 0,
+    nodes TEXT
+);
+CREATE INDEX IF NOT EXISTS runs_prompt_id ON runs (prompt_id);
+CREATE INDEX IF NOT EXISTS runs_user_started ON runs (user_id, started_at);
+CREATE INDEX IF NOT EXISTS runs_checksum_started ON runs (workflow_checksum, started_at);
+CREATE INDEX IF NOT EXISTS runs_started ON runs (started_at);
+"""
+
+SUMMARY_COLUMNS = (
+    "id, prompt_id, user_id, workflow_checksum, started_at, finished_at, "
+    "status, error, node_count, cache_hits"
+)
+
+
+def default_history_path():
+    return os.getenv("NEOSCAFFOLD_HISTORY_PATH") or os.path.join(
+        os.path.expanduser("~"), ".local", "share", "neoscaffold", "history.sqlite3"
+    )
+
+
+class RunHistory:
+    """
+    Append-only record of finished runs in a local sqlite database.
+
+    Runs are queued by record() and written in batches by a background thread, so the
+    event loop never waits on the disk. Queries use their own connections; the database
+    is in WAL mode so they don't block the writer. Runs older than retention_days are
+    deleted in chunks by compact().
+    """
+
+    def __init__(self, path=None, retention_days=30, batch_size=500, compact_interval=3600.0):
+        self.path = path or default_history_path()
+        self.retention_days = retention_days
+        self.batch_size = batch_size
+        self.compact_interval = compact_interval
+        self.pending = queue.Queue()
+        self.local = threading.local()
+        self.writer = None
+
+    def connect(self):
+        connection = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        return connection
+
+    def open(self):
+        if self.writer is not None:
+            return
+        if os.path.dirname(self.path):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+
+        connection = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        # must be set before the database is switched to WAL and the first table is created
+        connection.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        connection.executescript(SCHEMA)
+        connection.commit()
+
+        self.writer = threading.Thread(
+            target=self.write_loop, args=(connection,), name="run-history", daemon=True
+        )
+        self.writer.start()
+
+    def close(self):
+        if self.writer is None:
+            return
+        self.pending.put(None)
+        self.writer.join()
+        self.writer = None
+
+    def record(self, run):
+        """queues a finished run, see GraphExecutor.run_sequential for its fields"""
+        if self.writer is not None:
+            self.pending.put(run)
+
+    def write_loop(self, connection):
+        last_compacted = 0.0
+        while True:
+            try:
+                runs = [self.pending.get(timeout=self.compact_interval)]
+            except queue.Empty:
+                runs = []
+            # everything already queued goes into the same transaction
+            while runs[-1:] != [None] and len(runs) < self.batch_size:
+                try:
+                    runs.append(self.pending.get_nowait())
+                except queue.Empty:
+                    break
+
+            stopping = None in runs
+            runs = [run for run in runs if run is not None]
+            if runs:
+                self.insert(connection, runs)
+
+            if time.monotonic() - last_compacted > self.compact_interval:
+                self.compact(connection)
+                last_compacted = time.monotonic()
+
+            if stopping:
+                connection.close()
+                return
+
+    def insert(self, connection, runs):
+        connection.executemany(
+            "INSERT INTO runs (prompt_id, user_id, workflow_checksum, started_at, finished_at, "
+            "status, error, node_count, cache_hits, nodes) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            [
+                (
+                    run["prompt_id"],
+                    run.get("user_id"),
+                    run.get("workflow_checksum"),
+                    run["started_at"],
+                    run.get("finished_at"),
+                    run["status"],
+                    run.get("error"),
+                    len(run.get("nodes", [])),
+                    sum(1 for node in run.get("nodes", []) if node.get("cache_hit")),
+                    json.dumps(run.get("nodes", []), default=to_serializable),
+                )
+                for run in runs
+            ],
+        )
+        connection.commit()
+
+    def compact(self, connection, chunk=10000):
+        if not self.retention_days:
+            return 0
+        cutoff = time.time() - self.retention_days * 86400
+        deleted = 0
+        # small transactions so queries are never locked out for long
+        while True:
+            cursor = connection.execute(
+                "DELETE FROM runs WHERE id IN "
+                "(SELECT id FROM runs WHERE started_at < ? ORDER BY started_at LIMIT ?)",
+                (cutoff, chunk),
+            )
+            connection.commit()
+            deleted += cursor.rowcount
+            if cursor.rowcount < chunk:
+                break
+        if deleted:
+            connection.execute("PRAGMA incremental_vacuum")
+            connection.commit()
+        return deleted
+
+    def reader(self):
+        connection = getattr(self.local, "connection", None)
+        if connection is None:
+            connection = self.connect()
+            connection.row_factory = sqlite3.Row
+            self.local.connection = connection
+        return connection
+
+    def query(
+        self,
+        user_id=None,
+        workflow_checksum=None,
+        status=None,
+        since=None,
+        until=None,
+        max_items=100,
+    ):
+        """newest runs first without their per-node details, page back with until; blocking"""
+        clauses = []
+        parameters = []
+        for column, value in (
+            ("user_id = ?", user_id),
+            ("workflow_checksum = ?", workflow_checksum),
+            ("status = ?", status),
+            ("started_at >= ?", since),
+            ("started_at < ?", until),
+        ):
+            if value is not None:
+                clauses.append(column)
+                parameters.append(value)
+
+        sql = f"SELECT {SUMMARY_COLUMNS} FROM runs"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY started_at DESC, id DESC LIMIT ?"
+        parameters.append(max_items)
+
+        return [dict(row) for row in self.reader().execute(sql, parameters)]
+
+    def get(self, prompt_id, user_id=None):
+        """every recorded run of prompt_id, with per-node details; blocking"""
+        sql = f"SELECT {SUMMARY_COLUMNS}, nodes FROM runs WHERE prompt_id = ?"
+        parameters = [prompt_id]
+        if user_id is not None:
+            sql += " AND user_id = ?"
+            parameters.append(user_id)
+
+        runs = []
+        for row in self.reader().execute(sql + " ORDER BY id", parameters):
+            run = dict(row)
+            run["nodes"] = json.loads(run["nodes"] or "[]")
+            runs.append(run)
+        return runs
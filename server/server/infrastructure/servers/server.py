@@ -1,21 +1,43 @@
+import collections
+import contextlib
+import gc
 import importlib
+import importlib.util
 import os
 import ssl
 import asyncio
 import sys
 import time
-import aiohttp
 import traceback
+from concurrent.futures import ThreadPoolExecutor
 from aiohttp import web
 
 import struct
 import logging
-from io import BytesIO
 
-from PIL import Image, ImageOps
+from ...domain.services.batch_runner import BatchRunner
 from ...domain.services.graph_executor import GraphExecutor
-from ...domain.utilities.fallback_json_encoder import dumps
+from ...domain.utilities.encoders import get_encoder, is_numeric_array, pack_array
+from ...domain.utilities.metrics import Metrics, rss_bytes
+from ...domain.utilities.token_verification import report_to, token_cache
+from .client_connection import ClientConnection
+from .extension_catalog import ExtensionCatalog
+from .extension_discovery import ImportProfiler, discover_extension_packages
+from .extension_manifest import (
+    build_manifest,
+    mappings_from_manifest,
+    read_manifest,
+    source_fingerprint,
+    write_manifest,
+)
+from .compression import compression_middleware
+from .preview_encoder import PreviewEncoder
+from .run_history import RunHistory
+from .session_store import SessionStore
+from .upload_store import UploadStore
+from .worker_pool import WorkerPool
 from ..apis.base_routes import base_routes
+from ..apis.upload_routes import upload_routes
 from ..apis.websocket_routes import base_websocket
 
 # if python earlier than 3.12 import directly
@@ -24,10 +46,13 @@ from ..apis.websocket_routes import base_websocket
 class BinaryEventTypes:
     PREVIEW_IMAGE = 1
     UNENCODED_PREVIEW_IMAGE = 2
+    NUMERIC_ARRAY = 3
+    # a message serialized by a binary protocol (e.g. msgpack)
+    ENCODED_MESSAGE = 4
 
 
 class Server:
-    def __init__(self, loop, args, logger=None):
+    def __init__(self, loop, args, logger=None, session_store=None):
         self.loop = loop
         self.args = args
 
@@ -35,10 +60,18 @@ class Server:
         self.message_queue = asyncio.Queue()
         self.prompt_queue = asyncio.Queue()
         self.graph_executor = GraphExecutor(self)
+        self.batch_runner = BatchRunner(self, concurrency=args.batch_concurrency)
 
         self.extensions = {}
         self.nodes = {}
         self.rules = {}
+        self.extension_catalog = ExtensionCatalog()
+        self.extension_timings = {}
+
+        self.metrics = Metrics()
+
+        self.preview_encoder = PreviewEncoder()
+        self.preview_tasks = set()
 
         self.middlewares = []
 
@@ -46,20 +79,53 @@ class Server:
             self.middlewares.append(
                 self.create_cors_middleware(args.enable_cors_header)
             )
+        if args.compression_min_size > 0:
+            self.middlewares.append(compression_middleware(min_size=args.compression_min_size))
         self.ENABLE_SMART_CACHE = args.enable_smart_cache or False
         self.INSPECTION_DELAY = args.inspection_delay or 0
+        self.WEBSOCKET_QUEUE_SIZE = args.websocket_queue_size
+        self.WEBSOCKET_MAX_LAG = args.websocket_max_lag
+        self.LAZY_EXTENSIONS = not args.eager_extensions
 
         if logger:
             self.logger = logger
         else:
             self.logger = logging.getLogger(__name__)
+        report_to(self.logger, self.metrics)
+
+        self.worker_pool = WorkerPool(
+            self.metrics,
+            self.logger,
+            enabled=not args.disable_workers,
+            timeout=args.worker_timeout,
+        )
+        self.worker_health_task = None
+
+        self.run_history = None
+        if not args.disable_history:
+            self.run_history = RunHistory(
+                path=args.history_file, retention_days=args.history_retention_days
+            )
 
         # Convert max_upload_size from MB to bytes
         client_max_size = int(self.args.max_upload_size * 1024 * 1024)
         self.app = web.Application(middlewares=self.middlewares, client_max_size=client_max_size)
 
+        # streamed uploads aren't buffered, so client_max_size doesn't cover them
+        self.upload_store = UploadStore(
+            args.input_directory or os.path.join(os.getcwd(), "input"),
+            max_size=client_max_size,
+            metrics=self.metrics,
+        )
+
         self.sockets = {}
-        self.sessions = {}
+        # session and intervention state, shared with the other processes under --workers
+        self.session_store = session_store or SessionStore(
+            idle_ttl=args.session_ttl, max_workflows_per_user=args.max_workflow_sessions
+        )
+        self.session_sweep_task = None
+        # a user who reconnects within this many seconds keeps their interventions
+        self.SESSION_DISCONNECT_GRACE = 60.0
         self.last_node_id = None
         self.current_workflow_id = None
         self.client_id = None
@@ -70,6 +136,7 @@ class Server:
 
     def add_routes(self):
         base_routes(self)
+        upload_routes(self)
         base_websocket(self)
 
         # add aiohttp routes to the routing table
@@ -102,10 +169,15 @@ class Server:
 
         return cors_middleware
 
-    # sends image, bytes, or json data to the client
+    # sends image, numeric array, bytes, or json data to the client
     async def send(self, event, data, sid=None):
         if event == BinaryEventTypes.UNENCODED_PREVIEW_IMAGE:
-            await self.send_image(data, sid=sid)
+            # encoding happens off the loop, don't hold up the messages behind it
+            task = asyncio.create_task(self.send_image(data, sid=sid))
+            self.preview_tasks.add(task)
+            task.add_done_callback(self.preview_tasks.discard)
+        elif event == BinaryEventTypes.NUMERIC_ARRAY and is_numeric_array(data):
+            await self.send_bytes(event, pack_array(data), sid)
         elif isinstance(data, (bytes, bytearray)):
             await self.send_bytes(event, data, sid)
         else:
@@ -122,49 +194,141 @@ class Server:
         return message
 
     async def send_image(self, image_data, sid=None):
+        """image_data is (format, PIL image, max size) with an optional node id that lets newer previews replace older ones"""
         image_type = image_data[0]
         image = image_data[1]
         max_size = image_data[2]
-        if max_size is not None:
-            if hasattr(Image, "Resampling"):
-                resampling = Image.Resampling.BILINEAR
-            else:
-                resampling = Image.ANTIALIAS
+        node_id = image_data[3] if len(image_data) > 3 else None
 
-            image = ImageOps.contain(image, (max_size, max_size), resampling)
-        type_num = 1
-        if image_type == "JPEG":
-            type_num = 1
-        elif image_type == "PNG":
-            type_num = 2
+        key = ("preview", sid, node_id)
+        sequence = self.preview_encoder.begin(key)
+        try:
+            for quality in self.preview_encoder.quality_levels(image_type):
+                encoded = await self.preview_encoder.encode(
+                    image, image_type, max_size, quality, key=key, sequence=sequence
+                )
+                if encoded is None or self.preview_encoder.superseded(key, sequence):
+                    self.metrics.increment("preview.superseded")
+                    return
+
+                preview_bytes, seconds, cache_hit = encoded
+                self.metrics.observe("preview.encode", seconds)
+                if cache_hit:
+                    self.metrics.increment("preview.cache_hits")
+
+                await self.send_bytes(
+                    BinaryEventTypes.PREVIEW_IMAGE,
+                    preview_bytes,
+                    sid=sid,
+                    coalesce_key=key if node_id is not None else None,
+                )
+        finally:
+            self.preview_encoder.finish(key, sequence)
 
-        bytesIO = BytesIO()
-        # big-endian unsigned int packed
-        header = struct.pack(">I", type_num)
-        bytesIO.write(header)
-        image.save(bytesIO, format=image_type, quality=95, compress_level=1)
-        preview_bytes = bytesIO.getvalue()
-        await self.send_bytes(BinaryEventTypes.PREVIEW_IMAGE, preview_bytes, sid=sid)
+    async def send_bytes(self, event, data, sid=None, coalesce_key=None):
+        if self.forward(sid, "bytes", (event, bytes(data), coalesce_key)):
+            return
 
-    async def send_bytes(self, event, data, sid=None):
-        message = self.encode_bytes(event, data)
+        message = bytes(self.encode_bytes(event, data))
+        for connection in self.connections_for(sid):
+            connection.put(message, is_binary=True, coalesce_key=coalesce_key)
 
-        if sid is None:
-            sockets = list(self.sockets.values())
-            for ws in sockets:
-                await self.try_send_socket(ws.send_bytes, message)
-        elif sid in self.sockets:
-            await self.try_send_socket(self.sockets[sid].send_bytes, message)
+    async def send_json(self, event, data, sid=None, coalesce_key=None):
+        if self.forward(sid, "json", (event, data, coalesce_key)):
+            return
 
-    async def send_json(self, event, data, sid=None):
         message = {"type": event, "data": data}
 
+        # serialize once per protocol in use, not once per socket
+        payloads = {}
+        for connection in self.connections_for(sid):
+            encoder = connection.encoder
+            if encoder.name not in payloads:
+                payload = encoder.dumps(message)
+                if encoder.binary:
+                    payload = bytes(self.encode_bytes(BinaryEventTypes.ENCODED_MESSAGE, payload))
+                payloads[encoder.name] = payload
+            connection.put(payloads[encoder.name], is_binary=encoder.binary, coalesce_key=coalesce_key)
+
+    def forward(self, sid, kind, args):
+        """sends a message for a socket another server process holds through the session store"""
+        return sid is not None and sid not in self.sockets and self.session_store.forward(sid, kind, args)
+
+    async def deliver(self, sid, kind, args):
+        """a message forwarded by the server process that produced it"""
+        if sid not in self.sockets:
+            return
+        event, data, coalesce_key = args
+        if kind == "json":
+            await self.send_json(event, data, sid=sid, coalesce_key=coalesce_key)
+        elif kind == "bytes":
+            await self.send_bytes(event, data, sid=sid, coalesce_key=coalesce_key)
+
+    def connections_for(self, sid=None):
         if sid is None:
-            sockets = list(self.sockets.values())
-            for ws in sockets:
-                await self.try_send_socket(ws.send_json, message, dumps=dumps)
-        elif sid in self.sockets:
-            await self.try_send_socket(self.sockets[sid].send_json, message, dumps=dumps)
+            return list(self.sockets.values())
+        if sid in self.sockets:
+            return [self.sockets[sid]]
+        self.metrics.increment("websocket.undeliverable")
+        return []
+
+    def connect_socket(self, sid, ws):
+        connection = ClientConnection(
+            sid,
+            ws,
+            encoder=get_encoder(ws.ws_protocol),
+            metrics=self.metrics,
+            logger=self.logger,
+            max_queue=self.WEBSOCKET_QUEUE_SIZE,
+            max_lag_seconds=self.WEBSOCKET_MAX_LAG,
+        )
+
+        # reusing an existing session replaces the old socket
+        previous = self.sockets.pop(sid, None)
+        if previous is not None:
+            previous.closed = True
+            previous.sender.cancel()
+
+        self.sockets[sid] = connection
+        self.session_store.attach(sid)
+        self.metrics.set_gauge("websocket.connections", len(self.sockets))
+        return connection
+
+    async def disconnect_socket(self, sid, connection):
+        # a reconnect may already have replaced this connection
+        if self.sockets.get(sid) is connection:
+            del self.sockets[sid]
+            self.session_store.detach(sid)
+            self.loop.call_later(self.SESSION_DISCONNECT_GRACE, self.forget_user, sid)
+        self.metrics.set_gauge("websocket.connections", len(self.sockets))
+        await connection.close()
+
+    def forget_user(self, sid):
+        if sid not in self.sockets:
+            self.session_store.discard_user(sid)
+
+    async def session_sweep_loop(self, interval=60.0):
+        while True:
+            await asyncio.sleep(interval)
+            self.session_store.sweep()
+
+    def memory_report(self, objects=False):
+        report = {
+            "rss_bytes": rss_bytes(),
+            "sessions": self.session_store.report(),
+            "sockets": len(self.sockets),
+            "queued_messages": sum(len(connection.queue) for connection in self.sockets.values()),
+            "batches": len(self.batch_runner.batches),
+            "preview_cache": len(self.preview_encoder.cache),
+            "preview_tasks": len(self.preview_tasks),
+            "verified_tokens": len(token_cache.entries),
+            "gc_counts": gc.get_count(),
+        }
+        if objects:
+            # walks every tracked object, only on request
+            counts = collections.Counter(type(obj).__name__ for obj in gc.get_objects())
+            report["objects"] = dict(counts.most_common(30))
+        return report
 
     def send_sync(self, event, data, sid=None):
         self.loop.call_soon_threadsafe(
@@ -179,9 +343,13 @@ class Server:
             msg = await self.message_queue.get()
             await self.send(*msg)
 
-    async def start(self, address, port, verbose=True, call_on_start=None):
+    async def start(self, address, port, verbose=True, call_on_start=None, sock=None):
+        await self.session_store.start(self)
+        await self.loop.run_in_executor(None, self.upload_store.setup)
+
         runner = web.AppRunner(self.app, access_log=None)
         await runner.setup()
+        self.runner = runner
         ssl_ctx = None
         scheme = "http"
         if self.args.tls_keyfile and self.args.tls_certfile:
@@ -193,9 +361,21 @@ class Server:
             )
             scheme = "https"
 
-        site = web.TCPSite(runner, address, port, ssl_context=ssl_ctx)
+        if sock is not None:
+            # --workers: every process accepts on the same listening socket
+            site = web.SockSite(runner, sock, ssl_context=ssl_ctx)
+        else:
+            site = web.TCPSite(runner, address, port, ssl_context=ssl_ctx)
         await site.start()
 
+        if self.run_history is not None:
+            self.run_history.open()
+
+        # warm up the extension workers while the server starts taking requests
+        self.worker_pool.start()
+        self.worker_health_task = asyncio.create_task(self.worker_health_loop())
+        self.session_sweep_task = asyncio.create_task(self.session_sweep_loop())
+
         if verbose:
             self.logger.info("Starting server\n")
             self.logger.info(
@@ -204,68 +384,63 @@ class Server:
         if call_on_start is not None:
             call_on_start(scheme, address, port)
 
-    def get_or_create_session(self, client_id):
-        if client_id not in self.sessions:
-            self.sessions[client_id] = {}
-        return self.sessions[client_id]
-
-    def get_or_create_workflow_session(self, client_id, workflow_id):
-        session = self.get_or_create_session(client_id)
-
-        if workflow_id not in session:
-            session[workflow_id] = {
-                "interventions": {}
-            }
-
-        return session[workflow_id]
-
-    def import_extension_module(self, file_path):
-        module_path = os.path.splitext(file_path)[0].replace(os.sep, ".")
-        try:
-            time_start = time.time()
-            module = importlib.import_module(name=module_path)
-            self.logger.warning(
-                f"imported {module_path} in {time.time() - time_start:.4f} seconds"
-            )
-            return module
-        except Exception as e:
-            self.logger.error(f"Failed to execute startup-script: {file_path} / {e}")
-        return False
+    async def stop(self):
+        if getattr(self, "runner", None) is not None:
+            await self.runner.cleanup()
+            self.runner = None
+        if self.worker_health_task is not None:
+            self.worker_health_task.cancel()
+            self.worker_health_task = None
+        if self.session_sweep_task is not None:
+            self.session_sweep_task.cancel()
+            self.session_sweep_task = None
+        self.worker_pool.stop()
+        self.preview_encoder.shutdown()
+        if self.run_history is not None:
+            await self.loop.run_in_executor(None, self.run_history.close)
+        await self.session_store.stop()
+
+    async def worker_health_loop(self, interval=10.0):
+        while True:
+            await asyncio.sleep(interval)
+            await self.loop.run_in_executor(None, self.worker_pool.check_health)
 
     def load_extensions(self):
         """Load extensions"""
         server = self
 
         loading_start_timestamp = time.time()
+        server.extension_timings = {}
+
+        profiler = ImportProfiler() if server.args.profile_startup else None
+        with profiler or contextlib.nullcontext():
+            # load custom extensions
+            server.load_custom_extensions()
 
-        # load custom extensions
-        server.load_custom_extensions()
+            # load neos_ext packages
+            server.load_neos_ext_packages()
 
-        # load neos_ext packages
-        server.load_neos_ext_packages()
+        server.extension_catalog.build(server.extensions)
 
         server.logger.warning(
             f"Loaded extensions in {time.time() - loading_start_timestamp:.4f} seconds"
         )
+        if profiler is not None:
+            server.logger.warning(profiler.report(server.extension_timings))
         return server
 
     def load_neos_ext_packages(self):
         server = self
 
-        # for each package currently installed on the system
-        for package in importlib.metadata.distributions():
-            # if the package name starts with "neos-" and "neoscaffold" is in the keywords it's a NeoScaffold package
-            if package.name.startswith(
-                "neos-"
-            ) and "neoscaffold" in package.metadata.get("Keywords", ""):
-                time_start = time.time()
-                module = importlib.import_module(
-                    name=package.name.replace("-", "_") + ".extension"
-                )
-                server.load_extension_module(module=module)
-                server.logger.warning(
-                    f"imported {package.name} in {time.time() - time_start:.4f} seconds"
-                )
+        candidates = []
+        for package in discover_extension_packages(logger=server.logger):
+            spec = importlib.util.find_spec(package["module"])
+            if spec is None or not spec.origin:
+                server.logger.warning(f"Skip {package['name']} due to the lack of {package['module']}.")
+                continue
+            candidates.append((package["module"], spec.origin))
+
+        server.load_extension_candidates(candidates)
 
     def load_custom_extensions(self):
         server = self
@@ -284,11 +459,12 @@ class Server:
 
         custom_extensions = [path_to_custom_extensions]
 
+        candidates = []
         for extension in custom_extensions:
             # filter things that are not directories of python modules
             possible_modules = [
                 f
-                for f in os.listdir(extension)
+                for f in sorted(os.listdir(extension))
                 if (
                     not f.endswith(".py")
                     and not f.startswith("__")
@@ -304,149 +480,138 @@ class Server:
                 )
                 if os.path.isfile(extension_script_path):
                     # custom_extensions.agents.extension
-                    module = server.import_extension_module(
-                        os.path.join(
-                            "custom_extensions", possible_module, "extension.py"
-                        )
+                    candidates.append(
+                        (f"custom_extensions.{possible_module}.extension", extension_script_path)
                     )
-                    server.load_extension_module(module=module)
                 else:
                     server.logger.warning(
                         f"Skip {extension_script_path} module for custom extensions due to the lack of extension.py."
                     )
 
+        server.load_extension_candidates(candidates)
+
+    def load_extension_candidates(self, candidates):
+        """
+        Register (module name, source path) pairs. Extensions with a valid manifest are
+        registered without importing; the rest are imported concurrently, since
+        extensions don't import each other, and registered in the original order.
+        """
+        pending = []
+        for module_name, source_path in candidates:
+            if not self.load_extension_manifest(module_name, source_path):
+                pending.append((module_name, source_path))
+
+        if not pending:
+            return
+
+        def import_module(module_name):
+            time_start = time.time()
+            try:
+                return importlib.import_module(name=module_name), time.time() - time_start
+            except Exception as e:
+                return e, time.time() - time_start
+
+        with ThreadPoolExecutor(max_workers=min(8, len(pending))) as executor:
+            results = list(executor.map(import_module, [module_name for module_name, _ in pending]))
+
+        for (module_name, source_path), (module, seconds) in zip(pending, results):
+            if isinstance(module, Exception):
+                # a failure may come from importing alongside another extension, retry on its own
+                module, seconds = import_module(module_name)
+            if isinstance(module, Exception):
+                self.logger.error(f"Failed to execute startup-script: {source_path} / {module}")
+                continue
+
+            self.logger.warning(f"imported {module_name} in {seconds:.4f} seconds")
+            self.extension_timings[module_name] = {"how": "import", "seconds": seconds}
+            self.load_extension_module(module=module)
+
+            if self.LAZY_EXTENSIONS and getattr(module, "EXTENSION_MAPPINGS", None) is not None:
+                try:
+                    write_manifest(
+                        build_manifest(module_name, module, source_fingerprint(source_path))
+                    )
+                except (OSError, TypeError, ValueError, AttributeError) as e:
+                    self.logger.warning(f"Could not write a manifest for {module_name} / {e}")
+
+    def load_extension_manifest(self, module_name, source_path):
+        """register an extension from its cached manifest, False when there is no valid one"""
+        if not self.LAZY_EXTENSIONS:
+            return False
+
+        time_start = time.time()
+        manifest = read_manifest(module_name, source_fingerprint(source_path))
+        if manifest is None:
+            return False
+
+        self.register_extension(mappings_from_manifest(manifest), os.path.dirname(source_path))
+        seconds = time.time() - time_start
+        self.logger.warning(f"loaded {module_name} manifest in {seconds:.4f} seconds")
+        self.extension_timings[module_name] = {"how": "manifest", "seconds": seconds}
+        return True
+
     def load_extension_module(self, module):
         server = self
         if (
             hasattr(module, "EXTENSION_MAPPINGS")
             and getattr(module, "EXTENSION_MAPPINGS") is not None
         ):
-            # Extension
-            server.extensions[module.EXTENSION_MAPPINGS.get("name")] = (
-                module.EXTENSION_MAPPINGS
-            )
-
-            # Javascript
             extension_full_path = os.path.realpath(module.__file__)
-            folder_path = os.path.dirname(extension_full_path)
-
-            extension_script_path = os.path.join(folder_path, "web.js")
-            if os.path.isfile(extension_script_path):
-                with open(extension_script_path, "r") as f:
-                    js_file_str = f.read()
-                    server.extensions[module.EXTENSION_MAPPINGS.get("name")][
-                        "javascript"
-                    ] = js_file_str
-
-            # Nodes
-            for name, value in module.EXTENSION_MAPPINGS.get("nodes", {}).items():
-                server.nodes[name] = value
-            # Rules
-            for name, value in module.EXTENSION_MAPPINGS.get("rules", {}).items():
-                server.rules[name] = value
-
+            server.register_extension(
+                module.EXTENSION_MAPPINGS, os.path.dirname(extension_full_path)
+            )
         else:
             server.logger.warning(
                 f"Skip {module.__name__} module for custom extensions due to the lack of EXTENSION_MAPPINGS."
             )
 
-    def toggle_breakpoints(self, client_id, workflow_id, node_ids=[], all_break=False):
-        workflow_session = self.get_or_create_workflow_session(client_id, workflow_id)
-
-        # allowed to raise an error if the interventions are not set
-        interventions = workflow_session["interventions"]
-
-        if "breakpoints" not in interventions:
-            interventions["breakpoints"] = {"last_modified": time.time(), "nodes": {}}
-
-        breakpoints = interventions["breakpoints"]
-
-        if "nodes" not in breakpoints:
-            breakpoints["nodes"] = {}
-
-        breakpoints["all_break"] = all_break
-
-        for node_id in node_ids:
-            if node_id in breakpoints["nodes"]:
-                event = breakpoints["nodes"][node_id]
-                event.clear()
-                del breakpoints["nodes"][node_id]
-            else:
-                breakpoints["nodes"][node_id] = asyncio.Event()
-
-        return workflow_session
-
-    def step_through_breakpoints(self, client_id, workflow_id, node_ids=[]):
-        workflow_session = self.get_or_create_workflow_session(client_id, workflow_id)
-
-        # allowed to raise an error if the interventions are not set
-        interventions = workflow_session["interventions"]
-
-        if "breakpoints" not in interventions:
-            interventions["breakpoints"] = {"last_modified": time.time(), "nodes": {}}
-
-        breakpoints = interventions["breakpoints"]
-
-        if "nodes" not in breakpoints:
-            breakpoints["nodes"] = {}
-
-        for node_id in node_ids:
-            if node_id in breakpoints["nodes"]:
-                event = breakpoints["nodes"][node_id]
-                if not event.is_set():
-                    event.set()
-                else:
-                    event.clear()
-
-        return workflow_session
-
-    def toggle_stop_points(self, client_id, workflow_id, node_ids=[], all_stop=False):
-        workflow_session = self.get_or_create_workflow_session(client_id, workflow_id)
-
-        # allowed to raise an error if the interventions are not set
-        interventions = workflow_session["interventions"]
-
-        if "stop-points" not in interventions:
-            interventions["stop-points"] = {"last_modified": time.time(), "nodes": {}}
-
-        stop_points = interventions["stop-points"]
-
-        if "nodes" not in stop_points:
-            stop_points["nodes"] = {}
-
-        stop_points["all_stop"] = all_stop
-
-        for node_id in node_ids:
-            if node_id in stop_points["nodes"]:
-                del stop_points["nodes"][node_id]
-            else:
-                stop_points["nodes"][node_id] = True
-
-        return workflow_session
-
-    def toggle_restart_points(self, client_id, workflow_id, node_ids=[], all_restart=False):
-        workflow_session = self.get_or_create_workflow_session(client_id, workflow_id)
-
-        # allowed to raise an error if the interventions are not set
-        interventions = workflow_session["interventions"]
-
-        if "restart-points" not in interventions:
-            interventions["restart-points"] = {"last_modified": time.time(), "nodes": {}}
+    def register_extension(self, mappings, folder_path):
+        server = self
 
-        restart_points = interventions["restart-points"]
+        # Extension
+        server.extensions[mappings.get("name")] = mappings
+
+        # Javascript
+        extension_script_path = os.path.join(folder_path, "web.js")
+        if os.path.isfile(extension_script_path):
+            with open(extension_script_path, "r") as f:
+                mappings["javascript"] = f.read()
+
+        # Nodes
+        for name, value in mappings.get("nodes", {}).items():
+            server.nodes[name] = value
+        # Rules
+        for name, value in mappings.get("rules", {}).items():
+            server.rules[name] = value
+
+        # Worker process
+        server.worker_pool.register(
+            mappings.get("name"), mappings.get("worker"), mappings.get("nodes", {}).keys()
+        )
 
-        restart_points["all_restart"] = all_restart
+    async def toggle_breakpoints(self, client_id, workflow_id, node_ids=[], all_break=False):
+        return await self.session_store.update(
+            client_id, workflow_id, "toggle_breakpoints", node_ids=node_ids, all_break=all_break
+        )
 
-        if "nodes" not in restart_points:
-            restart_points["nodes"] = {}
+    async def step_through_breakpoints(self, client_id, workflow_id, node_ids=[]):
+        return await self.session_store.update(
+            client_id, workflow_id, "step_through_breakpoints", node_ids=node_ids
+        )
 
-        for node_id in node_ids:
-            if node_id in restart_points["nodes"]:
-                del restart_points["nodes"][node_id]
-            else:
-                restart_points["nodes"][node_id] = True
+    async def toggle_stop_points(self, client_id, workflow_id, node_ids=[], all_stop=False):
+        return await self.session_store.update(
+            client_id, workflow_id, "toggle_stop_points", node_ids=node_ids, all_stop=all_stop
+        )
 
-        return workflow_session
+    async def toggle_restart_points(self, client_id, workflow_id, node_ids=[], all_restart=False):
+        return await self.session_store.update(
+            client_id,
+            workflow_id,
+            "toggle_restart_points",
+            node_ids=node_ids,
+            all_restart=all_restart,
+        )
 
     def add_on_prompt_handler(self, handler):
         self.on_prompt_handlers.append(handler)
@@ -462,16 +627,3 @@ class Server:
                 self.logger.warning(traceback.format_exc())
 
         return json_data
-
-    async def try_send_socket(self, function, message, dumps):
-        try:
-            if dumps:
-                await function(message, dumps=dumps)
-            else:
-                await function(message)
-        except (
-            aiohttp.ClientError,
-            aiohttp.ClientPayloadError,
-            ConnectionResetError,
-        ) as err:
-            self.logger.warning("send error: {}".format(err))
@@ -0,0 +1,465 @@
+import asyncio
+import pickle
+import struct
+import time
+from collections import OrderedDict
+
+
+def points(interventions, kind):
+    if kind not in interventions:
+        interventions[kind] = {"last_modified": time.time(), "nodes": {}}
+    interventions[kind].setdefault("nodes", {})
+    return interventions[kind]
+
+
+def toggle_breakpoints(interventions, node_ids=(), all_break=False):
+    breakpoints = points(interventions, "breakpoints")
+    breakpoints["all_break"] = all_break
+
+    # a breakpoint counts the steps taken through it, the executor waits for the count to change
+    for node_id in node_ids:
+        if node_id in breakpoints["nodes"]:
+            del breakpoints["nodes"][node_id]
+        else:
+            breakpoints["nodes"][node_id] = 0
+
+
+def step_through_breakpoints(interventions, node_ids=()):
+    breakpoints = points(interventions, "breakpoints")
+    for node_id in node_ids:
+        if node_id in breakpoints["nodes"]:
+            breakpoints["nodes"][node_id] += 1
+
+
+def break_at(interventions, node_id):
+    """all_break was hit: reset it and keep a breakpoint on the node it stopped at"""
+    breakpoints = points(interventions, "breakpoints")
+    breakpoints["all_break"] = False
+    breakpoints["nodes"].setdefault(node_id, 0)
+
+
+def toggle_stop_points(interventions, node_ids=(), all_stop=False):
+    stop_points = points(interventions, "stop-points")
+    stop_points["all_stop"] = all_stop
+    for node_id in node_ids:
+        if node_id in stop_points["nodes"]:
+            del stop_points["nodes"][node_id]
+        else:
+            stop_points["nodes"][node_id] = True
+
+
+def toggle_restart_points(interventions, node_ids=(), all_restart=False):
+    restart_points = points(interventions, "restart-points")
+    restart_points["all_restart"] = all_restart
+    for node_id in node_ids:
+        if node_id in restart_points["nodes"]:
+            del restart_points["nodes"][node_id]
+        else:
+            restart_points["nodes"][node_id] = True
+
+
+def reset_flag(interventions, kind, flag):
+    if kind in interventions:
+        interventions[kind][flag] = False
+
+
+# updates are sent between processes by name, so they must be listed here
+OPERATIONS = {
+    "toggle_breakpoints": toggle_breakpoints,
+    "step_through_breakpoints": step_through_breakpoints,
+    "break_at": break_at,
+    "toggle_stop_points": toggle_stop_points,
+    "toggle_restart_points": toggle_restart_points,
+    "reset_flag": reset_flag,
+}
+
+
+def is_empty(session):
+    """no intervention left that a later run could hit"""
+    for kind_points in session["interventions"].values():
+        if kind_points.get("nodes") or any(
+            value for key, value in kind_points.items() if key.startswith("all_")
+        ):
+            return False
+    return True
+
+
+class SessionStore:
+    """
+    Session and intervention state of every user's workflows, kept in this process.
+
+    State is plain data so it can be shared between processes. It changes only through
+    update() with one of OPERATIONS, and wait() resumes once a change makes its
+    predicate true.
+
+    Workflow sessions that no run holds are dropped once idle for idle_ttl seconds, when
+    their user has more than max_workflows_per_user, when a run releases an empty one,
+    or when their user disconnects.
+    """
+
+    distributed = False
+
+    def __init__(self, idle_ttl=3600.0, max_workflows_per_user=32):
+        self.idle_ttl = idle_ttl
+        self.max_workflows_per_user = max_workflows_per_user
+        self.sessions = {}
+        self.last_used = {}
+        self.holds = {}
+        self.evicted = 0
+        self.on_drop = None
+        self.changed = asyncio.Condition()
+
+    async def start(self, server):
+        pass
+
+    async def stop(self):
+        pass
+
+    def workflow_session(self, client_id, workflow_id):
+        session = self.sessions.get(client_id, {}).get(workflow_id)
+        if session is None:
+            return {"interventions": {}}
+        self.last_used[(client_id, workflow_id)] = time.monotonic()
+        return session
+
+    def apply(self, client_id, workflow_id, operation, kwargs):
+        workflows = self.sessions.setdefault(client_id, {})
+        created = workflow_id not in workflows
+        session = workflows.setdefault(workflow_id, {"interventions": {}})
+        OPERATIONS[operation](session["interventions"], **kwargs)
+        self.last_used[(client_id, workflow_id)] = time.monotonic()
+
+        if created and len(workflows) > self.max_workflows_per_user:
+            # the least recently used workflows that no run is holding
+            idle = sorted(
+                (
+                    key
+                    for key in self.last_used
+                    if key[0] == client_id and key[1] != workflow_id and key not in self.holds
+                ),
+                key=self.last_used.get,
+            )
+            for key in idle[: len(workflows) - self.max_workflows_per_user]:
+                self.drop(*key)
+        return session
+
+    async def update(self, client_id, workflow_id, operation, **kwargs):
+        session = self.apply(client_id, workflow_id, operation, kwargs)
+        await self.notify()
+        return session
+
+    def drop(self, client_id, workflow_id):
+        workflows = self.sessions.get(client_id, {})
+        if workflows.pop(workflow_id, None) is None:
+            return
+        if not workflows:
+            del self.sessions[client_id]
+        self.last_used.pop((client_id, workflow_id), None)
+        self.evicted += 1
+        if self.on_drop is not None:
+            self.on_drop(client_id, workflow_id)
+
+    def hold(self, client_id, workflow_id):
+        """a run is using the session, it is kept until released"""
+        key = (client_id, workflow_id)
+        self.holds[key] = self.holds.get(key, 0) + 1
+
+    def release(self, client_id, workflow_id):
+        key = (client_id, workflow_id)
+        self.holds[key] = self.holds.get(key, 1) - 1
+        if self.holds[key] > 0:
+            return
+        del self.holds[key]
+        session = self.sessions.get(client_id, {}).get(workflow_id)
+        if session is not None and is_empty(session):
+            self.drop(client_id, workflow_id)
+
+    def discard_user(self, client_id):
+        """the user went away, drop the sessions no run is holding"""
+        for workflow_id in list(self.sessions.get(client_id, {})):
+            if (client_id, workflow_id) not in self.holds:
+                self.drop(client_id, workflow_id)
+
+    def sweep(self):
+        deadline = time.monotonic() - self.idle_ttl
+        expired = [
+            key
+            for key, last_used in self.last_used.items()
+            if last_used < deadline and key not in self.holds
+        ]
+        for key in expired:
+            self.drop(*key)
+        return len(expired)
+
+    def report(self):
+        return {
+            "users": len(self.sessions),
+            "workflow_sessions": sum(len(workflows) for workflows in self.sessions.values()),
+            "held": sum(self.holds.values()),
+            "evicted": self.evicted,
+            "idle_ttl": self.idle_ttl,
+            "max_workflows_per_user": self.max_workflows_per_user,
+        }
+
+    async def notify(self):
+        async with self.changed:
+            self.changed.notify_all()
+
+    async def wait(self, client_id, workflow_id, predicate):
+        async with self.changed:
+            await self.changed.wait_for(
+                lambda: predicate(self.workflow_session(client_id, workflow_id))
+            )
+
+    def attach(self, sid):
+        pass
+
+    def detach(self, sid):
+        pass
+
+    def forward(self, sid, kind, args):
+        """hands a message to the process holding sid's socket, False when there is none"""
+        return False
+
+    def share_batch(self, batch_id, event, args):
+        """tells the other processes about a batch this one runs"""
+        pass
+
+    def clear(self):
+        self.sessions.clear()
+        self.last_used.clear()
+        self.holds.clear()
+
+
+async def read_frame(reader):
+    (size,) = struct.unpack(">I", await reader.readexactly(4))
+    return pickle.loads(await reader.readexactly(size))
+
+
+def write_frame(writer, frame):
+    data = pickle.dumps(frame, protocol=pickle.HIGHEST_PROTOCOL)
+    writer.write(struct.pack(">I", len(data)) + data)
+
+
+class SessionBroker:
+    """
+    Owns the session state for a group of server processes, over a unix socket.
+
+    Updates are applied in the order they arrive and the new state is pushed to every
+    process. Messages for a websocket are forwarded to the process that attached it.
+    Batch events are passed on to every process and kept for the last retain_batches
+    batches, so a process that starts later gets them too.
+    """
+
+    def __init__(self, idle_ttl=3600.0, max_workflows_per_user=32, retain_batches=32):
+        self.store = SessionStore(idle_ttl=idle_ttl, max_workflows_per_user=max_workflows_per_user)
+        self.store.on_drop = self.broadcast_drop
+        self.clients = set()
+        self.owners = {}
+        self.holds = {}
+        self.retain_batches = retain_batches
+        # batch id -> {"frames", "writer", "done"}
+        self.batches = OrderedDict()
+
+    async def serve(self, sock, sweep_interval=60.0):
+        server = await asyncio.start_unix_server(self.handle, sock=sock)
+        async with server:
+            while True:
+                await asyncio.sleep(sweep_interval)
+                self.store.sweep()
+
+    def broadcast_drop(self, client_id, workflow_id):
+        for client in self.clients:
+            write_frame(client, ("state", client_id, workflow_id, None))
+
+    def record_batch(self, frame, writer):
+        _, batch_id, event, _ = frame
+        if event == "start":
+            self.batches[batch_id] = {"frames": [], "writer": writer, "done": False}
+            finished = [key for key, batch in self.batches.items() if batch["done"]]
+            while len(self.batches) > self.retain_batches and finished:
+                del self.batches[finished.pop(0)]
+        batch = self.batches.get(batch_id)
+        if batch is None:
+            return
+        batch["frames"].append(frame)
+        batch["done"] = batch["done"] or event == "done"
+        for client in self.clients - {writer}:
+            write_frame(client, frame)
+
+    async def handle(self, reader, writer):
+        self.clients.add(writer)
+        holds = self.holds[writer] = []
+        try:
+            while True:
+                frame = await read_frame(reader)
+                kind = frame[0]
+                if kind == "snapshot":
+                    write_frame(writer, ("snapshot", self.store.sessions))
+                    for batch in self.batches.values():
+                        for batch_frame in batch["frames"]:
+                            write_frame(writer, batch_frame)
+                elif kind == "batch":
+                    self.record_batch(frame, writer)
+                elif kind == "update":
+                    _, request_id, client_id, workflow_id, operation, kwargs = frame
+                    try:
+                        session = self.store.apply(client_id, workflow_id, operation, kwargs)
+                    except Exception as e:
+                        write_frame(writer, ("reply", request_id, None, f"{type(e).__name__}: {e}"))
+                        continue
+                    write_frame(writer, ("reply", request_id, session, None))
+                    for client in self.clients - {writer}:
+                        write_frame(client, ("state", client_id, workflow_id, session))
+                elif kind == "attach":
+                    self.owners[frame[1]] = writer
+                elif kind == "detach":
+                    if self.owners.get(frame[1]) is writer:
+                        del self.owners[frame[1]]
+                elif kind == "forward":
+                    owner = self.owners.get(frame[1])
+                    if owner is not None and owner is not writer:
+                        write_frame(owner, frame)
+                elif kind == "hold":
+                    self.store.hold(frame[1], frame[2])
+                    holds.append((frame[1], frame[2]))
+                elif kind == "release":
+                    if (frame[1], frame[2]) in holds:
+                        holds.remove((frame[1], frame[2]))
+                        self.store.release(frame[1], frame[2])
+                elif kind == "discard":
+                    # the user may have reconnected to another process in the meantime
+                    if frame[1] not in self.owners:
+                        self.store.discard_user(frame[1])
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self.clients.discard(writer)
+            # runs in a process that went away no longer need their sessions
+            for key in self.holds.pop(writer):
+                self.store.release(*key)
+            for sid in [sid for sid, owner in self.owners.items() if owner is writer]:
+                del self.owners[sid]
+            # batches that process was running won't get any further, their streams end
+            for batch_id, batch in list(self.batches.items()):
+                if batch["writer"] is writer and not batch["done"]:
+                    self.record_batch(("batch", batch_id, "done", ()), writer)
+            writer.close()
+
+
+class BrokerSessionStore(SessionStore):
+    """a replica of a SessionBroker's state; reads are local, updates go through the broker"""
+
+    distributed = True
+
+    def __init__(self, path, connect_timeout=30.0):
+        # eviction limits are the broker's
+        super().__init__()
+        self.path = path
+        self.connect_timeout = connect_timeout
+        self.server = None
+        self.writer = None
+        self.reader_task = None
+        self.replies = {}
+        self.next_request_id = 0
+
+    async def start(self, server):
+        self.server = server
+        deadline = time.monotonic() + self.connect_timeout
+        while True:
+            try:
+                reader, self.writer = await asyncio.open_unix_connection(self.path)
+                break
+            except (FileNotFoundError, ConnectionRefusedError):
+                if time.monotonic() > deadline:
+                    raise
+                await asyncio.sleep(0.1)
+
+        write_frame(self.writer, ("snapshot",))
+        _, self.sessions = await read_frame(reader)
+        self.reader_task = asyncio.create_task(self.read_loop(reader))
+
+    async def stop(self):
+        if self.reader_task is not None:
+            self.reader_task.cancel()
+            self.reader_task = None
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+
+    async def read_loop(self, reader):
+        try:
+            while True:
+                frame = await read_frame(reader)
+                kind = frame[0]
+                if kind == "reply":
+                    _, request_id, session, error = frame
+                    future = self.replies.pop(request_id)
+                    if error:
+                        future.set_exception(RuntimeError(error))
+                    else:
+                        future.set_result(session)
+                elif kind == "state":
+                    _, client_id, workflow_id, session = frame
+                    if session is None:
+                        self.drop(client_id, workflow_id)
+                    else:
+                        self.sessions.setdefault(client_id, {})[workflow_id] = session
+                    await self.notify()
+                elif kind == "forward":
+                    _, sid, message_kind, args = frame
+                    await self.server.deliver(sid, message_kind, args)
+                elif kind == "batch":
+                    _, batch_id, event, args = frame
+                    await self.server.batch_runner.replicate(batch_id, event, args)
+        except (asyncio.IncompleteReadError, ConnectionError) as e:
+            self.server.logger.error(f"lost the connection to the session broker / {e}")
+            for future in self.replies.values():
+                future.set_exception(ConnectionError("session broker is gone"))
+            self.replies = {}
+
+    async def update(self, client_id, workflow_id, operation, **kwargs):
+        request_id = self.next_request_id
+        self.next_request_id += 1
+        future = asyncio.get_running_loop().create_future()
+        self.replies[request_id] = future
+        write_frame(self.writer, ("update", request_id, client_id, workflow_id, operation, kwargs))
+
+        session = await future
+        self.sessions.setdefault(client_id, {})[workflow_id] = session
+        await self.notify()
+        return session
+
+    def hold(self, client_id, workflow_id):
+        write_frame(self.writer, ("hold", client_id, workflow_id))
+
+    def release(self, client_id, workflow_id):
+        if self.writer is not None:
+            write_frame(self.writer, ("release", client_id, workflow_id))
+
+    def discard_user(self, client_id):
+        write_frame(self.writer, ("discard", client_id))
+
+    def sweep(self):
+        # the broker expires sessions and pushes the removals
+        return 0
+
+    def attach(self, sid):
+        write_frame(self.writer, ("attach", sid))
+
+    def detach(self, sid):
+        if self.writer is not None:
+            write_frame(self.writer, ("detach", sid))
+
+    def share_batch(self, batch_id, event, args):
+        if self.writer is not None:
+            write_frame(self.writer, ("batch", batch_id, event, args))
+
+    def forward(self, sid, kind, args):
+        try:
+            write_frame(self.writer, ("forward", sid, kind, args))
+        except Exception as e:
+            self.server.logger.warning(f"could not forward a message for {sid} / {e}")
+            return False
+        return True
@@ -0,0 +1,256 @@
+import asyncio
+import hashlib
+import json
+import mmap
+import os
+import re
+import time
+
+from ...domain.utilities.generate_id import generate_id
+
+CHUNK_SIZE = 1024 * 1024
+HANDLE_PREFIX = "upload:"
+
+SHA256_PATTERN = re.compile(r"^[0-9a-f]{64}$")
+UPLOAD_ID_PATTERN = re.compile(r"^[0-9a-f-]+$")
+
+
+class UploadError(Exception):
+    def __init__(self, message, status=400, **details):
+        super().__init__(message)
+        self.status = status
+        self.details = details
+
+
+class StagedUpload:
+    """an upload in progress: the bytes received so far and their running hash"""
+
+    def __init__(self, upload_id, path, name, size, expected_sha256):
+        self.upload_id = upload_id
+        self.path = path
+        self.name = name
+        self.size = size
+        self.expected_sha256 = expected_sha256
+        self.offset = 0
+        self.hasher = hashlib.sha256()
+        self.lock = asyncio.Lock()
+
+    def describe(self):
+        return {"upload_id": self.upload_id, "name": self.name, "offset": self.offset, "size": self.size}
+
+
+class UploadStore:
+    """
+    Uploaded files under the input directory, stored once per content hash.
+
+    Uploads are written to uploads/.staging as they stream in, hashed incrementally and
+    moved to uploads/<sha256[:2]>/<sha256> when complete; content that is already stored
+    is not kept twice. Node inputs reference a file by its handle, "upload:<sha256>",
+    and nodes open or mmap it through the store instead of receiving its bytes.
+    """
+
+    def __init__(self, directory, max_size=None, metrics=None, staging_max_age=86400.0):
+        self.directory = os.path.join(directory, "uploads")
+        self.staging_directory = os.path.join(self.directory, ".staging")
+        self.max_size = max_size
+        self.metrics = metrics
+        self.staging_max_age = staging_max_age
+        self.staged = {}
+
+    def setup(self):
+        os.makedirs(self.staging_directory, exist_ok=True)
+
+        # uploads abandoned long ago are not going to be resumed
+        deadline = time.time() - self.staging_max_age
+        for entry in os.scandir(self.staging_directory):
+            if entry.stat().st_mtime < deadline:
+                os.remove(entry.path)
+
+    def content_path(self, sha256):
+        return os.path.join(self.directory, sha256[:2], sha256)
+
+    def describe(self, sha256, deduplicated=False):
+        path = self.content_path(sha256)
+        return {
+            "handle": f"{HANDLE_PREFIX}{sha256}",
+            "sha256": sha256,
+            "size": os.path.getsize(path),
+            "path": os.path.relpath(path, os.path.dirname(self.directory)),
+            "deduplicated": deduplicated,
+        }
+
+    def find(self, sha256):
+        if SHA256_PATTERN.match(sha256 or "") and os.path.exists(self.content_path(sha256)):
+            return self.describe(sha256, deduplicated=True)
+        return None
+
+    def path(self, handle):
+        """the file a handle refers to"""
+        sha256 = handle[len(HANDLE_PREFIX):] if handle.startswith(HANDLE_PREFIX) else ""
+        if not SHA256_PATTERN.match(sha256):
+            raise ValueError(f"not an upload handle: {handle!r}")
+        path = self.content_path(sha256)
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"no upload for {handle}")
+        return path
+
+    def open(self, handle, mode="rb"):
+        return open(self.path(handle), mode)
+
+    def mmap(self, handle):
+        """a read-only memory map of the file, zero length files can't be mapped"""
+        with self.open(handle) as f:
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def meta_path(self, upload_id):
+        return os.path.join(self.staging_directory, f"{upload_id}.json")
+
+    def create(self, name, size=None, sha256=None):
+        """starts a resumable upload, or returns the stored file when its hash is already known"""
+        existing = self.find(sha256)
+        if existing is not None:
+            self.count("uploads.deduplicated")
+            return existing
+
+        if size is not None and self.max_size is not None and size > self.max_size:
+            raise UploadError("upload is larger than --max-upload-size", status=413)
+
+        upload_id = generate_id()
+        staged = StagedUpload(
+            upload_id, os.path.join(self.staging_directory, upload_id), name, size, sha256
+        )
+        open(staged.path, "wb").close()
+        with open(self.meta_path(upload_id), "w") as f:
+            json.dump({"name": name, "size": size, "sha256": sha256}, f)
+
+        if size == 0:
+            return self.finish(staged)
+        self.staged[upload_id] = staged
+        return staged.describe()
+
+    def staged_upload(self, upload_id):
+        # the live object even mid-append, its lock is what keeps appends in order
+        staged = self.staged.get(upload_id)
+        if staged is not None:
+            return staged
+
+        # an upload started before a restart, or continued by another process under
+        # --workers: recover it from the staging directory
+        if not UPLOAD_ID_PATTERN.match(upload_id) or not os.path.exists(self.meta_path(upload_id)):
+            raise UploadError("unknown upload", status=404)
+        with open(self.meta_path(upload_id), "r") as f:
+            meta = json.load(f)
+
+        staged = StagedUpload(
+            upload_id,
+            os.path.join(self.staging_directory, upload_id),
+            meta["name"],
+            meta["size"],
+            meta["sha256"],
+        )
+        self.rehash(staged)
+        # another thread may have recovered it at the same time, keep one
+        return self.staged.setdefault(upload_id, staged)
+
+    def rehash(self, staged):
+        """offset and hash from the staging file, when another process appended to it"""
+        if os.path.getsize(staged.path) == staged.offset:
+            return
+        staged.offset = 0
+        staged.hasher = hashlib.sha256()
+        with open(staged.path, "rb") as f:
+            while chunk := f.read(CHUNK_SIZE):
+                staged.hasher.update(chunk)
+                staged.offset += len(chunk)
+
+    async def status(self, upload_id):
+        """where an upload stands, the live offset while an append is streaming"""
+        loop = asyncio.get_running_loop()
+        staged = await loop.run_in_executor(None, self.staged_upload, upload_id)
+        if not staged.lock.locked():
+            async with staged.lock:
+                if self.staged.get(upload_id) is staged:
+                    await loop.run_in_executor(None, self.rehash, staged)
+        return staged.describe()
+
+    async def append(self, upload_id, offset, chunks):
+        """writes chunks at offset, which must be where the upload left off, and finishes a complete upload"""
+        loop = asyncio.get_running_loop()
+        staged = await loop.run_in_executor(None, self.staged_upload, upload_id)
+
+        async with staged.lock:
+            # an append this one waited for finished it
+            if self.staged.get(upload_id) is not staged:
+                raise UploadError("upload is already complete", status=409, offset=staged.offset)
+            # no append of this process is writing, a size change came from another one
+            await loop.run_in_executor(None, self.rehash, staged)
+            if offset != staged.offset:
+                raise UploadError(
+                    "offset does not match the upload", status=409, offset=staged.offset
+                )
+
+            f = await loop.run_in_executor(None, open, staged.path, "r+b")
+            try:
+                await loop.run_in_executor(None, f.seek, staged.offset)
+                # whatever arrives before the client goes away is kept for a resume
+                async for chunk in chunks:
+                    limit = staged.size if staged.size is not None else self.max_size
+                    if limit is not None and staged.offset + len(chunk) > limit:
+                        raise UploadError("more data than the upload's size", status=413)
+                    # hashing releases the GIL, keep both off the event loop
+                    await loop.run_in_executor(None, write_chunk, f, staged.hasher, chunk)
+                    staged.offset += len(chunk)
+                    self.count("uploads.bytes", len(chunk))
+            finally:
+                await loop.run_in_executor(None, f.close)
+
+            if staged.size is None or staged.offset < staged.size:
+                return staged.describe()
+            return await loop.run_in_executor(None, self.finish, staged)
+
+    async def store(self, name, chunks):
+        """a whole upload in one request"""
+        loop = asyncio.get_running_loop()
+        staged = await loop.run_in_executor(None, self.create, name)
+        try:
+            await self.append(staged["upload_id"], 0, chunks)
+        except BaseException:
+            await loop.run_in_executor(None, self.discard, staged["upload_id"])
+            raise
+        upload = self.staged[staged["upload_id"]]
+        upload.size = upload.offset
+        return await loop.run_in_executor(None, self.finish, upload)
+
+    def discard(self, upload_id):
+        self.staged.pop(upload_id, None)
+        for path in (os.path.join(self.staging_directory, upload_id), self.meta_path(upload_id)):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def finish(self, staged):
+        sha256 = staged.hasher.hexdigest()
+        self.staged.pop(staged.upload_id, None)
+        os.remove(self.meta_path(staged.upload_id))
+
+        if staged.expected_sha256 and staged.expected_sha256 != sha256:
+            os.remove(staged.path)
+            raise UploadError("content does not match the declared sha256", status=422, sha256=sha256)
+
+        path = self.content_path(sha256)
+        if os.path.exists(path):
+            os.remove(staged.path)
+            self.count("uploads.deduplicated")
+            return self.describe(sha256, deduplicated=True)
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(staged.path, path)
+        return self.describe(sha256)
+
+    def count(self, name, value=1):
+        if self.metrics is not None:
+            self.metrics.increment(name, value)
+
+
+def write_chunk(f, hasher, chunk):
+    f.write(chunk)
+    hasher.update(chunk)
@@ -0,0 +1,241 @@
+import asyncio
+import importlib
+import inspect
+import multiprocessing
+import os
+import threading
+import time
+import traceback
+
+
+def worker_main(connection, preload):
+    """runs in the worker process: import the heavy modules once, then evaluate nodes on request"""
+    failed = {}
+    for module_name in preload:
+        try:
+            importlib.import_module(module_name)
+        except Exception as e:
+            failed[module_name] = f"{type(e).__name__}: {e}"
+    connection.send(("ready", os.getpid(), failed))
+
+    classes = {}
+    # one loop for the worker's lifetime, so async nodes can keep clients bound to it
+    loop = None
+    while True:
+        try:
+            request = connection.recv()
+        except (EOFError, KeyboardInterrupt):
+            break
+
+        kind = request[0]
+        if kind == "stop":
+            break
+        if kind == "ping":
+            connection.send(("pong", os.getpid()))
+            continue
+
+        _, module_name, class_name, node_inputs = request
+        try:
+            python_class = classes.get((module_name, class_name))
+            if python_class is None:
+                python_class = getattr(importlib.import_module(module_name), class_name)
+                classes[(module_name, class_name)] = python_class
+            output = python_class().evaluate(node_inputs)
+            if inspect.isawaitable(output):
+                loop = loop or asyncio.new_event_loop()
+                output = loop.run_until_complete(output)
+            response = ("ok", output)
+        except Exception as e:
+            response = ("error", f"{type(e).__name__}: {e}", traceback.format_exc())
+
+        try:
+            connection.send(response)
+        except Exception as e:
+            connection.send(("error", f"node output could not be sent back from the worker / {e}", ""))
+
+
+class WorkerError(Exception):
+    pass
+
+
+class WorkerProcess:
+    """one long-lived process for a group of extensions, serving one evaluate at a time"""
+
+    def __init__(self, group, preload, context):
+        self.group = group
+        self.preload = preload
+        self.context = context
+        self.lock = threading.Lock()
+        self.process = None
+        self.connection = None
+        self.ready = None
+
+    def start(self):
+        parent_connection, child_connection = self.context.Pipe()
+        self.process = self.context.Process(
+            target=worker_main,
+            args=(child_connection, self.preload),
+            name=f"neoscaffold-worker-{self.group}",
+            daemon=True,
+        )
+        self.process.start()
+        child_connection.close()
+        self.connection = parent_connection
+        self.ready = None
+
+    def stop(self, timeout=2.0):
+        if self.process is None:
+            return
+        try:
+            self.connection.send(("stop",))
+        except (OSError, ValueError):
+            pass
+        self.process.join(timeout)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+        self.connection.close()
+        self.process = None
+
+    def is_alive(self):
+        return self.process is not None and self.process.is_alive()
+
+    def receive(self, timeout):
+        """the next non-ready message, recording the ready message that follows preloading"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            if not self.connection.poll(remaining):
+                raise TimeoutError(f"worker {self.group} did not answer within {timeout} seconds")
+            message = self.connection.recv()
+            if message[0] == "ready":
+                self.ready = {"pid": message[1], "failed_preloads": message[2]}
+                continue
+            return message
+
+    def call(self, request, timeout=None):
+        with self.lock:
+            if not self.is_alive():
+                raise WorkerError(f"worker {self.group} is not running")
+            self.connection.send(request)
+            return self.receive(timeout)
+
+
+class WorkerPool:
+    """
+    Long-lived worker processes for extensions that declare one in EXTENSION_MAPPINGS:
+
+        "worker": {"group": "agents", "preload": ["autogen"]}
+
+    Extensions sharing a group share a process. Nodes of those extensions are evaluated in
+    the worker over a pipe, so their inputs and outputs must be picklable and they can't
+    use the executor's memory. Workers are health checked and restarted when they die or
+    time out.
+    """
+
+    def __init__(self, metrics, logger, enabled=True, timeout=None, start_method="spawn"):
+        self.metrics = metrics
+        self.logger = logger
+        self.enabled = enabled
+        self.timeout = timeout
+        self.context = multiprocessing.get_context(start_method)
+        self.groups = {}
+        self.node_groups = {}
+        self.workers = {}
+
+    def register(self, extension_name, worker, node_names):
+        if not self.enabled or not worker:
+            return
+        group = worker.get("group") or extension_name
+        preload = self.groups.setdefault(group, [])
+        for module_name in worker.get("preload", []):
+            if module_name not in preload:
+                preload.append(module_name)
+        for node_name in node_names:
+            self.node_groups[node_name] = group
+
+    def runs(self, node_name):
+        return node_name in self.node_groups
+
+    def start(self):
+        for group, preload in self.groups.items():
+            if group not in self.workers:
+                worker = WorkerProcess(group, preload, self.context)
+                worker.start()
+                self.workers[group] = worker
+                self.logger.warning(f"started worker {group} preloading {preload}")
+
+    def stop(self):
+        for worker in self.workers.values():
+            worker.stop()
+        self.workers = {}
+
+    def restart(self, worker, reason):
+        self.logger.warning(f"restarting worker {worker.group}: {reason}")
+        self.metrics.increment("worker.restarts")
+        with worker.lock:
+            worker.stop(timeout=0)
+            worker.start()
+
+    def remote_evaluate(self, node_name, python_class):
+        """an evaluate function that runs python_class in the node's worker, blocking until it returns"""
+        group = self.node_groups[node_name]
+
+        def evaluate(node_inputs):
+            worker = self.workers.get(group)
+            if worker is None:
+                self.start()
+                worker = self.workers[group]
+            elif not worker.is_alive():
+                self.restart(worker, "process exited")
+
+            time_start = time.perf_counter()
+            try:
+                response = worker.call(
+                    ("evaluate", python_class.__module__, python_class.__name__, node_inputs),
+                    timeout=self.timeout,
+                )
+            except TimeoutError as e:
+                self.restart(worker, "evaluate timed out")
+                raise WorkerError(str(e))
+            except (EOFError, OSError) as e:
+                self.restart(worker, f"connection lost / {e}")
+                raise WorkerError(f"worker {group} exited while evaluating {node_name}")
+            finally:
+                self.metrics.increment("worker.calls")
+                self.metrics.observe(f"worker.{group}.evaluate", time.perf_counter() - time_start)
+
+            if response[0] == "error":
+                raise WorkerError(f"{response[1]}\n{response[2]}")
+            return response[1]
+
+        return evaluate
+
+    def check_health(self, timeout=5.0):
+        """ping idle workers and restart any that are dead or unresponsive"""
+        for worker in list(self.workers.values()):
+            if not worker.is_alive():
+                self.restart(worker, "process exited")
+                continue
+            # a busy worker is evaluating a node, its liveness is all we can check
+            if not worker.lock.acquire(blocking=False):
+                continue
+            try:
+                worker.connection.send(("ping",))
+                worker.receive(timeout)
+            except (TimeoutError, EOFError, OSError) as e:
+                worker.lock.release()
+                self.restart(worker, f"health check failed / {e}")
+                continue
+            worker.lock.release()
+
+    def status(self):
+        return {
+            group: {
+                "alive": worker.is_alive(),
+                "busy": worker.lock.locked(),
+                "ready": worker.ready,
+                "preload": worker.preload,
+            }
+            for group, worker in self.workers.items()
+        }
@@ -0,0 +1,122 @@
+import asyncio
+import time
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from custom_extensions.network_requests import extension
+from custom_extensions.network_requests.engine import HTTPEngine
+from custom_extensions.network_requests.rate_limit import HostRateLimiter, TokenBucket
+from custom_extensions.network_requests.retry import RetryPolicy
+
+
+def test_build_batch_from_requests_or_a_template():
+    batch = extension.build_batch(
+        [{"url": "http://a/1", "headers": {"X": "1"}}], None, None, "GET", {"Y": "2"}
+    )
+    assert batch == [{"url": "http://a/1", "method": "GET", "headers": {"Y": "2", "X": "1"}}]
+
+    batch = extension.build_batch(None, "http://a/{kind}/{id}", [{"kind": "x", "id": 1}], "GET", {})
+    assert batch == [{"url": "http://a/x/1", "method": "GET", "headers": {}}]
+    batch = extension.build_batch(None, "http://a/items/{}", [1, 2], "DELETE", {})
+    assert [request["url"] for request in batch] == ["http://a/items/1", "http://a/items/2"]
+    assert {request["method"] for request in batch} == {"DELETE"}
+
+    batch = extension.build_batch(None, "http://a/search?q={q}", [{"q": "a&b=c d/e"}], "GET", {})
+    assert batch[0]["url"] == "http://a/search?q=a%26b%3Dc%20d%2Fe"
+
+
+def test_token_bucket_paces_after_the_burst():
+    async def main():
+        bucket = TokenBucket(rate=50, burst=2)
+        started = time.monotonic()
+        for _ in range(7):
+            await bucket.acquire()
+        # two at once, then five at 50/s
+        return time.monotonic() - started
+
+    assert 0.08 <= asyncio.run(main()) < 0.5
+
+
+def test_fan_out_keeps_order_caps_concurrency_and_reports_failures(monkeypatch):
+    in_flight = [0, 0]
+
+    async def item(request):
+        in_flight[0] += 1
+        in_flight[1] = max(in_flight[1], in_flight[0])
+        await asyncio.sleep(0.02)
+        in_flight[0] -= 1
+        n = int(request.match_info["n"])
+        if n == 3:
+            return web.json_response({"error": "missing"}, status=404)
+        return web.json_response({"item": n})
+
+    async def main():
+        app = web.Application()
+        app.router.add_get("/items/{n}", item)
+        async with TestServer(app) as http:
+            monkeypatch.setattr(extension, "engine", HTTPEngine())
+            batch = [{"url": str(http.make_url(f"/items/{n}"))} for n in range(12)]
+            batch.append({"url": "http://127.0.0.1:1/unreachable"})
+
+            streamed = []
+
+            async def on_result(index, result):
+                streamed.append(index)
+
+            async def fetch(url, *args, **kwargs):
+                return await original(url, *args, retry_policy=RetryPolicy(max_attempts=1), **kwargs)
+
+            original = extension.fetch_async
+            monkeypatch.setattr(extension, "fetch_async", fetch)
+
+            results = await extension.process_batch_async(
+                batch,
+                concurrency=3,
+                rate_limiter=HostRateLimiter(1000),
+                return_exceptions=True,
+                on_result=on_result,
+            )
+
+            assert [r["request"]["url"] for r in results] == [r["url"] for r in batch]
+            assert results[0]["response"] == {"status": 200, "body": {"item": 0}}
+            assert results[3]["response"]["status"] == 404
+            assert results[12]["response"]["status"] is None
+            assert "error" in results[12]
+            assert sorted(streamed) == list(range(13))
+            assert in_flight[1] <= 3
+
+            await extension.engine.close()
+
+    asyncio.run(main())
+
+
+def test_a_rate_limited_host_does_not_hold_concurrency_slots(monkeypatch):
+    async def item(request):
+        return web.json_response({"item": int(request.match_info["n"])})
+
+    async def main():
+        app = web.Application()
+        app.router.add_get("/items/{n}", item)
+        async with TestServer(app) as http:
+            engine = HTTPEngine()
+            monkeypatch.setattr(extension, "engine", engine)
+            port = http.port
+            # two names for the server, so two hosts with a bucket each
+            batch = [{"url": f"http://localhost:{port}/items/{n}"} for n in range(10)]
+            batch += [{"url": f"http://127.0.0.1:{port}/items/{n}"} for n in range(10)]
+
+            started = time.monotonic()
+            await extension.process_batch_async(
+                batch, concurrency=2, rate_limiter=engine.rate_limiter(20, burst=1)
+            )
+            # the hosts are paced side by side, 10 tokens at 20/s each
+            assert time.monotonic() - started < 0.75
+
+            # another limiter of the same rate shares the buckets
+            assert engine.rate_limiter(20, burst=1).buckets is engine.rate_limits
+            assert len(engine.rate_limits) == 2
+
+            await engine.close()
+
+    asyncio.run(main())
@@ -0,0 +1,89 @@
+import asyncio
+import json
+import logging
+import socket
+
+from benchmarks.stub_server import StubServer
+from benchmarks.workflows import long_chain
+from server.domain.services.batch_runner import BatchRunner
+from server.domain.services.graph_executor import GraphExecutor
+from server.domain.utilities.metrics import Metrics
+from server.infrastructure.servers.session_store import BrokerSessionStore, SessionBroker
+
+
+def test_batch_runs_share_one_graph_and_resume_from_a_cursor():
+    server = StubServer()
+    server.metrics = Metrics()
+    server.graph_executor = GraphExecutor(server)
+
+    async def scenario():
+        runner = BatchRunner(server, concurrency=2)
+        runs = [{"1": {"text": f"run {i}"}} for i in range(5)] + [{"missing": {"text": "x"}}]
+        batch = runner.submit(long_chain(length=4), runs, concurrency=8)
+
+        streamed = [json.loads(line) async for line in batch.lines_after(0)]
+        resumed = [json.loads(line) async for line in batch.lines_after(4)]
+        return batch, streamed, resumed
+
+    batch, streamed, resumed = asyncio.run(scenario())
+
+    assert batch.semaphore._value == 2
+    assert [entry["cursor"] for entry in streamed] == [1, 2, 3, 4, 5, 6]
+    assert [entry["cursor"] for entry in resumed] == [5, 6]
+
+    by_run = {entry["run"]: entry for entry in streamed}
+    assert by_run[3]["status"] == "success"
+    assert by_run[3]["results"]["4"]["values"] == "run 3"
+    assert by_run[5]["status"] == "error"
+    assert batch.summary()["failed"] == 1 and batch.done
+    # quiet runs report only through the batch
+    assert server.messages == 0
+
+
+def test_a_batch_streams_from_any_worker(tmp_path):
+    path = str(tmp_path / "sessions.sock")
+
+    def worker():
+        server = StubServer()
+        server.metrics = Metrics()
+        server.logger = logging.getLogger(__name__)
+        server.graph_executor = GraphExecutor(server)
+        server.batch_runner = BatchRunner(server, concurrency=2)
+        server.session_store = BrokerSessionStore(path)
+        return server
+
+    async def scenario():
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.bind(path)
+        sock.listen()
+        broker = asyncio.create_task(SessionBroker().serve(sock))
+
+        running, resuming = worker(), worker()
+        await running.session_store.start(running)
+        await resuming.session_store.start(resuming)
+
+        runs = [{"1": {"text": f"run {i}"}} for i in range(4)]
+        batch = running.batch_runner.submit(long_chain(length=4), runs, owner="alice")
+        await asyncio.sleep(0.05)
+
+        # the client reconnects to another worker with the last cursor it read
+        replica = resuming.batch_runner.batches[batch.batch_id]
+        resumed = [json.loads(line) async for line in replica.lines_after(2)]
+        streamed = [json.loads(line) async for line in batch.lines_after(0)]
+
+        # a worker that starts later is sent what the broker kept
+        late = worker()
+        await late.session_store.start(late)
+        await asyncio.sleep(0.05)
+        late_summary = late.batch_runner.batches[batch.batch_id].summary()
+
+        for server in (running, resuming, late):
+            await server.session_store.stop()
+        broker.cancel()
+        return replica, resumed, streamed, late_summary
+
+    replica, resumed, streamed, late_summary = asyncio.run(scenario())
+
+    assert replica.owner == "alice" and replica.summary() == late_summary
+    assert resumed == streamed[2:]
+    assert late_summary["finished"] == 4 and late_summary["done"]
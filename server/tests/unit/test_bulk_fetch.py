@@ -0,0 +1,123 @@
+import asyncio
+import itertools
+import threading
+from argparse import Namespace
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from benchmarks.bulk_fetch_benchmark import run
+from server.domain.utilities.request_generator import BulkFetch, Journal, request_generator
+
+
+def test_journal_keeps_the_latest_entry_and_skips_a_torn_line(tmp_path):
+    path = str(tmp_path / "journal.jsonl")
+    journal = Journal(path)
+    journal.record("1", "failed", status=503)
+    journal.record("2", "done", status=200)
+    journal.record("1", "done", status=200)
+    journal.close()
+    with open(path, "a") as f:
+        f.write('{"id": "3", "sta')
+
+    entries = Journal(path).load()
+    assert {id: entry["state"] for id, entry in entries.items()} == {"1": "done", "2": "done"}
+
+
+def test_bulk_fetch_resumes_and_retries_only_failures(tmp_path):
+    fetched = []
+    broken = {3, 7}
+
+    async def item(request):
+        n = int(request.match_info["n"])
+        fetched.append(n)
+        if n in broken:
+            return web.json_response({}, status=503)
+        return web.json_response({"item": n})
+
+    async def main():
+        app = web.Application()
+        app.router.add_get("/items/{n}", item)
+        async with TestServer(app) as http:
+            requests = [{"id": n, "url": str(http.make_url(f"/items/{n}"))} for n in range(10)]
+            path = str(tmp_path / "journal.jsonl")
+            results = {}
+
+            def bulk_fetch(**options):
+                return BulkFetch(
+                    path,
+                    concurrency=3,
+                    max_attempts=1,
+                    on_result=lambda request, status, body: results.update({request["id"]: body}),
+                    **options,
+                )
+
+            # a job that stopped after 5 requests picks up at the 6th
+            report = await bulk_fetch().run(itertools.islice(requests, 5))
+            assert (report["done"], report["failed"]) == (4, 1)
+            report = await bulk_fetch().run(requests)
+            assert (report["done"], report["failed"], report["skipped"]) == (4, 1, 5)
+            assert sorted(fetched) == list(range(10))
+
+            broken.clear()
+            fetched.clear()
+            report = await bulk_fetch(retry_failures=True).run(requests)
+            assert sorted(fetched) == [3, 7]
+            assert (report["done"], report["skipped"]) == (2, 8)
+            assert results[7] == {"item": 7}
+            assert report["latency_p99_ms"] >= report["latency_p50_ms"] > 0
+
+    asyncio.run(main())
+
+
+def test_bulk_fetch_benchmark_runs():
+    args = Namespace(requests=200, concurrency=16, latency=0.0, failure_every=50)
+    results = run(args)["results"]
+    assert results["resumed"]["skipped"] == 100
+    assert results["retry_failures"]["failed"] == 4
+
+
+def stub_application(handler):
+    app = web.Application()
+    app.router.add_get("/items/{n}", handler)
+    return app
+
+
+def test_request_generator_restarts_from_its_journal(tmp_path):
+    fetched = []
+
+    async def item(request):
+        fetched.append(int(request.match_info["n"]))
+        return web.json_response({"item": int(request.match_info["n"])})
+
+    # request_generator runs its own loop, so the server gets a thread of its own
+    loop = asyncio.new_event_loop()
+    runner = web.AppRunner(stub_application(item))
+    loop.run_until_complete(runner.setup())
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    loop.run_until_complete(site.start())
+    port = runner.addresses[0][1]
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+
+    try:
+        batches = [
+            [{"id": n, "url": f"http://127.0.0.1:{port}/items/{n}"} for n in range(b * 4, b * 4 + 4)]
+            for b in range(3)
+        ]
+        path = str(tmp_path / "journal.jsonl")
+
+        # the first run dies after its first batch
+        generator = request_generator(batches, journal_path=path)
+        first = next(generator)
+        generator.close()
+        assert [r["response"] for r in first] == [(200, {"item": n}) for n in range(4)]
+
+        results = list(request_generator(batches, journal_path=path))
+        assert results[0] == []
+        assert [r["request"]["id"] for r in results[1] + results[2]] == list(range(4, 12))
+        assert sorted(fetched) == list(range(12))
+    finally:
+        asyncio.run_coroutine_threadsafe(runner.cleanup(), loop).result()
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
@@ -0,0 +1,65 @@
+import asyncio
+import logging
+
+from server.domain.utilities.encoders import get_encoder
+from server.domain.utilities.metrics import Metrics
+from server.infrastructure.servers.client_connection import ClientConnection
+
+
+class StalledWebSocket:
+    def __init__(self):
+        self.sent = []
+        self.release = asyncio.Event()
+        self.closed = False
+
+    async def send_str(self, data):
+        await self.release.wait()
+        self.sent.append(data)
+
+    async def send_bytes(self, data):
+        await self.send_str(data)
+
+    async def close(self, code=None):
+        self.closed = True
+
+
+def test_progress_updates_are_coalesced_while_client_is_behind():
+    async def scenario():
+        ws = StalledWebSocket()
+        metrics = Metrics()
+        connection = ClientConnection("sid", ws, get_encoder("json"), metrics, logging.getLogger(__name__))
+
+        connection.put("first")
+        await asyncio.sleep(0)
+        for i in range(10):
+            connection.put(f"results {i}", coalesce_key=("results", "prompt"))
+        connection.put("breakpoint")
+
+        ws.release.set()
+        await asyncio.sleep(0.01)
+        await connection.close()
+        return ws.sent, metrics.counters
+
+    sent, counters = asyncio.run(scenario())
+
+    assert sent == ["first", "results 9", "breakpoint"]
+    assert counters["websocket.coalesced"] == 9
+
+
+def test_client_that_stays_behind_is_disconnected():
+    async def scenario():
+        ws = StalledWebSocket()
+        metrics = Metrics()
+        connection = ClientConnection(
+            "sid", ws, get_encoder("json"), metrics, logging.getLogger(__name__), max_queue=4, max_lag_seconds=60
+        )
+
+        for i in range(6):
+            connection.put(f"message {i}")
+        await asyncio.sleep(0)
+        return ws.closed, connection.closed, metrics.counters
+
+    ws_closed, connection_closed, counters = asyncio.run(scenario())
+
+    assert ws_closed and connection_closed
+    assert counters["websocket.disconnected_slow"] == 1
@@ -0,0 +1,53 @@
+import asyncio
+import gzip
+import json
+
+from aiohttp import web
+from aiohttp.test_utils import TestClient, TestServer
+
+from server.domain.utilities.read_json import read_json
+from server.infrastructure.servers.compression import compression_middleware, preferred_encoding
+
+
+def test_preferred_encoding_follows_q_values():
+    assert preferred_encoding("gzip, br", ["br", "gzip"]) == "br"
+    assert preferred_encoding("br;q=0.5, gzip", ["br", "gzip"]) == "gzip"
+    assert preferred_encoding("br;q=0, *", ["br", "gzip"]) == "gzip"
+    assert preferred_encoding("identity", ["br", "gzip"]) is None
+
+
+def test_responses_are_compressed_and_request_bodies_decompressed():
+    prompt = {"prompt": {str(i): {"kind": "nsString", "text": "x" * 100} for i in range(5000)}}
+
+    async def echo(request):
+        # offload_size=0 parses in the executor
+        data = await read_json(request, offload_size=0)
+        return web.json_response({"nodes": len(data["prompt"]), "prompt": data["prompt"]})
+
+    async def small(request):
+        return web.json_response({"ok": True})
+
+    async def main():
+        app = web.Application(middlewares=[compression_middleware(min_size=1024)])
+        app.router.add_post("/prompt", echo)
+        app.router.add_get("/small", small)
+        async with TestClient(TestServer(app)) as client:
+            response = await client.post(
+                "/prompt",
+                data=gzip.compress(json.dumps(prompt).encode("utf-8")),
+                headers={"Content-Encoding": "gzip", "Accept-Encoding": "gzip"},
+            )
+            assert response.status == 200
+            assert response.headers["Content-Encoding"] == "gzip"
+            assert int(response.headers["Content-Length"]) < 50000
+            assert (await response.json())["nodes"] == 5000
+
+            response = await client.post(
+                "/prompt", json=prompt, headers={"Accept-Encoding": "identity"}
+            )
+            assert "Content-Encoding" not in response.headers
+
+            response = await client.get("/small", headers={"Accept-Encoding": "gzip"})
+            assert "Content-Encoding" not in response.headers
+
+    asyncio.run(main())
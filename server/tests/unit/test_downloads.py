@@ -0,0 +1,108 @@
+import asyncio
+import hashlib
+import json
+import os
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from custom_extensions.network_requests.downloads import DownloadError, download
+from custom_extensions.network_requests.engine import HTTPEngine, engine
+from custom_extensions.network_requests.extension import fetch_async
+
+
+def test_downloads_are_segmented_resumed_and_verified(tmp_path):
+    data = os.urandom(3 * 1024 * 1024 + 17)
+    sha256 = hashlib.sha256(data).hexdigest()
+    source = tmp_path / "source.bin"
+    source.write_bytes(data)
+    ranges = []
+    methods = []
+    current = {}
+
+    async def serve(request):
+        methods.append(request.method)
+        if request.method == "GET":
+            ranges.append(request.headers.get("Range"))
+        # aiohttp only compares If-Range as a date
+        if request.headers.get("If-Range", current.get("etag")) != current.get("etag"):
+            return web.Response(body=data, headers={"ETag": current["etag"]})
+        return web.FileResponse(source)
+
+    async def main():
+        app = web.Application()
+        app.router.add_get("/file.bin", serve)
+        async with TestServer(app) as http:
+            url = str(http.make_url("/file.bin"))
+            engine = HTTPEngine()
+            reports = []
+
+            async def read_etag(response):
+                return response.headers["ETag"]
+
+            current["etag"] = await engine.send(url, "HEAD", None, None, read_etag)
+            methods.clear()
+
+            async def progress(done, total):
+                reports.append((done, total))
+
+            target = tmp_path / "segmented.bin"
+            result = await download(
+                engine, url, str(target), sha256=sha256, segment_threshold=1024, progress=progress
+            )
+            assert target.read_bytes() == data and result["sha256"] == sha256
+            # the first GET is the first segment, there's no HEAD before it
+            assert ranges[0] is None and len(ranges) == 4
+            assert all(r.startswith("bytes=") for r in ranges[1:])
+            assert "HEAD" not in methods and result["status"] == 200
+            assert reports[-1] == (len(data), len(data))
+            assert not os.path.exists(f"{target}.part")
+
+            # an interrupted download picks up where the .part file ends
+            etag = current["etag"]
+            target = tmp_path / "resumed.bin"
+            (tmp_path / "resumed.bin.part").write_bytes(data[:1000])
+            (tmp_path / "resumed.bin.part.json").write_text(
+                json.dumps({"url": url, "etag": etag, "size": len(data), "segments": None})
+            )
+            ranges.clear()
+            result = await download(engine, url, str(target), segment_threshold=len(data) + 1)
+            assert ranges == ["bytes=1000-"] and target.read_bytes() == data
+            assert result["status"] == 206
+
+            # a resource that changed since is fetched again whole
+            target = tmp_path / "changed.bin"
+            (tmp_path / "changed.bin.part").write_bytes(b"x" * 1000)
+            (tmp_path / "changed.bin.part.json").write_text(
+                json.dumps({"url": url, "etag": '"old"', "size": len(data), "segments": None})
+            )
+            ranges.clear()
+            await download(engine, url, str(target), segment_threshold=len(data) + 1)
+            assert ranges == ["bytes=1000-"] and target.read_bytes() == data
+
+            with pytest.raises(DownloadError):
+                await download(engine, url, str(tmp_path / "bad.bin"), sha256="0" * 64)
+            assert not os.path.exists(tmp_path / "bad.bin")
+            await engine.close()
+
+    asyncio.run(main())
+
+
+def test_binary_file_requests_return_the_real_status(tmp_path):
+    async def missing(request):
+        return web.json_response({"error": "no"}, status=404)
+
+    async def main():
+        app = web.Application()
+        app.router.add_get("/missing", missing)
+        async with TestServer(app) as http:
+            url = str(http.make_url("/missing"))
+            path = str(tmp_path / "missing.bin")
+            assert await fetch_async(url, response_type="binary_file", fetch_handle_parameters={"id": path}) == (404, None)
+            assert not os.path.exists(path)
+            with pytest.raises(ValueError):
+                await fetch_async(url, response_type="binary_file")
+            await engine.close()
+
+    asyncio.run(main())
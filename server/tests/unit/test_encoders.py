@@ -0,0 +1,57 @@
+import asyncio
+import json
+import logging
+from types import SimpleNamespace
+
+import aiohttp
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from server import NodeOutput
+from server.domain.utilities import encoders
+from server.domain.utilities.encoders import get_encoder, unpack_array
+from server.infrastructure.apis.websocket_routes import base_websocket
+
+
+def test_json_encoder_serializes_dataclasses_and_bytes():
+    output = NodeOutput(name="value", kind="string", node_id="1", values="hello")
+
+    decoded = json.loads(get_encoder("json").dumps({"output": output, "raw": b"\x00\x01"}))
+
+    assert decoded["output"]["values"] == "hello"
+    assert decoded["raw"] == "AAE="
+
+
+def test_unknown_protocol_falls_back_to_json():
+    assert get_encoder("neoscaffold-v9").name == "json"
+
+
+def test_msgpack_encodes_numeric_arrays_as_typed_binary():
+    msgpack = pytest.importorskip("msgpack")
+    numpy = pytest.importorskip("numpy")
+
+    array = numpy.arange(12, dtype=numpy.float32).reshape(3, 4)
+    packed = get_encoder("msgpack").dumps({"values": array, "labels": numpy.array(["a", "b"])})
+
+    decoded = msgpack.unpackb(packed, ext_hook=lambda code, data: unpack_array(data))
+    assert decoded["values"].dtype == numpy.float32
+    assert (decoded["values"] == array).all()
+    assert decoded["labels"] == ["a", "b"]
+
+
+def test_websocket_refuses_an_encoding_it_cannot_produce(monkeypatch):
+    monkeypatch.setenv("NEOSCAFFOLD_AUTH_ENABLED", "false")
+    monkeypatch.delitem(encoders.ENCODERS, "msgpack", raising=False)
+    server = SimpleNamespace(routes=web.RouteTableDef(), logger=logging.getLogger(__name__))
+    base_websocket(server)
+    app = web.Application()
+    app.add_routes(server.routes)
+
+    async def scenario():
+        async with TestServer(app) as http, aiohttp.ClientSession() as session:
+            with pytest.raises(aiohttp.WSServerHandshakeError) as error:
+                await session.ws_connect(http.make_url("/ws"), protocols=["msgpack"])
+            return error.value.status
+
+    assert asyncio.run(scenario()) == 400
@@ -0,0 +1,22 @@
+from benchmarks.executor_benchmark import compare, run_scenario
+from benchmarks.workflows import SCENARIOS
+
+
+def test_scenarios_run_headless():
+    for name in SCENARIOS:
+        report = run_scenario(name, repeat=1)
+        assert report["evaluations"] > 0, name
+        assert report["serialized_bytes"] > 0, name
+
+
+def test_compare_flags_regressions():
+    baseline = {"results": {"long_chain": {"nodes_per_second": 1000, "serialized_bytes": 100}}}
+    current = {"results": {"long_chain": {"nodes_per_second": 800, "serialized_bytes": 100}}}
+
+    rows, regressed = compare(baseline, current, threshold=0.1)
+
+    assert regressed
+    assert [row["metric"] for row in rows if row["regression"]] == ["nodes_per_second"]
+
+    _, regressed = compare(baseline, baseline, threshold=0.1)
+    assert not regressed
@@ -0,0 +1,72 @@
+import asyncio
+import contextlib
+import io
+
+import aiohttp
+from aiohttp.test_utils import make_mocked_request
+
+from benchmarks.load_test import free_port
+from main import parse_inputs
+from server import Server
+from server.infrastructure.servers.extension_catalog import Representation, precompressed_response
+
+
+def test_extensions_catalog_is_cached_and_compressed(tmp_path, monkeypatch):
+    monkeypatch.setenv("NEOSCAFFOLD_AUTH_ENABLED", "false")
+    monkeypatch.setenv("NEOSCAFFOLD_HISTORY_PATH", str(tmp_path / "history.sqlite3"))
+    monkeypatch.setenv("NEOSCAFFOLD_MANIFEST_CACHE", str(tmp_path / "manifests"))
+    args = parse_inputs(disabled=True)
+    args.input_directory = str(tmp_path / "input")
+
+    async def scenario():
+        server = Server(loop=asyncio.get_running_loop(), args=args)
+        with contextlib.redirect_stdout(io.StringIO()):
+            server.load_extensions()
+        server.add_routes()
+        port = free_port("127.0.0.1")
+        await server.start("127.0.0.1", port, verbose=False)
+
+        base_url = f"http://127.0.0.1:{port}"
+        try:
+            async with aiohttp.ClientSession() as session:
+                async with session.get(f"{base_url}/extensions?javascript=url") as response:
+                    etag = response.headers["ETag"]
+                    encoding = response.headers.get("Content-Encoding")
+                    catalog = await response.json()
+
+                async with session.get(
+                    f"{base_url}/extensions?javascript=url", headers={"If-None-Match": etag}
+                ) as response:
+                    revalidated = response.status
+
+                javascript_url = catalog["core"]["javascript_url"]
+                async with session.get(f"{base_url}{javascript_url}") as response:
+                    javascript = await response.text()
+                    cache_control = response.headers["Cache-Control"]
+        finally:
+            await server.stop()
+
+        return encoding, catalog, revalidated, javascript, cache_control
+
+    encoding, catalog, revalidated, javascript, cache_control = asyncio.run(scenario())
+
+    assert encoding == "gzip"
+    assert "javascript" not in catalog["core"]
+    assert catalog["core"]["nodes"]
+    assert revalidated == 304
+    assert javascript
+    assert "immutable" in cache_control
+
+
+def test_precompressed_responses_honor_q_values():
+    representation = Representation(b"{}" * 1000, "application/json")
+    representation.encoded.setdefault("br", b"brotli")
+
+    def encoding(accept_encoding):
+        request = make_mocked_request("GET", "/extensions", headers={"Accept-Encoding": accept_encoding})
+        return precompressed_response(request, representation).headers.get("Content-Encoding")
+
+    assert encoding("gzip, br") == "br"
+    assert encoding("br;q=0, gzip") == "gzip"
+    assert encoding("br;q=0.5, gzip") == "gzip"
+    assert encoding("identity") is None
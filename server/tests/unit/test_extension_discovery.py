@@ -0,0 +1,35 @@
+import importlib
+import sys
+
+from server.infrastructure.servers import extension_discovery
+from server.infrastructure.servers.extension_discovery import ImportProfiler, discover_extension_packages
+
+
+def test_package_index_is_reused_until_site_packages_changes(tmp_path, monkeypatch):
+    monkeypatch.setenv("NEOSCAFFOLD_MANIFEST_CACHE", str(tmp_path))
+    packages = [{"name": "neos-example", "module": "neos_example.extension"}]
+    monkeypatch.setattr(extension_discovery, "scan_distributions", lambda: packages)
+
+    assert discover_extension_packages() == packages
+
+    def scan_again():
+        raise AssertionError("the cached index should have been used")
+
+    monkeypatch.setattr(extension_discovery, "scan_distributions", scan_again)
+    assert discover_extension_packages() == packages
+
+    fingerprint = extension_discovery.site_packages_fingerprint()
+    fingerprint[0][1] += 1
+    monkeypatch.setattr(extension_discovery, "site_packages_fingerprint", lambda: fingerprint)
+    monkeypatch.setattr(extension_discovery, "scan_distributions", lambda: [])
+    assert discover_extension_packages() == []
+
+
+def test_import_profiler_times_new_imports():
+    sys.modules.pop("colorsys", None)
+    with ImportProfiler() as profiler:
+        importlib.import_module("colorsys")
+
+    assert "colorsys" in profiler.timings
+    assert profiler not in sys.meta_path
+    assert "colorsys" in profiler.report({})
@@ -0,0 +1,55 @@
+import json
+import os
+import subprocess
+import sys
+
+SERVER_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+LOAD_SCRIPT = """
+import asyncio, contextlib, io, json, sys
+from main import parse_inputs
+from server import Server
+
+args = parse_inputs(disabled=True)
+args.input_directory = sys.argv[1]
+server = Server(loop=asyncio.new_event_loop(), args=args)
+with contextlib.redirect_stdout(io.StringIO()):
+    server.load_extensions()
+imported_at_start = "custom_extensions.core.extension" in sys.modules
+python_class = server.nodes["ConcatString"].get("python_class")
+print(json.dumps({
+    "imported_at_start": imported_at_start,
+    "imported_after_lookup": "custom_extensions.core.extension" in sys.modules,
+    "class_name": python_class.__name__,
+    "category": server.extension_catalog.catalog["core"]["nodes"]["ConcatString"]["category"],
+}))
+"""
+
+
+def load_in_subprocess(directory):
+    environment = dict(
+        os.environ,
+        NEOSCAFFOLD_MANIFEST_CACHE=str(directory),
+        NEOSCAFFOLD_HISTORY_PATH=str(directory / "history.sqlite3"),
+    )
+    output = subprocess.run(
+        [sys.executable, "-c", LOAD_SCRIPT, str(directory / "input")],
+        cwd=SERVER_ROOT,
+        env=environment,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def test_nodes_register_from_manifest_and_import_on_first_use(tmp_path):
+    first = load_in_subprocess(tmp_path)
+    assert first["imported_at_start"]
+    assert os.path.isfile(tmp_path / "custom_extensions.core.extension.json")
+
+    second = load_in_subprocess(tmp_path)
+    assert not second["imported_at_start"]
+    assert second["imported_after_lookup"]
+    assert second["class_name"] == "ConcatString"
+    assert second["category"] == first["category"]
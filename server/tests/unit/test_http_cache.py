@@ -0,0 +1,104 @@
+import asyncio
+import os
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from custom_extensions.network_requests.engine import HTTPEngine
+from custom_extensions.network_requests.http_cache import HTTPCache, freshness_lifetime
+from server.domain.utilities.metrics import Metrics
+
+
+def test_freshness_follows_cache_control():
+    assert freshness_lifetime({"Cache-Control": "max-age=60"}, 0) == 60
+    assert freshness_lifetime({"Cache-Control": "max-age=60", "Age": "50"}, 0) == 10
+    assert freshness_lifetime({"Cache-Control": "no-cache"}, 0) == 0
+    assert freshness_lifetime({"Cache-Control": "no-store"}, 0, ttl=60) is None
+    assert freshness_lifetime({"Cache-Control": "no-cache"}, 0, ttl=60) == 60
+
+
+def test_get_responses_are_cached_revalidated_and_shared(tmp_path):
+    hits = []
+
+    async def reference(request):
+        hits.append(request.headers.get("If-None-Match"))
+        await asyncio.sleep(0.05)
+        if request.headers.get("If-None-Match") == '"v1"':
+            return web.Response(status=304, headers={"ETag": '"v1"'})
+        return web.json_response(
+            {"countries": 195}, headers={"ETag": '"v1"', "Cache-Control": "max-age=60"}
+        )
+
+    async def main():
+        app = web.Application()
+        app.router.add_get("/reference", reference)
+        async with TestServer(app) as http:
+            url = str(http.make_url("/reference"))
+            now = [1000.0]
+            engine = HTTPEngine()
+            engine.metrics = Metrics()
+            cache = HTTPCache(directory=str(tmp_path), clock=lambda: now[0])
+
+            # identical requests in flight share one upstream request
+            entries = await asyncio.gather(*(cache.get(engine, url) for _ in range(5)))
+            assert all(entry.body == entries[0].body for entry in entries)
+            assert hits == [None]
+
+            now[0] += 30
+            await cache.get(engine, url)
+            assert len(hits) == 1
+
+            # stale: revalidated with the ETag, the body is reused
+            now[0] += 60
+            entry = await cache.get(engine, url)
+            assert hits == [None, '"v1"'] and entry.status == 200
+            assert entry.body == entries[0].body
+
+            # the disk tier survives a new process, a per-call ttl overrides max-age
+            cache = HTTPCache(directory=str(tmp_path), clock=lambda: now[0])
+            now[0] += 30
+            assert (await cache.get(engine, url)).body == entries[0].body
+            assert len(hits) == 2
+            now[0] += 60
+            await cache.get(engine, url, ttl=0)
+            await cache.get(engine, url, ttl=0)
+            assert len(hits) == 4
+
+            counters = engine.metrics.counters
+            assert counters["http.cache.coalesced"] == 4
+            assert counters["http.cache.revalidated"] == 3
+            await engine.close()
+
+    asyncio.run(main())
+
+
+def test_private_and_credentialed_responses_stay_off_disk(tmp_path):
+    async def profile(request):
+        return web.json_response({"name": "ada"}, headers={"Cache-Control": "private, max-age=60"})
+
+    async def reference(request):
+        return web.json_response({"countries": 195}, headers={"Cache-Control": "max-age=60"})
+
+    def written():
+        return sum(len(names) for _, _, names in os.walk(tmp_path))
+
+    async def main():
+        app = web.Application()
+        app.router.add_get("/profile", profile)
+        app.router.add_get("/reference", reference)
+        async with TestServer(app) as http:
+            engine = HTTPEngine()
+            cache = HTTPCache(directory=str(tmp_path))
+
+            await cache.get(engine, str(http.make_url("/profile")))
+            await cache.get(engine, str(http.make_url("/reference")), {"Authorization": "Bearer a"})
+            assert written() == 0
+            # still answered from memory
+            assert len(cache.entries) == 2
+
+            # a node that sets cache_ttl opts in
+            await cache.get(engine, str(http.make_url("/profile")), {"Authorization": "Bearer a"}, ttl=60)
+            assert written() == 1
+            await engine.close()
+
+    asyncio.run(main())
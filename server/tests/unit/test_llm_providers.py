@@ -0,0 +1,96 @@
+import asyncio
+
+import aiohttp
+import pytest
+from aiohttp.test_utils import TestServer
+
+from benchmarks.llm_stub_server import LLMStub
+from custom_extensions.llm import extension
+from custom_extensions.llm.providers import Provider, ProviderRegistry
+
+
+class FakeClient:
+    def __init__(self, api_key, base_url):
+        self.api_key = api_key
+        self.base_url = base_url
+        self.closed = False
+
+    async def close(self):
+        self.closed = True
+
+
+def test_registry_shares_clients_per_key_and_limits_concurrency(monkeypatch):
+    monkeypatch.setenv("FAKE_API_KEY", "from-env")
+    registry = ProviderRegistry(concurrency=2)
+    registry.register(
+        Provider(
+            "fake",
+            lambda api_key, base_url, *_: FakeClient(api_key, base_url),
+            "FAKE_API_KEY",
+            "FAKE_BASE_URL",
+            base_url="http://fake",
+        )
+    )
+    in_flight = [0, 0]
+
+    async def call(api_key=None):
+        async with registry.session("fake", api_key) as client:
+            in_flight[0] += 1
+            in_flight[1] = max(in_flight[1], in_flight[0])
+            await asyncio.sleep(0.01)
+            in_flight[0] -= 1
+            return client
+
+    async def main():
+        clients = await asyncio.gather(*(call() for _ in range(6)), call("other"))
+        assert len({id(client) for client in clients[:6]}) == 1
+        assert clients[0].api_key == "from-env" and clients[0].base_url == "http://fake"
+        assert clients[6].api_key == "other"
+        assert in_flight[1] <= 3
+        await registry.close()
+        assert clients[0].closed
+        return clients[0]
+
+    first = asyncio.run(main())
+    # another event loop gets its own client
+    assert asyncio.run(main()) is not first
+
+    with pytest.raises(ValueError):
+        registry.resolve("missing")
+
+
+def test_stub_server_speaks_the_chat_completions_api():
+    async def main():
+        async with TestServer(LLMStub().application()) as http:
+            async with aiohttp.ClientSession() as session:
+                async with session.post(
+                    http.make_url("/v1/chat/completions"),
+                    json={"model": "m", "messages": [{"role": "user", "content": "hi"}]},
+                ) as response:
+                    body = await response.json()
+        assert body["choices"][0]["message"]["content"] == "stub reply to: hi"
+        assert body["usage"]["total_tokens"] > 0
+
+    asyncio.run(main())
+
+
+def test_openai_node_awaits_a_shared_client(monkeypatch):
+    pytest.importorskip("openai")
+    stub = LLMStub(latency=0.02)
+
+    async def main():
+        async with TestServer(stub.application()) as http:
+            monkeypatch.setenv("OPENAI_BASE_URL", str(http.make_url("/v1")))
+            monkeypatch.setenv("OPENAI_API_KEY", "stub")
+            node_inputs = {
+                "required_inputs": {"prompt": {"values": "hello"}},
+                "optional_inputs": {"model": {"values": "gpt-stub"}},
+            }
+            responses = await asyncio.gather(
+                *(extension.OpenAI_LLM().evaluate(node_inputs) for _ in range(8))
+            )
+            await extension.registry.close()
+        assert responses[0]["choices"][0]["message"]["content"] == "stub reply to: hello"
+        assert stub.requests == 8
+
+    asyncio.run(main())
@@ -0,0 +1,14 @@
+from argparse import Namespace
+
+from benchmarks.load_test import run
+
+
+def test_load_test_completes_every_run():
+    args = Namespace(clients=3, rate=6.0, duration=1.0, nodes=5, toggle_rate=4.0)
+
+    report = run(args)
+    results = report["results"]["clients_3"]
+
+    assert results["completed"] == results["submitted"] > 0
+    assert results["incomplete_runs"] == 0
+    assert report["timeline"]
@@ -0,0 +1,64 @@
+import asyncio
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from benchmarks.stub_server import StubServer
+from benchmarks.workflows import PromptBuilder
+from custom_extensions.network_requests import extension
+from custom_extensions.network_requests.engine import HTTPEngine
+from custom_extensions.network_requests.http_cache import HTTPCache
+from server.domain.services.graph_executor import GraphExecutor
+
+
+class Recorder:
+    def __init__(self):
+        self.runs = []
+
+    def record(self, run):
+        self.runs.append(run)
+
+
+def test_network_nodes_await_a_pooled_engine(monkeypatch, tmp_path):
+    peers = set()
+
+    async def item(request):
+        peers.add(request.transport.get_extra_info("peername"))
+        await asyncio.sleep(0.01)
+        return web.json_response({"item": int(request.match_info["n"])})
+
+    async def main():
+        app = web.Application()
+        app.router.add_get("/items/{n}", item)
+        async with TestServer(app) as http:
+            engine = HTTPEngine(limit_per_host=4)
+            monkeypatch.setattr(extension, "engine", engine)
+            monkeypatch.setattr(extension, "http_cache", HTTPCache(directory=str(tmp_path)))
+
+            batch = [{"url": str(http.make_url(f"/items/{n}")), "method": "GET"} for n in range(40)]
+            results = await extension.process_batch_async(batch)
+            assert [r["response"]["body"]["item"] for r in results] == list(range(40))
+            # keep-alive connections are reused, never more than the per-host limit
+            assert len(peers) <= 4
+
+            # a node awaits the engine on the executor's loop
+            builder = PromptBuilder()
+            builder.add("GETJSONNetworkRequest", uri=str(http.make_url("/items/7")), headers="{}")
+            server = StubServer()
+            server.run_history = Recorder()
+            executor = GraphExecutor(server)
+            response = {"prompt_id": "p1", "number": 1, "node_errors": []}
+            await executor.run_sequential(executor.prompt_to_graph(builder.prompt), response)
+            assert server.run_history.runs[0]["status"] == "success"
+
+            # the blocking layer runs on the engine's own loop thread
+            def blocking():
+                return extension.fetch(str(http.make_url("/items/3")))
+
+            assert await asyncio.get_running_loop().run_in_executor(None, blocking) == (
+                200,
+                {"item": 3},
+            )
+            await engine.close()
+
+    asyncio.run(main())
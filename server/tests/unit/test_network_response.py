@@ -0,0 +1,61 @@
+import json
+import pickle
+
+from custom_extensions.core.extension import JSONParse, ValuePath
+from custom_extensions.network_requests.response import NetworkResponse
+from server.domain.utilities.encoders import dumps
+
+DOCUMENT = {
+    "items": [{"name": "a \" ] }", "tags": []}, {"name": "b", "tags": [1, {"x": 2}]}],
+    "count": 2,
+    "next": None,
+    "ok": True,
+}
+
+
+def test_network_response_reads_like_the_old_dict():
+    request = {"url": "http://a/items", "method": "GET"}
+    response = NetworkResponse(
+        request, 200, {"Content-Type": "application/json"}, json.dumps(DOCUMENT).encode("utf-8")
+    )
+
+    assert response.select("response", "body", "items", "1", "name") == "b"
+    assert response.select("response", "status") == 200
+
+    assert response["response"]["body"] == DOCUMENT
+    assert json.loads(dumps(response)) == {
+        "request": request,
+        "response": {"status": 200, "headers": {"Content-Type": "application/json"}, "body": DOCUMENT},
+    }
+
+    copy = pickle.loads(pickle.dumps(response))
+    assert copy.select("response", "body", "count") == 2
+
+    text = NetworkResponse(request, 200, {"Content-Type": "text/plain"}, b"not json")
+    assert text.select("response", "body") == "not json"
+
+
+def test_json_parse_and_value_path_take_a_network_response():
+    response = NetworkResponse(None, 200, {}, json.dumps(DOCUMENT).encode("utf-8"))
+
+    parse = JSONParse()
+    parsed = parse.evaluate({"required_inputs": {"json": {"values": response}}})
+    assert parsed is response
+
+    node = ValuePath()
+    value = node.evaluate(
+        {
+            "required_inputs": {
+                "object": {"values": parsed},
+                "value_path": {"values": "response.body.items.0.name"},
+            }
+        }
+    )
+    assert value == 'a " ] }'
+
+
+def test_network_response_benchmark_runs():
+    from benchmarks.network_response_benchmark import run
+
+    results = run(sizes=[50], repeat=1)["results"]["items_50"]
+    assert results["string_ms"] > 0 and results["response_ms"] > 0
@@ -0,0 +1,32 @@
+import asyncio
+import struct
+
+from PIL import Image
+
+from server.infrastructure.servers.preview_encoder import PreviewEncoder
+
+
+def test_previews_are_resized_cached_and_superseded():
+    async def scenario():
+        encoder = PreviewEncoder()
+        image = Image.new("RGBA", (640, 480), (255, 0, 0, 255))
+
+        key = ("preview", "sid", "1")
+        sequence = encoder.begin(key)
+        first = await encoder.encode(image, "WEBP", 128, 90, key=key, sequence=sequence)
+        second = await encoder.encode(image, "WEBP", 128, 90)
+
+        newer = encoder.begin(key)
+        stale = await encoder.encode(image, "JPEG", 128, 90, key=key, sequence=sequence)
+        encoder.finish(key, newer)
+        encoder.shutdown()
+        return first, second, stale, encoder
+
+    first, second, stale, encoder = asyncio.run(scenario())
+
+    preview_bytes, _, cache_hit = first
+    assert struct.unpack(">I", preview_bytes[:4]) == (3,)
+    assert not cache_hit
+    assert second[0] == preview_bytes and second[2]
+    assert stale is None
+    assert encoder.latest == {}
@@ -0,0 +1,124 @@
+import asyncio
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from custom_extensions.network_requests.engine import HTTPEngine
+from custom_extensions.network_requests.retry import (
+    CircuitBreaker,
+    CircuitOpenError,
+    RetryPolicy,
+    parse_retry_after,
+)
+from server.domain.utilities.metrics import Metrics
+
+
+def test_breaker_opens_fails_fast_and_probes():
+    now = [0.0]
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=10, clock=lambda: now[0])
+    assert not breaker.record_failure()
+    assert breaker.record_failure() and not breaker.allow()
+
+    now[0] = 10.0
+    assert breaker.allow() and breaker.state == "half_open"
+    # one probe at a time
+    assert not breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open"
+
+    now[0] = 20.0
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == "closed" and breaker.allow()
+
+    assert parse_retry_after("3") == 3.0
+    assert parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 0.0
+    assert parse_retry_after("soon") is None
+
+
+def test_engine_retries_transient_statuses_only():
+    hits = {"flaky": 0, "missing": 0, "down": 0}
+
+    async def flaky(request):
+        hits["flaky"] += 1
+        if hits["flaky"] < 3:
+            return web.json_response({}, status=503, headers={"Retry-After": "0"})
+        return web.json_response({"ok": True})
+
+    async def missing(request):
+        hits["missing"] += 1
+        return web.json_response({"error": "no"}, status=404)
+
+    async def down(request):
+        hits["down"] += 1
+        return web.json_response({}, status=500)
+
+    async def main():
+        app = web.Application()
+        app.router.add_get("/flaky", flaky)
+        app.router.add_get("/missing", missing)
+        app.router.add_get("/down", down)
+        async with TestServer(app) as http:
+            engine = HTTPEngine(
+                retry_policy=RetryPolicy(base_delay=0.001), failure_threshold=4
+            )
+            engine.metrics = Metrics()
+
+            assert await engine.request(str(http.make_url("/flaky"))) == (200, {"ok": True})
+            assert await engine.request(str(http.make_url("/missing"))) == (404, {"error": "no"})
+            assert hits == {"flaky": 3, "missing": 1, "down": 0}
+
+            # 500 gets 3 attempts, the 4th failure in a row opens the breaker mid-retry
+            assert (await engine.request(str(http.make_url("/down"))))[0] == 500
+            with pytest.raises(CircuitOpenError):
+                await engine.request(str(http.make_url("/down")))
+            with pytest.raises(CircuitOpenError):
+                await engine.request(str(http.make_url("/flaky")))
+            assert hits["down"] == 4
+
+            counters = engine.metrics.counters
+            assert counters["http.retries.503"] == 2 and counters["http.breaker.opened"] == 1
+            assert counters["http.breaker.rejected"] == 2
+            assert engine.metrics.gauges["http.breakers.open"] == 1
+            await engine.close()
+
+    asyncio.run(main())
+
+
+def test_post_is_retried_only_when_it_was_not_processed():
+    hits = {"unavailable": 0, "limited": 0}
+
+    async def unavailable(request):
+        hits["unavailable"] += 1
+        return web.json_response({}, status=503)
+
+    async def limited(request):
+        hits["limited"] += 1
+        if hits["limited"] < 2:
+            return web.json_response({}, status=429, headers={"Retry-After": "0"})
+        return web.json_response({"ok": True})
+
+    async def main():
+        app = web.Application()
+        app.router.add_post("/unavailable", unavailable)
+        app.router.add_post("/limited", limited)
+        async with TestServer(app) as http:
+            engine = HTTPEngine(retry_policy=RetryPolicy(base_delay=0.001))
+
+            status, _ = await engine.request(str(http.make_url("/unavailable")), "POST", {})
+            assert status == 503 and hits["unavailable"] == 1
+            assert await engine.request(str(http.make_url("/limited")), "POST", {}) == (200, {"ok": True})
+            assert hits["limited"] == 2
+
+            # a caller that knows the API deduplicates opts in
+            idempotent = RetryPolicy(base_delay=0.001, idempotent=True)
+            await engine.request(str(http.make_url("/unavailable")), "POST", {}, retry_policy=idempotent)
+            assert hits["unavailable"] == 1 + 5
+            await engine.close()
+
+    asyncio.run(main())
+
+    policy = RetryPolicy()
+    assert policy.exception_delay(0, asyncio.TimeoutError(), "POST") is None
+    assert policy.exception_delay(0, asyncio.TimeoutError(), "PUT") is not None
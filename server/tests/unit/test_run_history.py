@@ -0,0 +1,55 @@
+import asyncio
+import time
+
+from benchmarks.stub_server import StubServer
+from benchmarks.workflows import long_chain
+from server.domain.services.graph_executor import GraphExecutor
+from server.infrastructure.servers.run_history import RunHistory
+
+
+def test_runs_are_recorded_queried_and_compacted(tmp_path):
+    # compaction is run by hand below
+    history = RunHistory(
+        path=str(tmp_path / "history.sqlite3"), retention_days=1, compact_interval=1e9
+    )
+    history.open()
+
+    server = StubServer()
+    server.run_history = history
+    server.client_id = "alice"
+    server.current_workflow_id = "checksum-a"
+    response = {"prompt_id": "p1", "number": 1, "node_errors": []}
+    executor = GraphExecutor(server)
+    asyncio.run(executor.run_sequential(executor.prompt_to_graph(long_chain(length=3)), response))
+
+    now = time.time()
+    for i in range(5):
+        history.record(
+            {
+                "prompt_id": f"old-{i}",
+                "user_id": "bob" if i % 2 else "alice",
+                "workflow_checksum": "checksum-b",
+                "started_at": now - 3 * 86400 + i,
+                "status": "error" if i == 4 else "success",
+                "nodes": [{"node_id": "1", "cache_hit": True}],
+            }
+        )
+    history.close()
+
+    alice = history.query(user_id="alice")
+    assert [run["prompt_id"] for run in alice] == ["p1", "old-4", "old-2", "old-0"]
+    assert alice[0]["node_count"] == 3 and alice[0]["status"] == "success"
+    assert [run["prompt_id"] for run in history.query(status="error")] == ["old-4"]
+    assert len(history.query(workflow_checksum="checksum-b", max_items=2)) == 2
+    older = history.query(user_id="alice", until=alice[0]["started_at"], max_items=1)
+    assert [run["prompt_id"] for run in older] == ["old-4"]
+
+    (run,) = history.get("p1", user_id="alice")
+    assert [node["output_handle"] for node in run["nodes"]] == ["p1/1", "p1/2", "p1/3"]
+    assert history.get("p1", user_id="bob") == []
+
+    # compaction drops everything older than the retention period
+    connection = history.connect()
+    assert history.compact(connection) == 5
+    assert [run["prompt_id"] for run in history.query()] == ["p1"]
+
@@ -0,0 +1,100 @@
+import asyncio
+import logging
+import socket
+
+from server.infrastructure.servers.session_store import (
+    BrokerSessionStore,
+    SessionBroker,
+    SessionStore,
+)
+
+
+class Process:
+    """the parts of Server a BrokerSessionStore talks back to"""
+
+    def __init__(self):
+        self.logger = logging.getLogger(__name__)
+        self.delivered = []
+
+    async def deliver(self, sid, kind, args):
+        self.delivered.append((sid, kind, args))
+
+
+def test_replicas_share_updates_notifications_and_messages(tmp_path):
+    path = str(tmp_path / "sessions.sock")
+
+    async def scenario():
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.bind(path)
+        sock.listen()
+        broker = asyncio.create_task(SessionBroker().serve(sock))
+
+        executing, serving = BrokerSessionStore(path), BrokerSessionStore(path)
+        executing_process, serving_process = Process(), Process()
+        await executing.start(executing_process)
+        await serving.start(serving_process)
+
+        # the process running the workflow waits at a breakpoint another process toggled
+        await serving.update("alice", "wf", "toggle_breakpoints", node_ids=["3"])
+        await asyncio.sleep(0.05)
+        steps = executing.workflow_session("alice", "wf")["interventions"]["breakpoints"]["nodes"]["3"]
+
+        waiting = asyncio.create_task(
+            executing.wait(
+                "alice",
+                "wf",
+                lambda session: session["interventions"]["breakpoints"]["nodes"].get("3") != steps,
+            )
+        )
+        await asyncio.sleep(0.05)
+        assert not waiting.done()
+        await serving.update("alice", "wf", "step_through_breakpoints", node_ids=["3"])
+        await asyncio.wait_for(waiting, 1)
+
+        # messages go to the process that attached the socket
+        serving.attach("alice")
+        await asyncio.sleep(0.05)
+        assert executing.forward("alice", "json", ("message", {"node": "3"}, None))
+        await asyncio.sleep(0.05)
+
+        await executing.stop()
+        await serving.stop()
+        broker.cancel()
+        return steps, serving_process.delivered, executing_process.delivered
+
+    steps, serving_delivered, executing_delivered = asyncio.run(scenario())
+
+    assert steps == 0
+    assert serving_delivered == [("alice", "json", ("message", {"node": "3"}, None))]
+    assert executing_delivered == []
+
+
+def test_idle_capped_and_released_sessions_are_dropped():
+    store = SessionStore(idle_ttl=60, max_workflows_per_user=2)
+
+    async def scenario():
+        store.hold("alice", "running")
+        await store.update("alice", "running", "toggle_breakpoints", node_ids=["1"])
+        await store.update("alice", "a", "toggle_stop_points", node_ids=["1"])
+        await store.update("alice", "b", "toggle_stop_points", node_ids=["1"])
+        # over the cap: the least recently used session no run holds goes
+        assert sorted(store.sessions["alice"]) == ["b", "running"]
+
+        store.last_used[("alice", "b")] -= 120
+        assert store.sweep() == 1
+        assert list(store.sessions["alice"]) == ["running"]
+
+        # interventions still set, so releasing keeps the session until the user leaves
+        store.release("alice", "running")
+        assert "running" in store.sessions["alice"]
+        store.discard_user("alice")
+        assert store.sessions == {} and store.last_used == {}
+
+        store.hold("bob", "wf")
+        await store.update("bob", "wf", "toggle_stop_points", node_ids=["1"])
+        await store.update("bob", "wf", "toggle_stop_points", node_ids=["1"])
+        store.release("bob", "wf")
+        assert store.sessions == {}
+
+    asyncio.run(scenario())
+    assert store.report()["evicted"] == 4
@@ -0,0 +1,75 @@
+import asyncio
+import threading
+import time
+
+from server.domain.utilities import token_verification
+from server.domain.utilities.metrics import Metrics
+from server.domain.utilities.token_verification import TokenVerifier, register_verifier, verify_token
+
+
+class LocalIssuer(TokenVerifier):
+    """a stand-in issuer: tokens are "valid:<user>" and verifying one takes a while"""
+
+    def __init__(self):
+        self.calls = 0
+        self.threads = set()
+
+    def verify(self, token):
+        self.calls += 1
+        self.threads.add(threading.get_ident())
+        time.sleep(0.05)
+        if not token.startswith("valid:"):
+            return {"error": "Invalid token"}
+        return {"user_id": token.split(":")[1], "expiration": time.time() + 3600}
+
+
+def test_tokens_are_verified_off_the_loop_once_and_cached():
+    issuer = LocalIssuer()
+    register_verifier("local", issuer)
+
+    async def scenario():
+        concurrent = await asyncio.gather(*[verify_token("local", "valid:alice") for _ in range(10)])
+        cached = await verify_token("local", "valid:alice")
+        invalid = await verify_token("local", "forged")
+        invalid_again = await verify_token("local", "forged")
+        unknown = await verify_token("nobody", "valid:alice")
+        return concurrent, cached, invalid, invalid_again, unknown
+
+    concurrent, cached, invalid, invalid_again, unknown = asyncio.run(scenario())
+
+    assert all(info["user_id"] == "alice" for info in concurrent)
+    assert cached["user_id"] == "alice"
+    assert invalid.get("error") and invalid_again.get("error")
+    assert unknown == {"error": "Unknown authenticator"}
+    # one call for alice, failures are not cached
+    assert issuer.calls == 3
+    assert threading.get_ident() not in issuer.threads
+    token_verification.VERIFIERS.pop("local")
+
+
+def test_cache_entries_expire_with_the_token():
+    cache = token_verification.VerifiedTokenCache(max_entries=2, max_ttl=60)
+    cache.put("expired", {"user_id": "a", "expiration": time.time() - 1})
+    cache.put("short", {"user_id": "b", "expiration": time.time() + 0.05})
+    assert cache.get("expired") is None
+    assert cache.get("short")["user_id"] == "b"
+    time.sleep(0.1)
+    assert cache.get("short") is None
+
+    for key in ("1", "2", "3"):
+        cache.put(key, {"user_id": key, "expiration": time.time() + 3600})
+    assert list(cache.entries) == ["2", "3"]
+
+
+def test_failed_certificate_refreshes_are_logged_and_counted(caplog):
+    store = token_verification.CertStore("http://127.0.0.1:9/certs", metrics=Metrics())
+    store.certs = {"kid": "cert"}
+
+    store.refresh_in_background()
+    deadline = time.monotonic() + 5
+    while store.refreshing and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    assert store.metrics.counters == {"auth.certs.fetch_failures": 1}
+    assert "refreshing certificates" in caplog.text
+    assert store.certs == {"kid": "cert"}
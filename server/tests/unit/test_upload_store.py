@@ -0,0 +1,91 @@
+import asyncio
+import hashlib
+
+import pytest
+
+from server.infrastructure.servers.upload_store import UploadError, UploadStore
+
+
+async def chunks(*parts):
+    for part in parts:
+        yield part
+
+
+def test_uploads_resume_and_deduplicate(tmp_path):
+    data = b"0123456789" * 1000
+    sha256 = hashlib.sha256(data).hexdigest()
+
+    async def main():
+        store = UploadStore(str(tmp_path))
+        store.setup()
+
+        upload = store.create("data.bin", len(data))
+        upload_id = upload["upload_id"]
+        assert await store.append(upload_id, 0, chunks(data[:4000])) == {
+            "upload_id": upload_id,
+            "name": "data.bin",
+            "offset": 4000,
+            "size": len(data),
+        }
+        with pytest.raises(UploadError) as error:
+            await store.append(upload_id, 3000, chunks(data[3000:]))
+        assert error.value.status == 409 and error.value.details == {"offset": 4000}
+
+        # a restarted server picks the upload up from the staging directory
+        store = UploadStore(str(tmp_path))
+        done = await store.append(upload_id, 4000, chunks(data[4000:7000], data[7000:]))
+        assert done["handle"] == f"upload:{sha256}" and not done["deduplicated"]
+        assert open(store.path(done["handle"]), "rb").read() == data
+        assert store.mmap(done["handle"])[:10] == data[:10]
+
+        # content that is already stored is never sent or kept twice
+        assert store.create("copy.bin", len(data), sha256)["deduplicated"]
+        again = await store.store("copy.bin", chunks(data))
+        assert again["handle"] == done["handle"] and again["deduplicated"]
+
+        store.max_size = 5
+        with pytest.raises(UploadError) as error:
+            await store.store("big.bin", chunks(b"x" * 10))
+        assert error.value.status == 413
+        assert list((tmp_path / "uploads" / ".staging").iterdir()) == []
+
+    asyncio.run(main())
+
+
+def test_status_and_appends_during_a_streaming_append(tmp_path):
+    data = b"abcdefghij" * 300
+
+    async def main():
+        store = UploadStore(str(tmp_path))
+        store.setup()
+        upload_id = (await asyncio.get_running_loop().run_in_executor(
+            None, store.create, "data.bin", len(data)
+        ))["upload_id"]
+
+        received = asyncio.Event()
+        resume = asyncio.Event()
+
+        async def slow_chunks():
+            yield data[:1000]
+            received.set()
+            await resume.wait()
+            yield data[1000:]
+
+        first = asyncio.create_task(store.append(upload_id, 0, slow_chunks()))
+        await received.wait()
+        await asyncio.sleep(0.05)
+
+        # the live offset, not a copy rebuilt from the still buffered file
+        assert (await store.status(upload_id))["offset"] == 1000
+        second = asyncio.create_task(store.append(upload_id, 0, chunks(b"x" * 100)))
+        await asyncio.sleep(0.05)
+        resume.set()
+
+        done = await first
+        with pytest.raises(UploadError) as error:
+            await second
+        assert error.value.status == 409
+        assert done["sha256"] == hashlib.sha256(data).hexdigest()
+        assert open(store.path(done["handle"]), "rb").read() == data
+
+    asyncio.run(main())
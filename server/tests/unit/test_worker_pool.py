@@ -0,0 +1,41 @@
+import logging
+import os
+
+import pytest
+
+from server.domain.utilities.metrics import Metrics
+from server.infrastructure.servers.worker_pool import WorkerError, WorkerPool
+
+from .worker_nodes import Crash, Square
+
+
+def node_inputs(value):
+    return {"required_inputs": {"value": {"values": value}}, "optional_inputs": {}}
+
+
+def test_nodes_run_in_a_warm_worker_that_restarts_after_crashing():
+    metrics = Metrics()
+    pool = WorkerPool(metrics, logging.getLogger(__name__), timeout=30)
+    pool.register("math", {"group": "math", "preload": ["colorsys"]}, ["Square", "Crash"])
+    assert pool.runs("Square") and not pool.runs("Add")
+
+    pool.start()
+    try:
+        square = pool.remote_evaluate("Square", Square)
+        first = square(node_inputs(7))
+        assert first["square"] == 49
+        assert first["pid"] != os.getpid()
+        assert pool.workers["math"].ready["failed_preloads"] == {}
+
+        with pytest.raises(WorkerError):
+            pool.remote_evaluate("Crash", Crash)(node_inputs(0))
+
+        second = square(node_inputs(3))
+        assert second["square"] == 9
+        assert second["pid"] != first["pid"]
+        assert metrics.counters["worker.restarts"] == 1
+
+        pool.check_health()
+        assert pool.status()["math"]["alive"]
+    finally:
+        pool.stop()